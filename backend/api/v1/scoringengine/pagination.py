@@ -0,0 +1,153 @@
+from datetime import timedelta
+
+from django.utils.timezone import now
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from scoringengine.pagination import (
+    InvalidCursor,
+    clean_keyset_values,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+)
+
+
+class LeadCursorPagination(BasePagination):
+    """Cursor pagination of leads by keyset, without counting them.
+
+    Leads are listed oldest first by default, so `next` link of the last page
+    stays valid and returns leads created after it, which lets sync clients
+    poll for new leads. Ordering by "-total_score" lists top scored leads.
+    Cursor holds ordering it was made for and the key of the last lead.
+
+    Lead timestamp is set before its transaction commits, so a lead may show
+    up behind leads listed already. Cursor of the last page therefore points
+    before leads of the last `poll_overlap` seconds, they are listed again by
+    the next poll and clients drop leads they have by lead id. Leads committing
+    later than that after their timestamp are missed by polling.
+    """
+
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    page_size_query_param = "limit"
+    page_size = 100
+    max_page_size = 1000
+    poll_overlap = 60
+
+    # Primary key is the tiebreaker of both orderings
+    orderings = {
+        "timestamp": ["timestamp", "lead_id"],
+        "-total_score": ["-total_score", "-lead_id"],
+    }
+    default_ordering = "timestamp"
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size < 1:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_ordering_name(self, request) -> str:
+        name = request.query_params.get(
+            self.ordering_query_param, self.default_ordering
+        )
+
+        if name not in self.orderings:
+            raise ValidationError(
+                {
+                    self.ordering_query_param: [
+                        f"Ordering must be one of {', '.join(self.orderings)}."
+                    ]
+                }
+            )
+
+        return name
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering_name = self.get_ordering_name(request)
+        ordering = self.orderings[self.ordering_name]
+        page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.after = None
+        self.poll_after = None
+
+        if cursor:
+            try:
+                name, *after = decode_cursor(cursor, len(ordering) + 1)
+                if name != self.ordering_name:
+                    raise InvalidCursor("Cursor of other ordering")
+                self.after = clean_keyset_values(queryset.model, ordering, after)
+            except InvalidCursor:
+                raise NotFound("Invalid cursor")
+
+            queryset = queryset.filter(keyset_filter(ordering, self.after))
+
+        # One more lead tells whether there is a following page
+        page = list(queryset.order_by(*ordering)[: page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+
+        if self.ordering_name == self.default_ordering:
+            self.poll_after = self.get_poll_after(page)
+
+        if page:
+            self.after = [getattr(page[-1], field.lstrip("-")) for field in ordering]
+
+        return page
+
+    def get_poll_after(self, page):
+        """Return key of last lead of page older than `poll_overlap` seconds"""
+        poll_after = self.after
+        settled = now() - timedelta(seconds=self.poll_overlap)
+
+        for lead in page:
+            if lead.timestamp > settled:
+                break
+            poll_after = [lead.timestamp, lead.lead_id]
+
+        return poll_after
+
+    def get_next_link(self):
+        url = self.request.build_absolute_uri()
+
+        if self.has_next:
+            after = self.after
+        elif self.ordering_name == self.default_ordering:
+            # Polling from the end of timestamp ordering returns new leads, the
+            # cursor is kept even if there are no more leads now
+            if self.poll_after is None and self.after is not None:
+                return remove_query_param(url, self.cursor_query_param)
+            after = self.poll_after
+        else:
+            after = None
+
+        if not after:
+            return None
+
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            encode_cursor(self.ordering_name, *after),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
@@ -1,15 +1,22 @@
+from datetime import timedelta
+
 from django.utils.timezone import now
 from rest_framework import serializers
 
+from scoringengine.cache import suppress_cache_invalidation
 from scoringengine.models import (
     Answer,
+    AnswerFacet,
     Choice,
     DatesRange,
     Lead,
+    LeadSearchDocument,
     Question,
     Recommendation,
+    RecommendationHit,
     ScoringModel,
     ValueRange,
+    get_recommendation_catalog,
 )
 from users.models import User
 
@@ -37,33 +44,38 @@ class LeadSerializerCreate(serializers.ModelSerializer):
 
     def create(self, validated_data):
         answers_data = validated_data.pop("answers")
+        recommendations = validated_data.pop("recommendations", [])
         validated_data["timestamp"] = now()
-        lead = Lead.objects.create(**validated_data)
+        validated_data.update(
+            Lead.get_customer_fields(
+                (answer_data["field_name"], answer_data["response"])
+                for answer_data in answers_data
+            )
+        )
 
-        for answer_data in answers_data:
-            # Handle values field specially for SQLite compatibility
-            values = answer_data.pop("values", None)
-            answer = Answer.objects.create(lead=lead, **answer_data)
-            if values is not None:
-                answer.set_values(values)
-                answer.save()
+        owner = validated_data["owner"]
 
-        return lead
+        # Invalidate owner cache once for lead and all its answers
+        with suppress_cache_invalidation(owner.id):
+            lead = Lead.objects.create(**validated_data)
 
+            answers = [
+                Answer.objects.create(lead=lead, **answer_data)
+                for answer_data in answers_data
+            ]
 
-class RecommendationSerializerView(serializers.ModelSerializer):
-    """A slim view of recommendation-related fields stored on Answer."""
+            AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(owner.id, answers))
+            RecommendationHit.objects.bulk_create(
+                RecommendationHit(
+                    lead=lead,
+                    recommendation=recommendation,
+                    version=recommendation.version,
+                )
+                for recommendation in recommendations
+            )
+            LeadSearchDocument.from_answers(lead, answers).save(force_insert=True)
 
-    class Meta:
-        model = Answer
-        fields = [
-            "field_name",
-            "response_text",
-            "affiliate_name",
-            "affiliate_image",
-            "affiliate_link",
-            "redirect_url",
-        ]
+        return lead
 
 
 class AnswerSerializerView(serializers.ModelSerializer):
@@ -79,17 +91,12 @@ class AnswerSerializerView(serializers.ModelSerializer):
             "date_value",
             "values",
             "points",
-            "response_text",
-            "affiliate_name",
-            "affiliate_image",
-            "affiliate_link",
-            "redirect_url",
         ]
 
 
 class LeadSerializerView(serializers.ModelSerializer):
-    answers = AnswerSerializerView(many=True, source="answers")
-    recommendations = RecommendationSerializerView(many=True, source="answers")
+    answers = AnswerSerializerView(many=True)
+    recommendations = serializers.SerializerMethodField()
 
     class Meta:
         model = Lead
@@ -102,28 +109,55 @@ class LeadSerializerView(serializers.ModelSerializer):
             "recommendations",
         ]
 
+    def get_recommendations(self, instance) -> dict:
+        """Rebuild triggered recommendations from owner's cached catalog"""
+        hits = instance.recommendation_hits.all()
+        keys = [(hit.recommendation_id, hit.version) for hit in hits]
+
+        if not keys:
+            return {}
+
+        # Catalog is loaded once for all leads of listed page
+        catalogs = self.context.setdefault("recommendation_catalogs", {})
+        catalog = catalogs.get(instance.owner_id)
+
+        if catalog is None:
+            catalog = get_recommendation_catalog(instance.owner_id)
+        if any(key not in catalog for key in keys):
+            catalog = get_recommendation_catalog(instance.owner_id, refresh=True)
+
+        catalogs[instance.owner_id] = catalog
+
+        recommendations = {}
+        for key in keys:
+            if key not in catalog:
+                continue
+
+            fields = dict(catalog[key])
+            field_name = fields.pop("field_name")
+
+            # Skip empty recommendations
+            if any(fields.values()):
+                recommendations[field_name] = fields
+
+        return recommendations
+
     def to_representation(self, instance):
         result = super().to_representation(instance)
 
-        fields_to_check = [
-            "response_text",
-            "affiliate_name",
-            "affiliate_image",
-            "affiliate_link",
-            "redirect_url",
-        ]
-
-        # Clean-up empty recommendations, reformat recommendations list to dict
-        non_empty_recommendations = {
-            r.pop("field_name"): r
-            for r in result["recommendations"]
-            if any([r.get(f) for f in fields_to_check])
-        }
-        result["recommendations"] = non_empty_recommendations
+        # Answers keep recommendation fields of their question for compatibility
+        empty = dict.fromkeys(Recommendation.fields, "")
+        for answer in result["answers"]:
+            answer.update(result["recommendations"].get(answer["field_name"], empty))
 
         return result
 
 
+class LeadSerializerList(LeadSerializerView):
+    class Meta(LeadSerializerView.Meta):
+        fields = ["lead_id", "timestamp", *LeadSerializerView.Meta.fields[1:]]
+
+
 # Admin Serializers
 class ChoiceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -254,3 +288,81 @@ class LeadAnalyticsSerializer(serializers.Serializer):
     total_leads = serializers.IntegerField()
     average_scores = serializers.DictField()
     score_distribution = serializers.DictField()
+
+
+class DateRangeQuerySerializer(serializers.Serializer):
+    DEFAULT_RANGE = timedelta(days=30)
+
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    @staticmethod
+    def get_default_end():
+        # Rounded up to full hour, so range and cache key of repeated requests
+        # without bounds stay the same during the hour
+        return now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+    def validate(self, data):
+        data.setdefault("end", self.get_default_end())
+        data.setdefault("start", data["end"] - self.DEFAULT_RANGE)
+
+        if data["start"] >= data["end"]:
+            raise serializers.ValidationError({"start": "Start must be before end."})
+
+        return data
+
+
+class CatalogueSummaryQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    slave = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, data):
+        if "start" in data and "end" in data and data["start"] >= data["end"]:
+            raise serializers.ValidationError({"start": "Start must be before end."})
+
+        return data
+
+
+class TimeseriesQuerySerializer(DateRangeQuerySerializer):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+    JSON = "json"
+    CSV = "csv"
+
+    interval = serializers.ChoiceField(choices=[HOUR, DAY, WEEK], default=DAY)
+    output = serializers.ChoiceField(choices=[JSON, CSV], default=JSON)
+
+
+class LeadListQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    x_axis__gte = serializers.DecimalField(12, 2, required=False)
+    x_axis__lte = serializers.DecimalField(12, 2, required=False)
+    y_axis__gte = serializers.DecimalField(12, 2, required=False)
+    y_axis__lte = serializers.DecimalField(12, 2, required=False)
+    total_score__gte = serializers.DecimalField(12, 2, required=False)
+    total_score__lte = serializers.DecimalField(12, 2, required=False)
+
+    customer_email = serializers.CharField(required=False)
+    customer_id = serializers.CharField(required=False)
+
+    def validate(self, data):
+        if "start" in data and "end" in data and data["start"] >= data["end"]:
+            raise serializers.ValidationError({"start": "Start must be before end."})
+
+        return data
+
+    def get_lookups(self) -> dict:
+        """Return lead filter lookups of validated query parameters"""
+        lookups = dict(self.validated_data)
+
+        if "start" in lookups:
+            lookups["timestamp__gte"] = lookups.pop("start")
+        if "end" in lookups:
+            lookups["timestamp__lt"] = lookups.pop("end")
+
+        return lookups
@@ -1,33 +1,54 @@
 import logging
+import math
 import re
 
-from django.core.cache import cache
-from django.db.models import Avg, Count
+from django.conf import settings
+from django.db.models import Avg, Count, Exists, F, FloatField, OuterRef, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import mixins, serializers, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 
 logger = logging.getLogger(__name__)
 
+from api.v1.scoringengine.pagination import LeadCursorPagination
 from api.v1.scoringengine.serializers import (
+    CatalogueSummaryQuerySerializer,
     ChoiceSerializer,
+    DateRangeQuerySerializer,
     DatesRangeSerializer,
+    LeadListQuerySerializer,
     LeadSerializerCreate,
+    LeadSerializerList,
     LeadSerializerView,
     QuestionSerializer,
     RecommendationSerializer,
     ScoringModelSerializer,
+    TimeseriesQuerySerializer,
     UserSerializer,
     ValueRangeSerializer,
 )
+from scoringengine.archive import get_archived_lead
+from scoringengine.cache import (
+    analytics_cache_key,
+    get_cache_stats,
+    get_cache_ttls,
+    get_or_refresh,
+    suppress_cache_invalidation,
+)
+from scoringengine.exports import iter_csv
 from scoringengine.helpers import (
     add_lead_log,
     calculate_x_and_y_scores,
     collect_answers_values,
     collect_recommendations,
+    filter_leads_by_answer_ranges,
 )
 from scoringengine.models import (
+    Answer,
     Choice,
     DatesRange,
     Lead,
@@ -36,31 +57,130 @@ from scoringengine.models import (
     ScoringModel,
     ValueRange,
 )
+from scoringengine.rollups import summarize_rollups
+from scoringengine.scoring_plan import get_config_owner_id, get_scoring_plan
 from users.models import User
+from users.scoring_config import fork_scoring_config
+
+
+class SharedScoringConfigMixin:
+    """Serve scoring configuration shared with catalogue slave, copying it on change.
+
+    Safe requests of slave read configuration of catalogue master. Unsafe
+    requests copy it to slave first, pks of shared rows in url and parent
+    fields are mapped to pks of their copies.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        self.forked_pks = {}
+
+        if request.method in SAFE_METHODS:
+            self.config_owner_id = get_config_owner_id(request.user.pk)
+            return
+
+        self.forked_pks = fork_scoring_config(request.user)
+        self.config_owner_id = request.user.pk
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            self.kwargs[lookup_url_kwarg] = self.get_own_pk(
+                self.get_serializer_class().Meta.model, self.kwargs[lookup_url_kwarg]
+            )
+
+    def get_config_owner_id(self):
+        return getattr(self, "config_owner_id", self.request.user.pk)
+
+    def get_own_pk(self, model, pk):
+        """Return pk of copy of shared row, pk itself if it wasn't copied"""
+        try:
+            return self.forked_pks.get(model, {}).get(int(pk), pk)
+        except (TypeError, ValueError):
+            return pk
 
 
 class LeadViewSet(
-    mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     """
     API endpoint for lead management.
 
-    Provides endpoints to create and retrieve leads with automatic scoring.
+    Provides endpoints to create, list and retrieve leads with automatic scoring.
     Requires authentication via token.
     """
 
     queryset = Lead.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = LeadCursorPagination
 
     def get_queryset(self, *args, **kwargs):
-        return self.queryset.filter(owner=self.request.user).prefetch_related("answers")
+        return self.queryset.filter(owner=self.request.user).prefetch_related(
+            "answers", "recommendation_hits"
+        )
 
     def get_serializer_class(self):
         if self.action == "create":
             return LeadSerializerCreate
+        elif self.action == "list":
+            return LeadSerializerList
         else:
             return LeadSerializerView
 
+    def list(self, request, *args, **kwargs):
+        """
+        List leads page by page, following cursor in `next` link.
+
+        Leads are listed oldest first, or top scored first with "-total_score"
+        ordering. Answers and recommendations of all leads of a page are
+        fetched by one query each.
+
+        Query parameters:
+        - cursor: cursor of `next` link of previous page
+        - limit: number of leads per page, 100 by default and 1000 at most
+        - ordering: timestamp (default) or -total_score
+        - start, end: ISO 8601 datetimes limiting lead timestamp
+        - x_axis__gte, x_axis__lte, y_axis__gte, y_axis__lte, total_score__gte,
+          total_score__lte: score ranges
+        - customer_email, customer_id: leads of customer
+        - answer__<field_name>__gte, answer__<field_name>__lte: answer ranges
+        """
+        query_serializer = LeadListQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+
+        # Pages are served by lead_owner_ts_pk_idx or lead_owner_score_pk_idx
+        queryset = filter_leads_by_answer_ranges(
+            request.user,
+            self.get_queryset().filter(**query_serializer.get_lookups()),
+            request.query_params,
+        )
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve lead by its id.
+
+        Leads moved to archive files by retention policy are read from their
+        archive when lead is not found.
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+
+        except Http404:
+            lead = get_archived_lead(request.user.id, kwargs["pk"])
+
+            if lead is None:
+                raise
+
+            return Response(self.get_serializer(lead).data)
+
     def perform_create(self, serializer):
         answers_data = serializer.validated_data["answers"]
 
@@ -68,19 +188,21 @@ class LeadViewSet(
             re.sub(r"\[\d+\]", "", a["field_name"]) for a in answers_data
         ]
 
+        plan = get_scoring_plan(self.request.user)
+
         # Check that answers for all question provided
-        for question in self.request.user.questions.all():
-            if question.field_name not in provided_answers_field_names:
+        for field_name in plan.questions:
+            if field_name not in provided_answers_field_names:
                 raise serializers.ValidationError(
                     {"answers": ["Not all answers provided"]}
                 )
 
-        collect_answers_values(self.request.user, answers_data)
+        collect_answers_values(self.request.user, answers_data, plan)
 
-        x_axis, y_axis = calculate_x_and_y_scores(self.request.user, answers_data)
+        x_axis, y_axis = calculate_x_and_y_scores(self.request.user, answers_data, plan)
         total_score = x_axis + y_axis
 
-        collect_recommendations(self.request.user, answers_data)
+        recommendations = collect_recommendations(self.request.user, answers_data, plan)
 
         data = {
             "owner": self.request.user,
@@ -88,6 +210,7 @@ class LeadViewSet(
             "y_axis": y_axis,
             "total_score": total_score,
             "answers": answers_data,
+            "recommendations": recommendations,
         }
 
         return serializer.save(**data)
@@ -112,7 +235,9 @@ class LeadViewSet(
 
         if allow_duplicates is True and data.get("lead_id"):
             try:
-                Lead.objects.filter(lead_id__iexact=data["lead_id"]).delete()
+                # Exact lookup is served by primary key, unlike case insensitive one
+                with suppress_cache_invalidation(request.user.id):
+                    Lead.objects.filter(lead_id=data["lead_id"]).delete()
                 logger.info(f"Deleted duplicate lead with ID {data['lead_id']}")
 
             except:  # noqa: this part of the process is not crucial, so not worth acknowledging
@@ -139,7 +264,7 @@ class LeadViewSet(
         )
 
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(SharedScoringConfigMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing questions.
     """
@@ -149,7 +274,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return (
-            Question.objects.filter(owner=self.request.user)
+            Question.objects.filter(owner_id=self.get_config_owner_id())
             .order_by("number")
             .prefetch_related(
                 "choices",
@@ -195,7 +320,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
             return Response({"detail": "No recommendation found"}, status=404)
 
 
-class ChoiceViewSet(viewsets.ModelViewSet):
+class ChoiceViewSet(SharedScoringConfigMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing choices.
     """
@@ -204,17 +329,17 @@ class ChoiceViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Choice.objects.filter(question__owner=self.request.user).select_related(
-            "question"
-        )
+        return Choice.objects.filter(
+            question__owner_id=self.get_config_owner_id()
+        ).select_related("question")
 
     def perform_create(self, serializer):
-        question_id = self.request.data.get("question")
+        question_id = self.get_own_pk(Question, self.request.data.get("question"))
         question = Question.objects.get(id=question_id, owner=self.request.user)
         serializer.save(question=question)
 
 
-class ScoringModelViewSet(viewsets.ModelViewSet):
+class ScoringModelViewSet(SharedScoringConfigMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing scoring models.
     """
@@ -224,13 +349,13 @@ class ScoringModelViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return (
-            ScoringModel.objects.filter(owner=self.request.user)
+            ScoringModel.objects.filter(owner_id=self.get_config_owner_id())
             .select_related("question")
             .prefetch_related("ranges", "dates_ranges")
         )
 
     def perform_create(self, serializer):
-        question_id = self.request.data.get("question")
+        question_id = self.get_own_pk(Question, self.request.data.get("question"))
         question = Question.objects.get(id=question_id, owner=self.request.user)
         serializer.save(owner=self.request.user, question=question)
 
@@ -251,7 +376,7 @@ class ScoringModelViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ValueRangeViewSet(viewsets.ModelViewSet):
+class ValueRangeViewSet(SharedScoringConfigMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing value ranges.
     """
@@ -261,18 +386,20 @@ class ValueRangeViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return ValueRange.objects.filter(
-            scoring_model__owner=self.request.user
+            scoring_model__owner_id=self.get_config_owner_id()
         ).select_related("scoring_model")
 
     def perform_create(self, serializer):
-        scoring_model_id = self.request.data.get("scoring_model")
+        scoring_model_id = self.get_own_pk(
+            ScoringModel, self.request.data.get("scoring_model")
+        )
         scoring_model = ScoringModel.objects.get(
             id=scoring_model_id, owner=self.request.user
         )
         serializer.save(scoring_model=scoring_model)
 
 
-class DatesRangeViewSet(viewsets.ModelViewSet):
+class DatesRangeViewSet(SharedScoringConfigMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing date ranges.
     """
@@ -282,18 +409,20 @@ class DatesRangeViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return DatesRange.objects.filter(
-            scoring_model__owner=self.request.user
+            scoring_model__owner_id=self.get_config_owner_id()
         ).select_related("scoring_model")
 
     def perform_create(self, serializer):
-        scoring_model_id = self.request.data.get("scoring_model")
+        scoring_model_id = self.get_own_pk(
+            ScoringModel, self.request.data.get("scoring_model")
+        )
         scoring_model = ScoringModel.objects.get(
             id=scoring_model_id, owner=self.request.user
         )
         serializer.save(scoring_model=scoring_model)
 
 
-class RecommendationViewSet(viewsets.ModelViewSet):
+class RecommendationViewSet(SharedScoringConfigMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing recommendations.
     """
@@ -302,12 +431,12 @@ class RecommendationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Recommendation.objects.filter(owner=self.request.user).select_related(
-            "question"
-        )
+        return Recommendation.objects.filter(
+            owner_id=self.get_config_owner_id()
+        ).select_related("question")
 
     def perform_create(self, serializer):
-        question_id = self.request.data.get("question")
+        question_id = self.get_own_pk(Question, self.request.data.get("question"))
         question = Question.objects.get(id=question_id, owner=self.request.user)
         serializer.save(owner=self.request.user, question=question)
 
@@ -336,6 +465,23 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         return Response({"token": token.key})
 
 
+def pearson_correlation(row):
+    """Calculate Pearson correlation coefficient from aggregated sums of points and scores"""
+    n = row["n"]
+    sum_points = float(row["sum_points"])
+    sum_score = float(row["sum_score"])
+
+    covariance = n * row["sum_points_score"] - sum_points * sum_score
+    variance = (n * row["sum_points_sq"] - sum_points**2) * (
+        n * row["sum_score_sq"] - sum_score**2
+    )
+
+    if variance <= 0:
+        return None
+
+    return round(covariance / math.sqrt(variance), 4)
+
+
 class AnalyticsViewSet(viewsets.ViewSet):
     """
     API endpoint for analytics and reporting.
@@ -343,74 +489,77 @@ class AnalyticsViewSet(viewsets.ViewSet):
 
     permission_classes = [IsAuthenticated]
 
+    def get_cached(self, name, compute, *key_parts):
+        """Return analytics cached under user's generation with per-action TTLs.
+
+        Additional key parts distinguish entries of parametrized actions.
+        """
+        soft_ttl, hard_ttl = get_cache_ttls(name)
+        cache_key = "_".join(
+            [analytics_cache_key(name, self.request.user.id), *map(str, key_parts)]
+        )
+
+        return get_or_refresh(cache_key, compute, soft_ttl, hard_ttl)
+
     @action(detail=False, methods=["get"])
     def lead_summary(self, request):
         """Get lead analytics summary"""
         user = request.user
         logger.info(f"Fetching lead summary for user {user.id}")
 
-        # Cache key based on user
-        cache_key = f"lead_summary_{user.id}"
-        cached_data = cache.get(cache_key)
-
-        if cached_data:
-            logger.info(f"Returning cached lead summary for user {user.id}")
-            return Response(cached_data)
+        def compute():
+            leads = Lead.objects.filter(owner=user)
 
-        leads = Lead.objects.filter(owner=user)
+            total_leads = leads.count()
+            avg_x_axis = leads.aggregate(avg=Avg("x_axis"))["avg"] or 0
+            avg_y_axis = leads.aggregate(avg=Avg("y_axis"))["avg"] or 0
+            avg_total_score = leads.aggregate(avg=Avg("total_score"))["avg"] or 0
 
-        total_leads = leads.count()
-        avg_x_axis = leads.aggregate(avg=Avg("x_axis"))["avg"] or 0
-        avg_y_axis = leads.aggregate(avg=Avg("y_axis"))["avg"] or 0
-        avg_total_score = leads.aggregate(avg=Avg("total_score"))["avg"] or 0
-
-        # Score distribution
-        score_ranges = {
-            "low": leads.filter(total_score__lt=20).count(),
-            "medium": leads.filter(total_score__gte=20, total_score__lt=40).count(),
-            "high": leads.filter(total_score__gte=40).count(),
-        }
+            # Score distribution
+            score_ranges = {
+                "low": leads.filter(total_score__lt=20).count(),
+                "medium": leads.filter(total_score__gte=20, total_score__lt=40).count(),
+                "high": leads.filter(total_score__gte=40).count(),
+            }
 
-        data = {
-            "total_leads": total_leads,
-            "average_scores": {
-                "x_axis": round(avg_x_axis, 2),
-                "y_axis": round(avg_y_axis, 2),
-                "total": round(avg_total_score, 2),
-            },
-            "score_distribution": score_ranges,
-        }
+            logger.info(
+                f"Generated lead summary for user {user.id}: {total_leads} leads"
+            )
 
-        # Cache for 5 minutes
-        cache.set(cache_key, data, 300)
-        logger.info(
-            f"Generated and cached lead summary for user {user.id}: {total_leads} leads"
-        )
+            return {
+                "total_leads": total_leads,
+                "average_scores": {
+                    "x_axis": round(avg_x_axis, 2),
+                    "y_axis": round(avg_y_axis, 2),
+                    "total": round(avg_total_score, 2),
+                },
+                "score_distribution": score_ranges,
+            }
 
-        return Response(data)
+        return Response(self.get_cached("lead_summary", compute))
 
     @action(detail=False, methods=["get"])
     def question_analytics(self, request):
         """Get analytics for questions"""
         user = request.user
 
-        # Cache key based on user
-        cache_key = f"question_analytics_{user.id}"
-        cached_data = cache.get(cache_key)
-
-        if cached_data:
-            return Response(cached_data)
-
-        questions = Question.objects.filter(owner=user).prefetch_related("answers")
+        def compute():
+            questions = Question.objects.filter(
+                owner_id=get_config_owner_id(user.pk)
+            ).prefetch_related("choices")
 
-        question_data = []
-        for question in questions:
-            # Get answer distribution for this question (answers are prefetched)
-            answers = question.answers.all()
-            answer_counts = answers.values("response").annotate(count=Count("response"))
+            question_data = []
+            for question in questions:
+                answers = Answer.objects.filter(
+                    lead__owner=user, field_name=question.field_name
+                )
+                answer_counts = (
+                    answers.values("response")
+                    .annotate(count=Count("response"))
+                    .order_by()
+                )
 
-            question_data.append(
-                {
+                data = {
                     "id": question.id,
                     "number": question.number,
                     "text": question.text,
@@ -419,12 +568,259 @@ class AnalyticsViewSet(viewsets.ViewSet):
                     "answer_distribution": list(answer_counts),
                     "total_answers": answers.count(),
                 }
+
+                if question.type == Question.MULTIPLE_CHOICES:
+                    # Counted over choices masks, responses join several choices
+                    data["choice_selections"] = question.count_choice_selections(
+                        answers
+                    )
+
+                question_data.append(data)
+
+            return question_data
+
+        return Response(self.get_cached("question_analytics", compute))
+
+    @action(detail=False, methods=["get"])
+    def timeseries(self, request):
+        """Get lead counts and average scores per hour, day or week.
+
+        Query parameters:
+        - interval: hour, day (default) or week
+        - start, end: ISO 8601 datetimes, last 30 days by default
+        - output: json (default) or csv
+        - answer__<field_name>__gte, answer__<field_name>__lte: answer ranges
+        """
+        query_serializer = TimeseriesQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        params = query_serializer.validated_data
+
+        trunc = {
+            TimeseriesQuerySerializer.HOUR: TruncHour,
+            TimeseriesQuerySerializer.DAY: TruncDay,
+            TimeseriesQuerySerializer.WEEK: TruncWeek,
+        }[params["interval"]]
+
+        leads = filter_leads_by_answer_ranges(
+            request.user,
+            # Filtering by owner and timestamp range is served by lead_owner_timestamp_idx
+            Lead.objects.filter(
+                owner=request.user,
+                timestamp__gte=params["start"],
+                timestamp__lt=params["end"],
+            ),
+            request.query_params,
+        )
+        rows = (
+            leads.annotate(period=trunc("timestamp"))
+            .values("period")
+            .annotate(
+                leads=Count("lead_id"),
+                x_axis=Avg("x_axis"),
+                y_axis=Avg("y_axis"),
+                total_score=Avg("total_score"),
+            )
+            .order_by("period")
+        )
+
+        fields = ["period", "leads", "x_axis", "y_axis", "total_score"]
+
+        def format_row(row):
+            return [
+                row["period"].isoformat(),
+                row["leads"],
+                *[round(row[f], 2) for f in ("x_axis", "y_axis", "total_score")],
+            ]
+
+        if params["output"] == TimeseriesQuerySerializer.CSV:
+            response = StreamingHttpResponse(
+                iter_csv(fields, (format_row(row) for row in rows.iterator())),
+                content_type="text/csv",
+            )
+            response["Content-Disposition"] = 'attachment; filename="timeseries.csv"'
+
+            return response
+
+        return Response(
+            {
+                "interval": params["interval"],
+                "start": params["start"],
+                "end": params["end"],
+                "results": [dict(zip(fields, format_row(row))) for row in rows],
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def points_contribution(self, request):
+        """Get per question points contribution to scores of leads created in range.
+
+        Returns mean and total points of each question, its share of X-axis and
+        Y-axis points and Pearson correlation of its points with lead total score.
+
+        Query parameters:
+        - start, end: ISO 8601 datetimes, last 30 days by default
+        """
+        query_serializer = DateRangeQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        start = query_serializer.validated_data["start"]
+        end = query_serializer.validated_data["end"]
+
+        def compute():
+            # Points of multiple values questions are repeated on every value
+            # answer, so only first answer of each lead and field is counted.
+            answers = Answer.objects.filter(
+                lead__owner=request.user,
+                lead__timestamp__gte=start,
+                lead__timestamp__lt=end,
+                points__isnull=False,
+            ).exclude(
+                Exists(
+                    Answer.objects.filter(
+                        lead_id=OuterRef("lead_id"),
+                        field_name=OuterRef("field_name"),
+                        pk__lt=OuterRef("pk"),
+                    )
+                )
+            )
+
+            stats = {
+                row["field_name"]: row
+                for row in answers.values("field_name").annotate(
+                    n=Count("pk"),
+                    sum_points=Sum("points"),
+                    sum_points_sq=Sum(
+                        F("points") * F("points"), output_field=FloatField()
+                    ),
+                    sum_score=Sum("lead__total_score"),
+                    sum_score_sq=Sum(
+                        F("lead__total_score") * F("lead__total_score"),
+                        output_field=FloatField(),
+                    ),
+                    sum_points_score=Sum(
+                        F("points") * F("lead__total_score"),
+                        output_field=FloatField(),
+                    ),
+                )
+            }
+
+            questions = list(
+                Question.objects.filter(owner_id=get_config_owner_id(request.user.pk))
+                .order_by("number")
+                .values(
+                    "field_name",
+                    "number",
+                    "text",
+                    "scoring_model__x_axis",
+                    "scoring_model__y_axis",
+                )
             )
 
-        # Cache for 5 minutes
-        cache.set(cache_key, question_data, 300)
+            def axis_total(axis):
+                return sum(
+                    stats[q["field_name"]]["sum_points"]
+                    for q in questions
+                    if q[f"scoring_model__{axis}"] and q["field_name"] in stats
+                )
+
+            x_axis_total = axis_total("x_axis")
+            y_axis_total = axis_total("y_axis")
+
+            data = []
+            for question in questions:
+                row = stats.get(question["field_name"])
+                total = row["sum_points"] if row else 0
+
+                data.append(
+                    {
+                        "field_name": question["field_name"],
+                        "number": question["number"],
+                        "text": question["text"],
+                        "answers": row["n"] if row else 0,
+                        "total_points": round(total, 2),
+                        "mean_points": round(total / row["n"], 2) if row else None,
+                        "x_axis_share": (
+                            round(total / x_axis_total, 4)
+                            if question["scoring_model__x_axis"] and x_axis_total
+                            else None
+                        ),
+                        "y_axis_share": (
+                            round(total / y_axis_total, 4)
+                            if question["scoring_model__y_axis"] and y_axis_total
+                            else None
+                        ),
+                        "total_score_correlation": (
+                            pearson_correlation(row) if row else None
+                        ),
+                    }
+                )
+
+            return data
+
+        return Response(
+            self.get_cached(
+                "points_contribution", compute, start.timestamp(), end.timestamp()
+            )
+        )
+
+    @action(detail=False, methods=["get"])
+    def catalogue_summary(self, request):
+        """Get lead summary of catalogue slaves merged from their daily rollups.
+
+        Available to catalogue masters. Returns summary of all selected slaves
+        together and summary of each of them. Summaries are merged from
+        rollups, so they take the same time regardless of number of leads.
+        Number of summarized slaves is limited by CATALOGUE_ANALYTICS setting.
+
+        Query parameters:
+        - start, end: ISO 8601 dates, days of all leads by default
+        - slave: ids of slaves to summarize, all slaves by default
+        """
+        catalogue = getattr(request.user, "catalogue_as_master", None)
+
+        if catalogue is None:
+            raise PermissionDenied("Available to catalogue masters only.")
 
-        return Response(question_data)
+        query_serializer = CatalogueSummaryQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        params = query_serializer.validated_data
+
+        slaves = catalogue.slaves.order_by("pk")
+        if "slave" in params:
+            slaves = slaves.filter(pk__in=params["slave"])
+
+        slaves = dict(slaves.values_list("pk", "username"))
+        max_slaves = settings.CATALOGUE_ANALYTICS["MAX_SLAVES"]
+
+        if len(slaves) > max_slaves:
+            raise serializers.ValidationError(
+                {
+                    "slave": [
+                        f"At most {max_slaves} slaves can be summarized at once, "
+                        f"select them by slave parameter."
+                    ]
+                }
+            )
+
+        total, by_slave = summarize_rollups(
+            list(slaves), params.get("start"), params.get("end")
+        )
+
+        return Response(
+            {
+                "start": params.get("start"),
+                "end": params.get("end"),
+                "total": total,
+                "slaves": [
+                    {"id": pk, "username": username, **by_slave[pk]}
+                    for pk, username in slaves.items()
+                ],
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def cache_stats(self, request):
+        """Get analytics cache hit/stale/miss/refresh counters of this process"""
+        return Response(get_cache_stats())
 
     @action(detail=False, methods=["get"])
     def recommendation_effectiveness(self, request):
@@ -433,14 +829,11 @@ class AnalyticsViewSet(viewsets.ViewSet):
         recommendations = (
             Recommendation.objects.filter(owner=user)
             .select_related("question")
-            .prefetch_related("question__answers__lead")
+            .annotate(triggered_count=Count("hits"))
         )
 
         rec_data = []
         for rec in recommendations:
-            # Count how many times this recommendation was triggered (answers are prefetched)
-            triggered_count = rec.question.answers.filter(lead__owner=user).count()
-
             rec_data.append(
                 {
                     "id": rec.id,
@@ -448,7 +841,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
                     "rule": rec.rule,
                     "response_text": rec.response_text,
                     "affiliate_name": rec.affiliate_name,
-                    "triggered_count": triggered_count,
+                    "triggered_count": rec.triggered_count,
                 }
             )
 
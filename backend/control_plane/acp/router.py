@@ -9,7 +9,8 @@ from datetime import datetime, timezone
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from django.contrib.auth import get_user_model
-from rest_framework.authtoken.models import Token
+
+from control_plane.principal_cache import clean_tenant_uuid, principal_cache
 
 from .types import ActionDef, Pack
 
@@ -33,6 +34,20 @@ def _validate_request(req: Any) -> Tuple[bool, Optional[str]]:
     return True, None
 
 
+def _get_default_tenant_uuid(bindings: Dict[str, Any]) -> Optional[str]:
+    """Tenant UUID from bindings or ACP_TENANT_ID/GOVERNANCE_TENANT_ID, None if not set or invalid."""
+    raw = bindings.get('governanceTenantId') or os.environ.get('ACP_TENANT_ID') or os.environ.get('GOVERNANCE_TENANT_ID')
+    tenant_uuid = clean_tenant_uuid(raw)
+    if raw and not tenant_uuid:
+        print(f"⚠️ WARNING: ACP_TENANT_ID/GOVERNANCE_TENANT_ID is not a valid UUID: '{raw}' (length: {len(raw)})")
+        print(f"⚠️ Repo B requires a UUID tenant ID. Set ACP_TENANT_ID to the tenant UUID from Repo B.")
+    elif not raw:
+        # Debug: log what env vars are available
+        env_vars_with_tenant = [k for k in os.environ.keys() if 'TENANT' in k.upper() or 'ACP' in k.upper()]
+        print(f"⚠️ DEBUG: ACP_TENANT_ID not found. Available related env vars: {env_vars_with_tenant}")
+    return tenant_uuid
+
+
 def _merge_packs(packs: List[Pack]) -> tuple[List[ActionDef], Dict[str, Callable]]:
     """Merge packs into single action registry."""
     all_actions: List[ActionDef] = []
@@ -60,6 +75,7 @@ def create_manage_router(
     packs: List[Pack],
     executor: Any = None,  # Optional executor adapter (Repo C)
     control_plane: Any = None,  # Optional control plane adapter (Repo B)
+    usage_meter: Any = None,  # Optional local usage meter, reconciled with Repo B
 ) -> Callable[[Dict, Dict], Dict]:
     """
     Returns router: (request, meta) -> response
@@ -78,6 +94,13 @@ def create_manage_router(
         action_registry[action.name] = (action, all_handlers[action.name])
         scope_map[action.name] = action.scope
 
+    # Environment-derived defaults, resolved once per router
+    # Fallback tenant UUID for users without UserTenantMapping (single-tenant installs)
+    default_tenant_uuid = _get_default_tenant_uuid(bindings)
+    # By default, only non-read scopes are authorized. Set ACP_AUTHORIZE_READS=true
+    # to enforce governance on read-only actions as well.
+    authorize_reads = str(os.environ.get("ACP_AUTHORIZE_READS", "false")).lower() in ("1", "true", "yes")
+
     def _log_audit(entry: Dict) -> None:
         if audit_adapter:
             audit_adapter.log(entry)
@@ -88,25 +111,30 @@ def create_manage_router(
         Returns warning dict if approaching limit, raises UpgradeRequiredError if limit reached.
         
         CRITICAL FIX #2: Free tier enforcement must live in Repo A kernel/router.
+        Usage is estimated by usage_meter if set, without calling Repo B per request.
         """
         if not tenant_uuid or not control_plane:
             return None  # Skip if no tenant or control plane (will fail auth anyway)
         
         try:
-            # Query Repo B for usage (current month)
-            now = datetime.now(timezone.utc)
-            period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
-            period_end = now.isoformat()
-            
             from control_plane.control_plane_adapter import UpgradeRequiredError, UsageResponse
-            usage = control_plane.get_usage(
-                tenant_id=tenant_uuid,
-                period_start=period_start,
-                period_end=period_end
-            )
+            if usage_meter is not None:
+                usage = usage_meter.get_usage(tenant_uuid)
+                limit_reached = usage_meter.is_limit_reached(usage)
+            else:
+                # Query Repo B for usage (current month)
+                now = datetime.now(timezone.utc)
+                period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
+                period_end = now.isoformat()
+                usage = control_plane.get_usage(
+                    tenant_id=tenant_uuid,
+                    period_start=period_start,
+                    period_end=period_end
+                )
+                limit_reached = usage.tier == "free" and usage.calls_used >= usage.calls_limit
             
             # Check if free tier and limit reached
-            if usage.tier == "free" and usage.calls_used >= usage.calls_limit:
+            if limit_reached:
                 # Generate upgrade URL (will be implemented in onboarding endpoint)
                 upgrade_url = f"/api/upgrade/checkout?tenant={tenant_uuid}"
                 raise UpgradeRequiredError(
@@ -117,7 +145,7 @@ def create_manage_router(
             
             # Check if approaching limit (90+ calls for free tier)
             if usage.tier == "free" and usage.calls_used >= 90:
-                calls_remaining = usage.calls_limit - usage.calls_used
+                calls_remaining = max(0, usage.calls_limit - usage.calls_used)
                 upgrade_url = f"/api/upgrade/checkout?tenant={tenant_uuid}"
                 return {
                     "message": f"You have {calls_remaining} free calls remaining. Add a payment method to continue after {usage.calls_limit} calls.",
@@ -142,63 +170,27 @@ def create_manage_router(
         """Extract and validate API key.
 
         For api-docs-template v1, we treat the **DRF Token** as the API key.
+        Principals of keys are cached in memory, see control_plane.principal_cache.
 
         Header: `X-API-Key: <token>`
-        Returns: (ok, tenant_id, api_key_id, scopes, user)
+        Returns: (ok, tenant_id, api_key_id, scopes, user, tenant_uuid)
         """
         api_key = req.headers.get("X-API-Key") or req.headers.get("x-api-key")
         if not api_key or not api_key.strip():
-            return False, None, None, None, None
+            return False, None, None, None, None, None
 
-        try:
-            token = Token.objects.select_related("user").get(key=api_key.strip())
-        except Token.DoesNotExist:
-            return False, None, None, None, None
+        principal = principal_cache.get(api_key.strip())
+        if principal is None:
+            return False, None, None, None, None, None
 
-        user = token.user
-        # For local operations, use user.id
-        local_tenant_id = str(user.id)
-        
-        # For Repo B (Governance Hub), get tenant UUID from user mapping (created during onboarding)
-        # Fallback to env var for backward compatibility
-        tenant_uuid = None
-        try:
-            from control_plane.models import UserTenantMapping
-            mapping = UserTenantMapping.objects.filter(user=user).first()
-            if mapping:
-                tenant_uuid = mapping.tenant_uuid
-                print(f"[AUTH] Found tenant_uuid from user mapping: {tenant_uuid}")
-        except Exception as e:
-            print(f"[AUTH] Warning: Could not load tenant mapping: {e}")
-        
-        # Fallback to env var (for backward compatibility or if mapping doesn't exist)
-        if not tenant_uuid:
-            tenant_uuid = bindings.get('governanceTenantId') or os.environ.get('ACP_TENANT_ID') or os.environ.get('GOVERNANCE_TENANT_ID')
-        
-        # Strip whitespace if present (common issue with env vars)
-        if tenant_uuid:
-            tenant_uuid = tenant_uuid.strip()
-        
-        # Validate that tenant_uuid is a UUID if provided
-        if tenant_uuid:
-            try:
-                # Try to parse as UUID to validate format
-                uuid.UUID(tenant_uuid)
-            except (ValueError, TypeError):
-                # Not a valid UUID - log warning and don't use it
-                print(f"⚠️ WARNING: ACP_TENANT_ID/GOVERNANCE_TENANT_ID is not a valid UUID: '{tenant_uuid}' (length: {len(tenant_uuid)})")
-                print(f"⚠️ Repo B requires a UUID tenant ID. Set ACP_TENANT_ID to the tenant UUID from Repo B.")
-                tenant_uuid = None
+        # For Repo B (Governance Hub), use tenant UUID from user mapping (created during onboarding)
+        # Fallback to env var for backward compatibility, only for users without mapping.
+        # Invalid mapping leaves tenant UUID unset, instead of acting for the default tenant.
+        if principal.has_tenant_mapping:
+            tenant_uuid = principal.tenant_uuid
         else:
-            # Debug: log what env vars are available
-            env_vars_with_tenant = [k for k in os.environ.keys() if 'TENANT' in k.upper() or 'ACP' in k.upper()]
-            print(f"⚠️ DEBUG: ACP_TENANT_ID not found. Available related env vars: {env_vars_with_tenant}")
-
-        # No scoped keys yet; treat all valid tokens as full control-plane access.
-        # Include all standard scopes for now (can be made configurable later)
-        scopes = ["manage.read", "manage.domain", "manage.governance"]
-        api_key_id = token.key
-        return True, local_tenant_id, api_key_id, scopes, user, tenant_uuid
+            tenant_uuid = default_tenant_uuid
+        return True, principal.local_tenant_id, api_key.strip(), list(principal.scopes), principal.user, tenant_uuid
 
     def router(request_body: Dict, meta: Dict) -> Dict:
         request_id = _generate_request_id()
@@ -307,10 +299,7 @@ def create_manage_router(
             }
 
         # Authorization check via Repo B
-        # By default, only non-read scopes are authorized. Set ACP_AUTHORIZE_READS=true
-        # to enforce governance on read-only actions as well.
         policy_decision_id = None
-        authorize_reads = str(os.environ.get("ACP_AUTHORIZE_READS", "false")).lower() in ("1", "true", "yes")
         should_authorize = control_plane and not dry_run and (required_scope != "manage.read" or authorize_reads)
         if should_authorize:
             # CRITICAL: Must have valid UUID tenant ID to call Repo B
@@ -549,6 +538,10 @@ def create_manage_router(
         
         _log_audit(audit_entry)
 
+        # Count billable call locally, Repo B counts it from audit event
+        if usage_meter is not None and tenant_uuid and not dry_run and action_def.billable:
+            usage_meter.record(tenant_uuid)
+
         response = {
             "ok": True,
             "request_id": request_id,
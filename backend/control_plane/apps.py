@@ -5,3 +5,7 @@ class ControlPlaneConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "control_plane"
     verbose_name = "Control Plane"
+
+    def ready(self):
+        # Connect signal handlers invalidating cached API key principals
+        from control_plane import principal_cache  # noqa: F401
@@ -0,0 +1,261 @@
+"""
+Buffered audit shipping to Repo B
+
+Audit events are put on a bounded in-memory queue and shipped by a
+background thread in batches of up to batch_size events, or whatever is
+queued after flush_interval seconds. Failed batches are retried with
+exponential backoff; events which still can't be shipped, or don't fit in
+the queue, are spilled to an on-disk journal (JSON lines) and replayed once
+Repo B accepts events again. Events are dropped only when there is no
+journal or it can't be written. Queue is flushed on shutdown.
+
+Journal may be shared by processes (e.g. Gunicorn workers), it is only
+accessed holding an exclusive flock of "<journal_path>.lock". Replay takes
+events out of journal first, events which still can't be shipped are
+appended back.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, journal is guarded only within process
+    fcntl = None
+
+
+class RejectedEvent(Exception):
+    """Raised by send when Repo B rejects event for good, it isn't retried"""
+
+
+class AuditShipper:
+    def __init__(
+        self,
+        send: Callable[[Dict], None],
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        journal_path: Optional[str] = None,
+        on_sent: Optional[Callable[[Dict], None]] = None,
+    ):
+        """
+        Args:
+            send: Ships single event, raises on failure
+            journal_path: File events are spilled to, events are dropped if not set
+            on_sent: Called with every event accepted by Repo B
+        """
+        self.send = send
+        self.on_sent = on_sent
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.journal_path = journal_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._journal_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        # Counters are updated by shipper thread and request threads
+        self._counters_lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.spilled = 0
+
+    def _count(self, counter: str, n: int = 1) -> None:
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def _start(self) -> None:
+        with self._thread_lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-shipper", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def enqueue(self, event: Dict) -> None:
+        """Queue event for shipping, spill it to journal if queue is full"""
+        self._start()
+        if self._stop.is_set():
+            self._spill([event])
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._spill([event])
+
+    def _next_batch(self) -> List[Dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _sent(self, event: Dict) -> None:
+        self._count("sent")
+        if self.on_sent is not None:
+            try:
+                self.on_sent(event)
+            except Exception as e:
+                print(f"Audit sent callback error (non-fatal): {e}")
+
+    def _ship(self, batch: List[Dict], retry: bool = True) -> List[Dict]:
+        """Ship events of batch, return ones which couldn't be shipped"""
+        pending = list(batch)
+        delay = self.backoff
+        attempts = self.max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            while pending:
+                try:
+                    self.send(pending[0])
+                except RejectedEvent as e:
+                    print(f"Audit event rejected (non-fatal): {e}")
+                    self._count("rejected")
+                except Exception as e:
+                    print(f"Audit shipping error (non-fatal): {e}")
+                    break
+                else:
+                    self._sent(pending[0])
+                pending.pop(0)
+            if not pending or attempt == attempts - 1:
+                break
+            # Waits less on shutdown
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_backoff)
+        return pending
+
+    @contextmanager
+    def _locked_journal(self):
+        """Hold journal of this and other processes sharing it"""
+        with self._journal_lock:
+            # Journal is replaced on replay, so lock is held on separate file
+            with open(f"{self.journal_path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _append_journal(self, events: List[Dict]) -> bool:
+        """Append events to journal, return False if it can't be written"""
+        try:
+            with self._locked_journal():
+                with open(self.journal_path, "a", encoding="utf-8") as journal:
+                    journal.writelines(json.dumps(event) + "\n" for event in events)
+        except OSError as e:
+            print(f"Audit journal error (non-fatal): {e}")
+            self._count("dropped", len(events))
+            return False
+        return True
+
+    def _spill(self, events: List[Dict]) -> None:
+        if not events:
+            return
+        if not self.journal_path:
+            self._count("dropped", len(events))
+            return
+        if self._append_journal(events):
+            self._count("spilled", len(events))
+
+    def _take_journal(self) -> List[str]:
+        """Remove up to batch_size events from journal, return their lines"""
+        with self._locked_journal():
+            try:
+                with open(self.journal_path, encoding="utf-8") as journal:
+                    lines = journal.readlines()
+            except FileNotFoundError:
+                return []
+
+            rest = lines[self.batch_size :]
+            if rest:
+                tmp_path = f"{self.journal_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as journal:
+                    journal.writelines(rest)
+                os.replace(tmp_path, self.journal_path)
+            else:
+                os.remove(self.journal_path)
+
+        return lines[: self.batch_size]
+
+    def _replay_journal(self) -> None:
+        """Ship up to batch_size events of journal, appending back ones which fail"""
+        if not self.journal_path:
+            return
+        try:
+            lines = self._take_journal()
+        except OSError as e:
+            print(f"Audit journal error (non-fatal): {e}")
+            return
+
+        batch = []
+        for line in lines:
+            try:
+                batch.append(json.loads(line))
+            except ValueError:
+                # Partially written on crash
+                self._count("dropped")
+        pending = self._ship(batch, retry=False)
+        if pending:
+            # Already counted as spilled
+            self._append_journal(pending)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                pending = self._ship(self._next_batch())
+                self._spill(pending)
+                if not pending:
+                    self._replay_journal()
+            except Exception as e:
+                print(f"Audit shipping error (non-fatal): {e}")
+
+    def flush(self) -> None:
+        """Ship queued events without retrying, spill them once shipping fails"""
+        failed = False
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            pending = batch if failed else self._ship(batch, retry=False)
+            failed = failed or bool(pending)
+            self._spill(pending)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop background thread and flush queue"""
+        self._stop.set()
+        with self._thread_lock:
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and counters"""
+        with self._counters_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "spilled": self.spilled,
+            }
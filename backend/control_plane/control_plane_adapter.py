@@ -7,8 +7,13 @@ authorization decisions.
 
 import hashlib
 import json
+import math
 import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 import requests
@@ -78,6 +83,160 @@ class UpgradeRequiredError(Exception):
         super().__init__(self.message)
 
 
+def parse_expires_at(value: Any) -> Optional[float]:
+    """Return expires_at of decision as epoch seconds, None if it can't be parsed
+
+    Repo B sends either ISO 8601 timestamp or epoch seconds or milliseconds.
+    """
+    try:
+        expires_at = float(value)
+    except (TypeError, ValueError):
+        pass
+    else:
+        if not math.isfinite(expires_at):
+            return None
+        # Epoch seconds or milliseconds
+        return expires_at / 1000 if expires_at > 1e11 else expires_at
+
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        expires_at = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
+
+
+class DecisionCache:
+    """
+    In-memory cache of authorization decisions of Repo B
+
+    Decisions are kept only as long as Repo B allows by decision_ttl_ms and
+    expires_at, capped by max_ttl_ms (deny_ttl_ms for denies); decisions
+    without either aren't cached, 'require_approval' never is. Entries are
+    keyed by (tenant, actor, action, policy version), and by request_hash if
+    key_request_hash is set. Policy version of tenant is the one of its last
+    decision, a new version drops decisions of older ones.
+    """
+
+    def __init__(self, max_size: int = 1024, max_ttl_ms: int = 60000,
+                 deny_ttl_ms: int = 5000, max_negative: int = 128,
+                 key_request_hash: bool = False):
+        self.max_size = max_size
+        self.max_ttl_ms = max_ttl_ms
+        self.deny_ttl_ms = deny_ttl_ms
+        self.max_negative = max_negative
+        self.key_request_hash = key_request_hash
+        self._entries = OrderedDict()  # key -> (expires at monotonic, response)
+        self._policy_versions: Dict[str, str] = {}
+        self._negative = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_key(self, request: AuthorizationRequest, policy_version: str) -> tuple:
+        actor = request.actor or {}
+        return (
+            request.tenant_id,
+            actor.get('type'),
+            actor.get('id'),
+            request.action,
+            policy_version,
+            request.request_hash if self.key_request_hash else None,
+        )
+
+    def _get_ttl(self, response: AuthorizationResponse) -> float:
+        """Return seconds response may be cached for, 0 if it may not"""
+        if response.decision not in ('allow', 'deny'):
+            return 0
+        ttls = []
+        if response.decision_ttl_ms is not None:
+            try:
+                ttls.append(float(response.decision_ttl_ms))
+            except (TypeError, ValueError):
+                return 0
+        if response.expires_at is not None:
+            expires_at = parse_expires_at(response.expires_at)
+            if expires_at is None:
+                return 0
+            ttls.append((expires_at - time.time()) * 1000)
+        if not ttls:
+            return 0
+        cap = self.deny_ttl_ms if response.decision == 'deny' else self.max_ttl_ms
+        return max(0, min(ttls + [cap])) / 1000
+
+    def _pop(self, key) -> None:
+        _, response = self._entries.pop(key)
+        if response.decision == 'deny':
+            self._negative -= 1
+
+    def get(self, request: AuthorizationRequest) -> Optional[AuthorizationResponse]:
+        now = time.monotonic()
+        with self._lock:
+            policy_version = self._policy_versions.get(request.tenant_id)
+            key = self._get_key(request, policy_version)
+            entry = self._entries.get(key) if policy_version is not None else None
+            if entry is not None and entry[0] <= now:
+                self._pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def store(self, request: AuthorizationRequest, response: AuthorizationResponse) -> None:
+        ttl = self._get_ttl(response)
+        with self._lock:
+            if self._policy_versions.get(request.tenant_id) != response.policy_version:
+                # Decisions of older policy version aren't valid anymore
+                for key in [k for k in self._entries if k[0] == request.tenant_id]:
+                    self._pop(key)
+                self._policy_versions[request.tenant_id] = response.policy_version
+            key = self._get_key(request, response.policy_version)
+            if key in self._entries:
+                self._pop(key)
+            if ttl <= 0 or self.max_size <= 0:
+                return
+            if response.decision == 'deny':
+                if self.max_negative <= 0:
+                    return
+                if self._negative >= self.max_negative:
+                    self._pop(next(k for k, (_, r) in self._entries.items() if r.decision == 'deny'))
+                    self.evictions += 1
+                self._negative += 1
+            self._entries[key] = (time.monotonic() + ttl, response)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._policy_versions.clear()
+            self._negative = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit rate metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'negative': self._negative,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
 class ControlPlaneAdapter:
     """Interface for requesting authorization from Governance Hub"""
     
@@ -90,7 +249,7 @@ class ControlPlaneAdapter:
         raise NotImplementedError
     
     def get_usage(self, tenant_id: str, period_start: Optional[str] = None, 
-                  period_end: Optional[str] = None) -> UsageResponse:
+                  period_end: Optional[str] = None, raise_errors: bool = False) -> UsageResponse:
         """
         Get usage statistics for a tenant
         
@@ -98,6 +257,7 @@ class ControlPlaneAdapter:
             tenant_id: Tenant UUID
             period_start: Start of period (ISO timestamp, defaults to start of current month)
             period_end: End of period (ISO timestamp, defaults to now)
+            raise_errors: Raise if platform is unreachable instead of returning free tier usage
         
         Returns:
             UsageResponse with tier, calls_used, calls_limit, etc.
@@ -108,20 +268,23 @@ class ControlPlaneAdapter:
 class HttpControlPlaneAdapter(ControlPlaneAdapter):
     """HTTP implementation - Calls Governance Hub /authorize endpoint"""
     
-    def __init__(self, platform_url: str, kernel_api_key: str):
+    def __init__(self, platform_url: str, kernel_api_key: str,
+                 decision_cache: Optional[DecisionCache] = None):
         """
         Initialize control plane adapter
         
         Args:
             platform_url: Repo B base URL (e.g., https://xxx.supabase.co)
             kernel_api_key: Kernel API key for authentication
+            decision_cache: Optional cache of authorization decisions
         """
         self.platform_url = platform_url.rstrip('/')
         self.kernel_api_key = kernel_api_key
+        self.decision_cache = decision_cache
     
     def authorize(self, request: AuthorizationRequest) -> AuthorizationResponse:
         """
-        Request authorization decision from Repo B
+        Request authorization decision from Repo B, or decision cache if set
         
         Args:
             request: AuthorizationRequest with kernel_id, tenant_id, actor, action, etc.
@@ -129,6 +292,16 @@ class HttpControlPlaneAdapter(ControlPlaneAdapter):
         Returns:
             AuthorizationResponse with decision
         """
+        if self.decision_cache is None:
+            return self._request_authorization(request)
+
+        response = self.decision_cache.get(request)
+        if response is None:
+            response = self._request_authorization(request)
+            self.decision_cache.store(request, response)
+        return response
+
+    def _request_authorization(self, request: AuthorizationRequest) -> AuthorizationResponse:
         url = f"{self.platform_url}/functions/v1/authorize"
         
         headers = {
@@ -276,7 +449,7 @@ class HttpControlPlaneAdapter(ControlPlaneAdapter):
             raise Exception(f"Policy proposal failed: {error_msg}")
     
     def get_usage(self, tenant_id: str, period_start: Optional[str] = None,
-                  period_end: Optional[str] = None) -> UsageResponse:
+                  period_end: Optional[str] = None, raise_errors: bool = False) -> UsageResponse:
         """
         Get usage statistics for a tenant from Repo B
         
@@ -284,6 +457,7 @@ class HttpControlPlaneAdapter(ControlPlaneAdapter):
             tenant_id: Tenant UUID
             period_start: Start of period (ISO timestamp, defaults to start of current month)
             period_end: End of period (ISO timestamp, defaults to now)
+            raise_errors: Raise if platform is unreachable instead of returning free tier usage
         
         Returns:
             UsageResponse with tier, calls_used, calls_limit, etc.
@@ -335,6 +509,8 @@ class HttpControlPlaneAdapter(ControlPlaneAdapter):
                 period_end=period_end,
             )
         except requests.exceptions.RequestException as e:
+            if raise_errors:
+                raise
             # If platform is unreachable, default to free tier with 0 calls
             # This allows the system to continue operating
             print(f"[USAGE] Usage query failed: {e}, defaulting to free tier")
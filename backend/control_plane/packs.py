@@ -28,6 +28,7 @@ from scoringengine.models import (
     Lead,
     Question,
     Recommendation,
+    RecommendationHit,
     ScoringModel,
     ValueRange,
 )
@@ -448,9 +449,20 @@ def handle_leads_create(params, ctx):
     x_axis, y_axis = calculate_x_and_y_scores(user, answers_data)
     total_score = x_axis + y_axis
 
-    # Populate recommendation fields (response_text, affiliate_*, redirect_url) onto answers_data
-    # so they persist into Answer rows.
-    collect_recommendations(user, answers_data)
+    # Triggered recommendations are stored as RecommendationHit rows
+    recommendations = collect_recommendations(user, answers_data)
+
+    recs = [
+        {
+            "field_name": r.question.field_name,
+            "response_text": r.response_text,
+            "affiliate_name": r.affiliate_name,
+            "affiliate_link": r.affiliate_link,
+            "redirect_url": r.redirect_url,
+        }
+        for r in recommendations
+        if r.response_text
+    ]
 
     if ctx.get("dry_run"):
         return {
@@ -460,21 +472,10 @@ def handle_leads_create(params, ctx):
                 "y_axis": float(y_axis),
                 "total_score": float(total_score),
                 "answers": answers_data,
+                "recommendations": recs,
             }
         }
 
-    recs = [
-        {
-            "field_name": a.get("field_name"),
-            "response_text": a.get("response_text"),
-            "affiliate_name": a.get("affiliate_name"),
-            "affiliate_link": a.get("affiliate_link"),
-            "redirect_url": a.get("redirect_url"),
-        }
-        for a in answers_data
-        if a.get("response_text")
-    ]
-
     with transaction.atomic():
         lead = Lead.objects.create(
             owner=user,
@@ -494,16 +495,16 @@ def handle_leads_create(params, ctx):
                     value=a.get("value"),
                     date_value=a.get("date_value"),
                     values=a.get("values"),
+                    choices_mask=a.get("choices_mask"),
                     points=a.get("points"),
-                    response_text=a.get("response_text", ""),
-                    affiliate_name=a.get("affiliate_name", ""),
-                    affiliate_image=a.get("affiliate_image", ""),
-                    affiliate_link=a.get("affiliate_link", ""),
-                    redirect_url=a.get("redirect_url", ""),
                 )
             )
 
         Answer.objects.bulk_create(answer_rows)
+        RecommendationHit.objects.bulk_create(
+            RecommendationHit(lead=lead, recommendation=r, version=r.version)
+            for r in recommendations
+        )
 
     return {
         "data": {
@@ -0,0 +1,155 @@
+"""
+In-process cache of principals resolved from API keys of /api/manage.
+
+Principal of an API key (DRF Token) is its user, local tenant id, Repo B
+tenant UUID from UserTenantMapping and scopes. Principals are kept in memory
+of the worker for ACP_PRINCIPAL_CACHE["TTL"] seconds, so repeat callers are
+authenticated without queries. Entries are dropped when the Token,
+UserTenantMapping or user changes; other workers see changes after TTL.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from control_plane.models import UserTenantMapping
+
+logger = logging.getLogger(__name__)
+
+# No scoped keys yet; all valid tokens have full control-plane access.
+DEFAULT_SCOPES = ("manage.read", "manage.domain", "manage.governance")
+
+
+class Principal(NamedTuple):
+    user: object
+    local_tenant_id: str
+    tenant_uuid: Optional[str]  # None when user has no (valid) tenant mapping
+    scopes: Tuple[str, ...]
+    has_tenant_mapping: bool = False
+
+    @property
+    def tenant_mapping_invalid(self) -> bool:
+        """User has tenant mapping, but its tenant UUID isn't a valid UUID"""
+        return self.has_tenant_mapping and self.tenant_uuid is None
+
+
+def clean_tenant_uuid(tenant_uuid: Optional[str]) -> Optional[str]:
+    """Return stripped tenant UUID, None if it isn't a valid UUID."""
+    if not tenant_uuid or not tenant_uuid.strip():
+        return None
+    tenant_uuid = tenant_uuid.strip()
+    try:
+        uuid.UUID(tenant_uuid)
+    except (ValueError, TypeError):
+        return None
+    return tenant_uuid
+
+
+def load_principal(api_key: str) -> Optional[Principal]:
+    try:
+        token = Token.objects.select_related("user").get(key=api_key)
+    except Token.DoesNotExist:
+        return None
+
+    user = token.user
+    mapping = UserTenantMapping.objects.filter(user=user).first()
+    tenant_uuid = None
+    if mapping:
+        tenant_uuid = clean_tenant_uuid(mapping.tenant_uuid)
+        if tenant_uuid is None:
+            logger.warning(
+                "Tenant UUID of user %s mapping is not a valid UUID: %r",
+                user.pk,
+                mapping.tenant_uuid,
+            )
+
+    return Principal(
+        user,
+        str(user.id),
+        tenant_uuid,
+        DEFAULT_SCOPES,
+        has_tenant_mapping=bool(mapping),
+    )
+
+
+class PrincipalCache:
+    """TTL/LRU cache of principals by API key."""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # api_key -> (expires_at, principal)
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str) -> Optional[Principal]:
+        """Return principal of API key, None if key is invalid.
+
+        Invalid keys aren't cached, new tokens are usable right away.
+        """
+        config = settings.ACP_PRINCIPAL_CACHE
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(api_key)
+                    return entry[1]
+                del self._entries[api_key]
+
+        principal = load_principal(api_key)
+
+        if principal is not None and config["TTL"] > 0:
+            with self._lock:
+                self._entries[api_key] = (now + config["TTL"], principal)
+                self._entries.move_to_end(api_key)
+                while len(self._entries) > config["MAX_SIZE"]:
+                    self._entries.popitem(last=False)
+
+        return principal
+
+    def invalidate(self, api_key: str) -> None:
+        with self._lock:
+            self._entries.pop(api_key, None)
+
+    def invalidate_user(self, user_id) -> None:
+        with self._lock:
+            for api_key in [
+                key
+                for key, (_, principal) in self._entries.items()
+                if principal.user.pk == user_id
+            ]:
+                del self._entries[api_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache()
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token_principal(sender, instance=None, **kwargs):
+    principal_cache.invalidate(instance.key)
+    principal_cache.invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserTenantMapping)
+def invalidate_mapping_principal(sender, instance=None, **kwargs):
+    principal_cache.invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_principal(sender, instance=None, **kwargs):
+    principal_cache.invalidate_user(instance.pk)
@@ -2,21 +2,31 @@
 Audit adapter that sends events to Repo B (Governance Hub)
 
 This replaces the StubAuditAdapter to send audit events to Repo B's /api/audit/ingest endpoint.
+Events are shipped in background by AuditShipper, see control_plane.audit_shipper.
+Delivery of billable events is reported to on_billable_sent, so usage meter
+knows which locally counted calls Repo B counts too.
 """
 
 import json
 import os
 import uuid
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import requests
 
+from control_plane.audit_shipper import AuditShipper, RejectedEvent
+
+# Key of queued and journaled billable events, holding id of adapter which
+# queued them; it isn't sent to Repo B
+BILLABLE_KEY = '_billable_by'
+
 
 class RepoBAuditAdapter:
     """Audit adapter that sends events to Repo B"""
     
     def __init__(self, governance_url: Optional[str] = None, kernel_id: Optional[str] = None,
-                 kernel_api_key: Optional[str] = None):
+                 kernel_api_key: Optional[str] = None, shipper_options: Optional[Dict] = None,
+                 on_billable_sent: Optional[Callable[[str], None]] = None):
         """
         Initialize audit adapter
         
@@ -24,12 +34,20 @@ class RepoBAuditAdapter:
             governance_url: Repo B base URL (optional, will use env var if not provided)
             kernel_id: Kernel ID (optional, will use env var if not provided)
             kernel_api_key: Kernel API key for authentication (optional, will use env var if not provided)
+            shipper_options: Keyword arguments of AuditShipper (queue size, batching, journal)
+            on_billable_sent: Called with tenant id of every billable event queued
+                by this adapter once Repo B accepts it
         """
         # Support both ACP_BASE_URL (new standard) and GOVERNANCE_HUB_URL (legacy)
         self.governance_url = (governance_url or os.environ.get('ACP_BASE_URL') or os.environ.get('GOVERNANCE_HUB_URL', '')).rstrip('/')
         self.kernel_id = kernel_id or os.environ.get('KERNEL_ID', 'leadscore-kernel')
         self.kernel_api_key = kernel_api_key or os.environ.get('ACP_KERNEL_KEY')
         self.integration = 'leadscore'
+        self.on_billable_sent = on_billable_sent
+        # Journal may hold events of other processes and earlier runs
+        self._id = uuid.uuid4().hex
+        self.shipper = AuditShipper(self._send_event, on_sent=self._on_sent, **(shipper_options or {}))
+        self._session = requests.Session()
     
     def _sanitize(self, obj: Any) -> Any:
         """Remove sensitive fields from object"""
@@ -59,7 +77,7 @@ class RepoBAuditAdapter:
     
     def log(self, entry: Dict) -> None:
         """
-        Send audit event to Repo B
+        Queue audit event for Repo B
         
         This is best-effort - failures should not block the main request
         """
@@ -130,24 +148,39 @@ class RepoBAuditAdapter:
             
             if entry.get('policy_decision_id'):
                 audit_event['policy_decision_id'] = entry.get('policy_decision_id')
+
+            if entry.get('billable') and entry.get('result') == 'success' and not entry.get('dry_run'):
+                audit_event[BILLABLE_KEY] = self._id
             
-            # Send to Repo B (async, best-effort)
-            url = f"{self.governance_url}/functions/v1/audit-ingest"
-            headers = {
-                'Content-Type': 'application/json',
-            }
-            
-            # Add kernel API key if available (Repo B may need to accept this)
-            if self.kernel_api_key:
-                headers['Authorization'] = f'Bearer {self.kernel_api_key}'
-            
-            # Fire and forget - don't wait for response
-            try:
-                requests.post(url, headers=headers, json=audit_event, timeout=2)
-            except:
-                # Silently fail - audit is best-effort
-                pass
+            # Shipped in background (best-effort)
+            self.shipper.enqueue(audit_event)
                 
         except Exception as e:
             # Log error but don't raise - audit should never block requests
             print(f"Audit logging error (non-fatal): {e}")
+
+    def _send_event(self, audit_event: Dict) -> None:
+        """Send audit event to Repo B, called by shipper thread"""
+        url = f"{self.governance_url}/functions/v1/audit-ingest"
+        headers = {
+            'Content-Type': 'application/json',
+        }
+        
+        # Add kernel API key if available (Repo B may need to accept this)
+        if self.kernel_api_key:
+            headers['Authorization'] = f'Bearer {self.kernel_api_key}'
+        
+        payload = {k: v for k, v in audit_event.items() if k != BILLABLE_KEY}
+        response = self._session.post(url, headers=headers, json=payload, timeout=2)
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            # Invalid event, retrying won't help
+            raise RejectedEvent(f"status {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+
+    def _on_sent(self, audit_event: Dict) -> None:
+        if self.on_billable_sent is not None and audit_event.get(BILLABLE_KEY) == self._id:
+            self.on_billable_sent(audit_event['tenant_id'])
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and drop counters of audit shipping"""
+        return self.shipper.stats()
@@ -0,0 +1,157 @@
+"""
+Local usage metering of billable calls per tenant and month
+
+Repo B counts usage from audit events. Instead of querying its /usage on
+every write action, the meter keeps the last usage reported by Repo B per
+tenant and period and adds billable calls counted locally since then. Usage
+older than reconcile_interval seconds is refreshed from Repo B in a
+background thread, only the first check of a tenant in a period waits for it.
+
+Repo B counts a call once its audit event is delivered, which may be long
+after the call when events are queued, retried or spilled to the journal.
+Local calls are therefore dropped on reconciliation only when the audit
+shipper confirmed their delivery before usage was fetched, see
+record_shipped. Calls whose events are dropped stay counted until the
+period ends.
+
+Each worker meters its own calls, calls of other workers show up after
+reconciliation, slack is the number of calls over the free tier limit
+tolerated for that.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from control_plane.control_plane_adapter import UsageResponse
+
+
+def get_period_start(now: Optional[datetime] = None) -> datetime:
+    """Start of current billing period (month, UTC)"""
+    now = now or datetime.now(timezone.utc)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class _Meter:
+    def __init__(self):
+        self.usage: Optional[UsageResponse] = None  # Last usage reported by Repo B
+        self.reconciled_at = 0.0
+        self.local_calls = 0  # Billable calls since usage was reported
+        self.shipped_calls = 0  # Local calls whose audit events were delivered
+        self.reconciling = False
+
+
+class UsageMeter:
+    """Usage of tenants estimated locally, reconciled with Repo B /usage"""
+
+    def __init__(
+        self, control_plane: Any, reconcile_interval: int = 60, slack: int = 0
+    ):
+        self.control_plane = control_plane
+        self.reconcile_interval = reconcile_interval
+        self.slack = slack
+        self._meters: Dict[Tuple[str, str], _Meter] = {}
+        self._lock = threading.Lock()
+
+    def _get_meter(self, tenant_id: str, period_start: str) -> _Meter:
+        key = (tenant_id, period_start)
+        meter = self._meters.get(key)
+        if meter is None:
+            # Meters of past periods aren't needed anymore
+            for old_key in [k for k in self._meters if k[0] == tenant_id]:
+                del self._meters[old_key]
+            meter = self._meters[key] = _Meter()
+        return meter
+
+    def reconcile(self, tenant_id: str, period_start: Optional[str] = None) -> None:
+        """Replace usage of tenant by one reported by Repo B"""
+        period_start = period_start or get_period_start().isoformat()
+        with self._lock:
+            meter = self._get_meter(tenant_id, period_start)
+            meter.reconciling = True
+            # Calls delivered so far are reported by Repo B from now on
+            shipped_calls = meter.shipped_calls
+
+        try:
+            # Fallback usage of unreachable Repo B mustn't replace the known one
+            usage = self.control_plane.get_usage(
+                tenant_id=tenant_id,
+                period_start=period_start,
+                period_end=datetime.now(timezone.utc).isoformat(),
+                raise_errors=True,
+            )
+        except Exception as e:
+            print(f"[USAGE] Usage reconciliation failed: {e}")
+            usage = None
+
+        with self._lock:
+            meter.reconciling = False
+            if usage is None:
+                # Previous usage and calls counted since are kept
+                return
+            meter.usage = usage
+            meter.reconciled_at = time.monotonic()
+            meter.local_calls = max(0, meter.local_calls - shipped_calls)
+            meter.shipped_calls -= shipped_calls
+
+    def _reconcile_in_background(self, tenant_id: str, period_start: str) -> None:
+        thread = threading.Thread(
+            target=self.reconcile,
+            args=(tenant_id, period_start),
+            name=f"usage-reconcile-{tenant_id}",
+            daemon=True,
+        )
+        thread.start()
+
+    def get_usage(self, tenant_id: str) -> UsageResponse:
+        """Return estimated usage of tenant in current period"""
+        period_start = get_period_start().isoformat()
+
+        with self._lock:
+            meter = self._get_meter(tenant_id, period_start)
+            cold = meter.usage is None
+            stale = time.monotonic() - meter.reconciled_at >= self.reconcile_interval
+            refresh = not cold and stale and not meter.reconciling
+            if refresh:
+                meter.reconciling = True
+
+        if cold:
+            self.reconcile(tenant_id, period_start)
+        elif refresh:
+            self._reconcile_in_background(tenant_id, period_start)
+
+        with self._lock:
+            usage = meter.usage
+            local_calls = meter.local_calls
+
+        if usage is None:
+            raise Exception("Usage of tenant is unknown")
+
+        return UsageResponse(
+            tenant_id=tenant_id,
+            tier=usage.tier,
+            calls_used=usage.calls_used + local_calls,
+            calls_limit=usage.calls_limit,
+            period_start=period_start,
+            period_end=datetime.now(timezone.utc).isoformat(),
+        )
+
+    def is_limit_reached(self, usage: UsageResponse) -> bool:
+        return (
+            usage.tier == "free" and usage.calls_used >= usage.calls_limit + self.slack
+        )
+
+    def record(self, tenant_id: str, calls: int = 1) -> None:
+        """Count billable calls of tenant"""
+        with self._lock:
+            self._get_meter(
+                tenant_id, get_period_start().isoformat()
+            ).local_calls += calls
+
+    def record_shipped(self, tenant_id: str, calls: int = 1) -> None:
+        """Count billable calls of tenant whose audit events Repo B accepted"""
+        with self._lock:
+            self._get_meter(
+                tenant_id, get_period_start().isoformat()
+            ).shipped_calls += calls
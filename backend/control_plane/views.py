@@ -5,6 +5,7 @@ ACP /manage endpoint view
 import json
 import os
 
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -18,8 +19,9 @@ from control_plane.adapters import (
 )
 from control_plane.repo_b_audit_adapter import RepoBAuditAdapter
 from control_plane.executor_adapter import HttpExecutorAdapter
-from control_plane.control_plane_adapter import HttpControlPlaneAdapter
+from control_plane.control_plane_adapter import DecisionCache, HttpControlPlaneAdapter
 from control_plane.packs import leadscoring_pack
+from control_plane.usage_meter import UsageMeter
 from control_plane.governance_pack import governance_pack
 
 # Initialize router once
@@ -61,6 +63,48 @@ def _send_heartbeat():
             print(f"⚠️ Heartbeat failed: {result.get('error')}")
 
 
+def _get_decision_cache():
+    """Cache of Repo B authorization decisions, None if disabled"""
+    config = settings.ACP_DECISION_CACHE
+    if not config['ENABLED']:
+        return None
+    return DecisionCache(
+        max_size=config['MAX_SIZE'],
+        max_ttl_ms=config['MAX_TTL_MS'],
+        deny_ttl_ms=config['DENY_TTL_MS'],
+        max_negative=config['MAX_NEGATIVE'],
+        key_request_hash=config['KEY_REQUEST_HASH'],
+    )
+
+
+def _get_usage_meter(control_plane, audit_adapter):
+    """Meter of usage reconciled with Repo B /usage in background, None if disabled"""
+    config = settings.ACP_USAGE_METER
+    if control_plane is None or not config['ENABLED']:
+        return None
+    usage_meter = UsageMeter(
+        control_plane,
+        reconcile_interval=config['RECONCILE_INTERVAL'],
+        slack=config['SLACK'],
+    )
+    # Repo B counts calls from delivered audit events
+    if isinstance(audit_adapter, RepoBAuditAdapter):
+        audit_adapter.on_billable_sent = usage_meter.record_shipped
+    return usage_meter
+
+
+def _get_shipper_options():
+    """Options of AuditShipper shipping audit events to Repo B"""
+    config = settings.ACP_AUDIT_SHIPPER
+    return {
+        'max_queue': config['MAX_QUEUE'],
+        'batch_size': config['BATCH_SIZE'],
+        'flush_interval': config['FLUSH_INTERVAL'],
+        'max_retries': config['MAX_RETRIES'],
+        'journal_path': config['JOURNAL_PATH'] or None,
+    }
+
+
 def _get_router():
     global _router, _control_plane
     if _router is None:
@@ -84,6 +128,7 @@ def _get_router():
             _control_plane = HttpControlPlaneAdapter(
                 platform_url=governance_url,
                 kernel_api_key=kernel_api_key,
+                decision_cache=_get_decision_cache(),
             )
             # Send heartbeat on startup
             try:
@@ -144,7 +189,8 @@ def _get_router():
             audit_adapter = RepoBAuditAdapter(
                 governance_url=governance_url,
                 kernel_id=bindings['kernelId'],
-                kernel_api_key=kernel_api_key
+                kernel_api_key=kernel_api_key,
+                shipper_options=_get_shipper_options(),
             )
         else:
             audit_adapter = StubAuditAdapter()
@@ -158,6 +204,7 @@ def _get_router():
             packs=[leadscoring_pack, governance_pack],  # Add governance pack
             executor=executor,  # Pass executor if available
             control_plane=_control_plane,  # Pass control plane if available
+            usage_meter=_get_usage_meter(_control_plane, audit_adapter),
         )
     return _router
 
@@ -61,7 +61,6 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
 ]
 THIRD_PARTY_APPS = [
-    "import_export",
     "rangefilter",
     "rest_framework",
     "rest_framework.authtoken",
@@ -317,5 +316,104 @@ CACHES = {
     }
 }
 
+# Analytics cache TTLs in seconds per AnalyticsViewSet action. Entry is served
+# as fresh until "soft" TTL, then served stale while single request refreshes
+# it, and dropped after "hard" TTL.
+ANALYTICS_CACHE_TTLS = {
+    "lead_summary": {
+        "soft": env.int("ANALYTICS_LEAD_SUMMARY_SOFT_TTL", default=300),
+        "hard": env.int("ANALYTICS_LEAD_SUMMARY_HARD_TTL", default=3600),
+    },
+    "question_analytics": {
+        "soft": env.int("ANALYTICS_QUESTION_ANALYTICS_SOFT_TTL", default=300),
+        "hard": env.int("ANALYTICS_QUESTION_ANALYTICS_HARD_TTL", default=3600),
+    },
+}
+
+# Background lead exports run by "run_export_jobs" command. STORAGE is dotted
+# path of storage class of finished files (e.g. object storage backend), default
+# file storage is used when empty. WORK_DIR (system temporary directory when
+# empty) keeps partially written files, so interrupted jobs are resumed from
+# their last checkpoint.
+EXPORT_JOBS = {
+    "STORAGE": env("EXPORT_JOBS_STORAGE", default=""),
+    "WORK_DIR": env("EXPORT_JOBS_WORK_DIR", default=""),
+    "MAX_PER_OWNER": env.int("EXPORT_JOBS_MAX_PER_OWNER", default=1),
+    "STALE_TIMEOUT": env.int("EXPORT_JOBS_STALE_TIMEOUT", default=300),
+}
+
+# Monthly partitioning of lead log table on PostgreSQL, see
+# scoringengine.partitions. Enabled before migrating, the table is partitioned
+# by migration, later by "create_lead_log_partitions --convert". The command
+# run periodically creates partitions for MONTHS_AHEAD months.
+LEAD_LOG_PARTITIONING = {
+    "ENABLED": env.bool("LEAD_LOG_PARTITIONING", default=False),
+    "MONTHS_AHEAD": env.int("LEAD_LOG_PARTITIONING_MONTHS_AHEAD", default=3),
+}
+
+# Archival of old leads by "archive_leads" command. Leads and lead log entries
+# older than LEADS_DAYS and LEAD_LOG_DAYS (0 keeps them, owners' retention
+# policies override both) are moved in batches of BATCH_SIZE rows to Parquet
+# files of STORAGE, dotted path of storage class (default file storage when
+# empty), and stay readable by id and date range.
+LEAD_ARCHIVE = {
+    "STORAGE": env("LEAD_ARCHIVE_STORAGE", default=""),
+    "BATCH_SIZE": env.int("LEAD_ARCHIVE_BATCH_SIZE", default=1000),
+    "LEADS_DAYS": env.int("LEAD_ARCHIVE_LEADS_DAYS", default=0),
+    "LEAD_LOG_DAYS": env.int("LEAD_ARCHIVE_LEAD_LOG_DAYS", default=0),
+}
+
+# Catalogue analytics summarizing leads of catalogue slaves from daily lead
+# rollups, see scoringengine.rollups. Requests summarize at most MAX_SLAVES
+# slaves.
+CATALOGUE_ANALYTICS = {
+    "MAX_SLAVES": env.int("CATALOGUE_ANALYTICS_MAX_SLAVES", default=500),
+}
+
+# Principals resolved from API keys of /api/manage kept in memory of worker,
+# see control_plane.principal_cache. Entries live for TTL seconds, at most
+# MAX_SIZE least recently used are kept.
+ACP_PRINCIPAL_CACHE = {
+    "TTL": env.int("ACP_PRINCIPAL_CACHE_TTL", default=300),
+    "MAX_SIZE": env.int("ACP_PRINCIPAL_CACHE_MAX_SIZE", default=1024),
+}
+
+# Authorization decisions of Repo B cached in memory of worker, see
+# control_plane.control_plane_adapter.DecisionCache. Decisions are cached for
+# TTL given by Repo B, at most MAX_TTL_MS (DENY_TTL_MS for denies), at most
+# MAX_SIZE decisions, MAX_NEGATIVE of them denies. With KEY_REQUEST_HASH
+# decisions are cached per request parameters.
+ACP_DECISION_CACHE = {
+    "ENABLED": env.bool("ACP_DECISION_CACHE", default=True),
+    "MAX_SIZE": env.int("ACP_DECISION_CACHE_MAX_SIZE", default=1024),
+    "MAX_TTL_MS": env.int("ACP_DECISION_CACHE_MAX_TTL_MS", default=60000),
+    "DENY_TTL_MS": env.int("ACP_DECISION_CACHE_DENY_TTL_MS", default=5000),
+    "MAX_NEGATIVE": env.int("ACP_DECISION_CACHE_MAX_NEGATIVE", default=128),
+    "KEY_REQUEST_HASH": env.bool("ACP_DECISION_CACHE_KEY_REQUEST_HASH", default=False),
+}
+
+# Local metering of billable /api/manage calls, see control_plane.usage_meter.
+# Usage is reconciled with Repo B every RECONCILE_INTERVAL seconds, free tier
+# calls over the limit are tolerated up to SLACK.
+ACP_USAGE_METER = {
+    "ENABLED": env.bool("ACP_USAGE_METER", default=True),
+    "RECONCILE_INTERVAL": env.int("ACP_USAGE_METER_RECONCILE_INTERVAL", default=60),
+    "SLACK": env.int("ACP_USAGE_METER_SLACK", default=0),
+}
+
+# Audit events of /api/manage shipped to Repo B in background, see
+# control_plane.audit_shipper. Events are queued (at most MAX_QUEUE), shipped in
+# batches of BATCH_SIZE or every FLUSH_INTERVAL seconds, retried MAX_RETRIES
+# times, then spilled to JOURNAL_PATH (dropped if empty) and replayed later.
+ACP_AUDIT_SHIPPER = {
+    "MAX_QUEUE": env.int("ACP_AUDIT_SHIPPER_MAX_QUEUE", default=1000),
+    "BATCH_SIZE": env.int("ACP_AUDIT_SHIPPER_BATCH_SIZE", default=50),
+    "FLUSH_INTERVAL": env.float("ACP_AUDIT_SHIPPER_FLUSH_INTERVAL", default=1.0),
+    "MAX_RETRIES": env.int("ACP_AUDIT_SHIPPER_MAX_RETRIES", default=3),
+    "JOURNAL_PATH": env(
+        "ACP_AUDIT_SHIPPER_JOURNAL_PATH", default="logs/audit-journal.jsonl"
+    ),
+}
+
 # Your stuff...
 # ------------------------------------------------------------------------------
@@ -17,13 +17,9 @@ TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
 # DATABASES
 # ------------------------------------------------------------------------------
-# Use in-memory SQLite for fast tests
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": ":memory:",
-    }
-}
+# Use in-memory SQLite for fast tests, TEST_DATABASE_URL runs them on another
+# database, e.g. local PostgreSQL for query plans of tests/test_query_plans.py
+DATABASES = {"default": env.db("TEST_DATABASE_URL", default="sqlite://:memory:")}
 
 # PASSWORDS
 # ------------------------------------------------------------------------------
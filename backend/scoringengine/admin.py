@@ -1,13 +1,26 @@
+import json
 import re
 
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 from django.contrib.auth import get_user_model
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.db.models import Exists, OuterRef, Q
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
-from django.urls import path
-from import_export.admin import ExportMixin
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.text import smart_split, unescape_string_literal
+from django.utils.timezone import now
 from rangefilter.filters import (
     BaseRangeFilter,
     DateRangeFilter,
@@ -18,6 +31,7 @@ from rangefilter.filters import (
 from rest_framework.authtoken import admin as drf_admin
 from rest_framework.authtoken.models import TokenProxy
 
+from scoringengine.exports import EXPORT_FORMATS, get_answer_columns, iter_leads_export
 from scoringengine.forms import TestPostLeadForm
 from scoringengine.helpers import (
     calculate_x_and_y_scores,
@@ -26,21 +40,41 @@ from scoringengine.helpers import (
 )
 from scoringengine.models import (
     Answer,
+    AnswerFacet,
     AnswerLog,
     Choice,
     DatesRange,
+    ExportJob,
     Lead,
     LeadLog,
+    LeadLogFacet,
+    LeadLogSearchDocument,
+    LeadSearchDocument,
     Question,
     Recommendation,
     RecommendationFieldsMixin,
+    RecommendationHit,
+    RecommendationVersion,
+    RetentionPolicy,
     ScoringModel,
     ValueRange,
 )
-from scoringengine.resources import LeadResource
+from scoringengine.pagination import (
+    EstimatedCountPaginator,
+    InvalidCursor,
+    clean_keyset_values,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    reverse_ordering,
+)
+from scoringengine.scoring_plan import get_config_owner_id, get_scoring_plan
+from users.scoring_config import fork_scoring_config
 
 User = get_user_model()
 
+CURSOR_VAR = "cursor"
+
 admin.site.site_title = "Scoring engine site admin"
 admin.site.site_header = "Scoring engine administration"
 
@@ -94,33 +128,22 @@ class OwnAdminSite(admin.AdminSite):
                 }
                 for field_name, response in form.cleaned_data.items()
             ]
-            collect_answers_values(request.user, answers_data)
+            plan = get_scoring_plan(request.user)
+            collect_answers_values(request.user, answers_data, plan)
 
-            x_axis, y_axis = calculate_x_and_y_scores(request.user, answers_data)
+            x_axis, y_axis = calculate_x_and_y_scores(request.user, answers_data, plan)
             total_score = x_axis + y_axis
 
-            collect_recommendations(request.user, answers_data)
+            recommendations = collect_recommendations(request.user, answers_data, plan)
 
             response["x_axis"] = x_axis
             response["y_axis"] = y_axis
             response["total_score"] = total_score
 
-            response["recommendations"] = dict(
-                [
-                    (
-                        answer["field_name"],
-                        {
-                            "response_text": answer["response_text"],
-                            "affiliate_name": answer["affiliate_name"],
-                            "affiliate_image": answer["affiliate_image"],
-                            "affiliate_link": answer["affiliate_link"],
-                            "redirect_url": answer["redirect_url"],
-                        },
-                    )
-                    for answer in answers_data
-                    if "response_text" in answer
-                ]
-            )
+            response["recommendations"] = {
+                recommendation.question.field_name: recommendation.get_fields_dict()
+                for recommendation in recommendations
+            }
 
         context = {
             **self.each_context(request),
@@ -171,6 +194,27 @@ class ValidateFieldNameModelAdminForm(forms.ModelForm):
         return cleaned_data
 
 
+def get_visible_owners(request):
+    """Return owners whose data user may see or None if not restricted"""
+    if request.user.is_superuser:
+        return None
+
+    if hasattr(request.user, "catalogue_as_master"):
+        return request.user.catalogue_as_master.slaves.all()
+
+    return [request.user]
+
+
+def get_search_terms(search_term: str) -> list:
+    """Split admin search query into terms, like default admin search does"""
+    return [
+        unescape_string_literal(bit)
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]
+        else bit
+        for bit in smart_split(search_term)
+    ]
+
+
 class RestrictedAdmin(admin.ModelAdmin):
     field_to_extend_help_text = None
 
@@ -238,6 +282,14 @@ class RestrictedAdmin(admin.ModelAdmin):
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
+class SharedScoringConfigAdminMixin:
+    def save_model(self, request, obj, form, change):
+        # Configuration shared with catalogue slave is copied to it on change
+        fork_scoring_config(obj.owner)
+
+        super().save_model(request, obj, form, change)
+
+
 class ChoiceInlineFormset(forms.models.BaseInlineFormSet):
     def clean(self):
         super().clean()
@@ -295,7 +347,7 @@ class QuestionAdminForm(forms.ModelForm):
         return self.cleaned_data.get("max_value")
 
 
-class QuestionAdmin(RestrictedAdmin):
+class QuestionAdmin(SharedScoringConfigAdminMixin, RestrictedAdmin):
     form = QuestionAdminForm
     inlines = [ChoiceInline]
     list_display = ("__str__", "field_name", "type", "multiple_values")
@@ -313,7 +365,9 @@ class QuestionAdmin(RestrictedAdmin):
         return my_urls + urls
 
     def api_request_template(self, request):
-        questions = request.user.questions.order_by("pk")
+        questions = Question.objects.filter(
+            owner_id=get_config_owner_id(request.user.pk)
+        ).order_by("pk")
 
         headers = [
             f"Authorization: Token {request.user.auth_token}",
@@ -372,7 +426,9 @@ class RecommendationFieldsAdminMixin:
         return fields
 
 
-class RecommendationAdmin(RecommendationFieldsAdminMixin, RestrictedAdmin):
+class RecommendationAdmin(
+    SharedScoringConfigAdminMixin, RecommendationFieldsAdminMixin, RestrictedAdmin
+):
     form = RuleAdminForm
     list_display = ("__str__", "response_text", "affiliate_name", "redirect_url")
     ordering = ["question__number"]
@@ -424,7 +480,7 @@ class ScoringModelAdminForm(ValidateFieldNameModelAdminForm):
     field_to_validate = "formula"
 
 
-class ScoringModelAdmin(RestrictedAdmin):
+class ScoringModelAdmin(SharedScoringConfigAdminMixin, RestrictedAdmin):
     form = ScoringModelAdminForm
     inlines = [ValueRangeInline, DatesRangeInline]
     list_display = ("__str__", "weight", "x_axis", "y_axis")
@@ -455,14 +511,61 @@ class ScoringModelAdmin(RestrictedAdmin):
         return [ValueRangeInline, DatesRangeInline]
 
 
-class AnswerInline(RecommendationFieldsAdminMixin, admin.StackedInline):
+class AnswerInline(admin.StackedInline):
     model = Answer
     extra = 0
 
 
-class AnswerLogInline(RecommendationFieldsAdminMixin, admin.StackedInline):
+class LeadLogAnswersFormSet(forms.models.BaseInlineFormSet):
+    """Formset of lead log answers, unpacked from the entry if it is packed.
+
+    Unpacked answers aren't saved, so the formset is only fit for viewing.
+    """
+
+    def get_queryset(self):
+        if self.instance.pk is None or self.instance.answers_data is None:
+            return super().get_queryset()
+
+        return self.instance.get_answers()
+
+
+class AnswerLogInline(admin.StackedInline):
     model = AnswerLog
+    formset = LeadLogAnswersFormSet
+    extra = 0
+
+
+class RecommendationHitInline(admin.TabularInline):
+    model = RecommendationHit
+    fields = ("recommendation", "version", "recommendation_fields")
+    readonly_fields = fields
     extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("recommendation__question")
+
+    @admin.display(description="Fields at version")
+    def recommendation_fields(self, obj):
+        version = RecommendationVersion.objects.filter(
+            recommendation_id=obj.recommendation_id, version=obj.version
+        ).first()
+
+        if version is None:
+            return "-"
+
+        return format_html_join(
+            "\n",
+            "<div><b>{}:</b> {}</div>",
+            (
+                (field_name, value)
+                for field_name, value in version.get_fields_dict().items()
+                if value
+            ),
+        )
 
 
 class AnswersQuerysetFilterMixin:
@@ -486,11 +589,25 @@ class AnswersQuerysetFilterMixin:
 
     def queryset(self, request, queryset):
         if self.form.is_valid():
-            field_path = self.field_path.replace("answers__", "")
             field_name = getattr(self, "field_name")
-            return queryset.filter(
+
+            if self.model_admin.model is Lead:
+                return AnswerFacet.filter_leads(
+                    queryset,
+                    field_name,
+                    gte=self.form.cleaned_data.get(self.lookup_kwarg_gte),
+                    lte=self.form.cleaned_data.get(self.lookup_kwarg_lte),
+                    owners=get_visible_owners(request),
+                )
+
+            field_path = self.field_path.replace("answers__", "")
+            answer_model = self.model_admin.model._meta.get_field(
+                "answers"
+            ).related_model
+
+            condition = Q(
                 Exists(
-                    Answer.objects.filter(
+                    answer_model.objects.filter(
                         lead_id=OuterRef("pk"),
                         field_name=field_name,
                         **dict(
@@ -504,6 +621,21 @@ class AnswersQuerysetFilterMixin:
                 )
             )
 
+            if self.model_admin.model is LeadLog:
+                # Packed entries can't be filtered by answers, they are matched
+                # by their facets
+                packed = LeadLogFacet.filter_entries(
+                    queryset.filter(answers_data__isnull=False),
+                    field_name,
+                    gte=self.form.cleaned_data.get(self.lookup_kwarg_gte),
+                    lte=self.form.cleaned_data.get(self.lookup_kwarg_lte),
+                    owners=get_visible_owners(request),
+                )
+
+                return queryset.filter(condition) | packed
+
+            return queryset.filter(condition)
+
         return queryset
 
 
@@ -528,7 +660,244 @@ def AnswerRangeFilterBuilder(
     return filter_cls
 
 
-class LeadAdminAbstract(ExportMixin, RestrictedAdmin):
+class LeadExportMixin:
+    """Stream export of changelist leads with answers pivoted to columns.
+
+    Leads are read in keyset paginated chunks, so memory use doesn't grow with
+    number of exported leads.
+    """
+
+    change_list_template = "admin/scoringengine/change_list_export.html"
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        my_urls = [
+            path(
+                "export/<str:export_format>/",
+                self.admin_site.admin_view(self.export_view),
+                name="%s_%s_export" % info,
+            ),
+            path(
+                "export-job/<str:export_format>/",
+                self.admin_site.admin_view(self.export_job_view),
+                name="%s_%s_export_job" % info,
+            ),
+        ]
+        return my_urls + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            "has_export_permission": self.has_view_permission(request),
+            "export_formats": {
+                export_format: label
+                for export_format, (label, _) in EXPORT_FORMATS.items()
+            },
+        }
+
+        return super().changelist_view(request, extra_context)
+
+    def get_export_answer_columns(self, request):
+        questions = Question.objects.order_by("number")
+        owners = get_visible_owners(request)
+
+        if owners is not None:
+            # Slaves sharing configuration of catalogue master have no questions
+            questions = questions.filter(
+                Q(owner__in=owners)
+                | Q(owner__catalogue_as_master__shared_configs__slave__in=owners)
+            )
+
+        return get_answer_columns(
+            questions.values_list("field_name", "type", "multiple_values")
+        )
+
+    def export_view(self, request, export_format):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+
+        opts = self.model._meta
+
+        try:
+            queryset = self.get_changelist_instance(request).get_queryset(request)
+        except IncorrectLookupParameters:
+            return HttpResponseRedirect(
+                reverse(
+                    f"{self.admin_site.name}:{opts.app_label}_{opts.model_name}_changelist"
+                )
+            )
+
+        chunks = iter_leads_export(
+            queryset, self.get_export_answer_columns(request), export_format
+        )
+        _, content_type = EXPORT_FORMATS[export_format]
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="{opts.model_name}-{now():%Y-%m-%d}.{export_format}"'
+
+        return response
+
+    def export_job_view(self, request, export_format):
+        """Schedule export of changelist leads to be run by `run_export_jobs`.
+
+        Filters and search of the changelist are validated here, job stores
+        them with answer columns and the worker resolves them again.
+        """
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+
+        opts = self.model._meta
+
+        try:
+            self.get_changelist_instance(request).get_queryset(request)
+        except IncorrectLookupParameters:
+            return HttpResponseRedirect(
+                reverse(
+                    f"{self.admin_site.name}:{opts.app_label}_{opts.model_name}_changelist"
+                )
+            )
+
+        job = ExportJob(
+            owner=request.user,
+            model_name=opts.model_name,
+            export_format=export_format,
+            query_string=request.GET.urlencode(),
+            answer_columns=json.dumps(self.get_export_answer_columns(request)),
+        )
+        job.save()
+
+        self.message_user(
+            request,
+            f"{job} scheduled, download link will show up here when it's done.",
+            messages.SUCCESS,
+        )
+
+        return HttpResponseRedirect(
+            reverse(f"{self.admin_site.name}:scoringengine_exportjob_changelist")
+        )
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist paginating large results by keyset instead of OFFSET.
+
+    Keyset pagination is used with default ordering when there are more than
+    `keyset_threshold` results or when cursor is given. Next and previous page
+    links then carry cursor of the last or the first row of current page, so
+    fetching any page costs the same as fetching the first one.
+    """
+
+    keyset_threshold = 10000
+
+    keyset = False
+    keyset_previous_url = None
+    keyset_next_url = None
+    result_count_estimated = False
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Cursor belongs to current filters and ordering, drop it from links
+        # changing them
+        return super().get_query_string(
+            {CURSOR_VAR: None, **(new_params or {})}, remove
+        )
+
+    def get_keyset_ordering(self, request) -> list:
+        ordering = [
+            field.replace("owner__id", "owner_id")
+            for field in self.model_admin.get_ordering(request)
+        ]
+
+        return ordering + ["-pk"]
+
+    def get_results(self, request):
+        cursor = request.GET.get(CURSOR_VAR)
+
+        if ORDER_VAR in self.params:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+
+        if not cursor and paginator.count <= self.keyset_threshold:
+            return super().get_results(request)
+
+        ordering = self.get_keyset_ordering(request)
+        fields = [field.lstrip("-") for field in ordering]
+
+        queryset = self.queryset
+        previous = False
+
+        if cursor:
+            try:
+                direction, *values = decode_cursor(cursor, len(ordering) + 1)
+                values = clean_keyset_values(queryset.model, ordering, values)
+            except InvalidCursor:
+                raise IncorrectLookupParameters
+
+            previous = direction == "previous"
+            queryset = queryset.filter(keyset_filter(ordering, values, previous))
+
+        if previous:
+            queryset = queryset.order_by(*reverse_ordering(ordering))
+        else:
+            queryset = queryset.order_by(*ordering)
+
+        # One more row tells whether there is another page in that direction
+        result_list = list(queryset[: self.list_per_page + 1])
+        has_more = len(result_list) > self.list_per_page
+        result_list = result_list[: self.list_per_page]
+
+        if previous:
+            result_list.reverse()
+
+        def page_url(direction, obj):
+            values = [getattr(obj, field) for field in fields]
+            return self.get_query_string(
+                {CURSOR_VAR: encode_cursor(direction, *values)}
+            )
+
+        has_previous = bool(cursor) and (has_more or not previous)
+        has_next = has_more or previous
+
+        self.keyset_previous_url = (
+            page_url("previous", result_list[0])
+            if has_previous and result_list
+            else None
+        )
+        self.keyset_next_url = (
+            page_url("next", result_list[-1]) if has_next and result_list else None
+        )
+
+        self.keyset = True
+        self.result_count = paginator.count
+        self.result_count_estimated = getattr(paginator, "estimated", False)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = True
+        self.paginator = paginator
+
+
+class LeadAdminAbstract(LeadExportMixin, RestrictedAdmin):
     list_display = (
         "lead_id",
         "x_axis",
@@ -538,7 +907,9 @@ class LeadAdminAbstract(ExportMixin, RestrictedAdmin):
     )
     ordering = ["owner__id", "-timestamp"]
     readonly_fields = ("timestamp",)
-    resource_classes = [LeadResource]
+    paginator = EstimatedCountPaginator
+    # Unfiltered count is a full table scan
+    show_full_result_count = False
     search_fields = ("lead_id", "answers__response")
 
     def has_add_permission(self, request, obj=None):
@@ -547,6 +918,9 @@ class LeadAdminAbstract(ExportMixin, RestrictedAdmin):
     def has_change_permission(self, request, obj=None):
         return False
 
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
     def get_list_filter(self, request):
         questions_qs = Question.objects.filter(
             type__in=[Question.DATE, Question.INTEGER, Question.SLIDER]
@@ -560,7 +934,10 @@ class LeadAdminAbstract(ExportMixin, RestrictedAdmin):
                 | Q(owner__in=request.user.catalogue_as_master.slaves.all())
             )
         else:
-            questions_qs = questions_qs.filter(owner=request.user)
+            # Slaves sharing configuration of master have no questions
+            questions_qs = questions_qs.filter(
+                owner_id=get_config_owner_id(request.user.pk)
+            )
 
         questions = {}
         for question in questions_qs.order_by("number"):
@@ -601,11 +978,152 @@ class LeadAdminAbstract(ExportMixin, RestrictedAdmin):
 
 
 class LeadAdmin(LeadAdminAbstract):
-    inlines = [AnswerInline]
+    inlines = [AnswerInline, RecommendationHitInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search leads by id and answers through indexed search documents.
+
+        Matches same terms as default search over `search_fields`, but without
+        joining answers and scanning every response.
+        """
+        search_terms = get_search_terms(search_term)
+
+        if not search_terms:
+            return queryset, False
+
+        queryset = LeadSearchDocument.filter_leads(
+            queryset, search_terms, owners=get_visible_owners(request)
+        )
+
+        return queryset, False
 
 
 class LeadLogAdmin(LeadAdminAbstract):
     inlines = [AnswerLogInline]
+    readonly_fields = LeadAdminAbstract.readonly_fields + ("recommendation_versions",)
+
+    @admin.display(description="Recommendations")
+    def recommendation_versions(self, obj):
+        return format_html_join(
+            "\n",
+            "<div><b>{}</b> (v{}): {}</div>",
+            (
+                (
+                    version.recommendation.question.field_name,
+                    version.version,
+                    version.response_text,
+                )
+                for version in obj.get_recommendation_versions()
+            ),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search entries by id and answers.
+
+        Answers of packed entries can't be searched, they are matched by their
+        search documents instead.
+        """
+        results, use_distinct = super().get_search_results(
+            request, queryset, search_term
+        )
+
+        search_terms = get_search_terms(search_term)
+
+        if not search_terms:
+            return results, use_distinct
+
+        packed = LeadLogSearchDocument.filter_entries(
+            queryset.filter(answers_data__isnull=False),
+            search_terms,
+            owners=get_visible_owners(request),
+        )
+
+        return results | packed, True
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "model_name",
+        "export_format",
+        "status",
+        "rows_exported",
+        "created_at",
+        "finished_at",
+        "download_link",
+    )
+    list_filter = ("status",)
+    readonly_fields = ("download_link",)
+    actions = ["retry"]
+
+    def get_queryset(self, request):
+        # Ensure user can access only their exports
+        query_set = super().get_queryset(request)
+
+        if not request.user.is_superuser:
+            query_set = query_set.filter(owner=request.user)
+
+        return query_set
+
+    def get_list_display(self, request):
+        list_display = super().get_list_display(request)
+
+        if request.user.is_superuser:
+            list_display += ("owner",)
+
+        return list_display
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        my_urls = [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="scoringengine_exportjob_download",
+            ),
+        ]
+        return my_urls + urls
+
+    @admin.display(description="File")
+    def download_link(self, obj):
+        if obj.status != ExportJob.DONE or not obj.file:
+            return "-"
+
+        return format_html(
+            '<a href="{}">Download</a>',
+            reverse(
+                f"{self.admin_site.name}:scoringengine_exportjob_download",
+                args=[obj.pk],
+            ),
+        )
+
+    def download_view(self, request, pk):
+        job = get_object_or_404(
+            self.get_queryset(request).filter(status=ExportJob.DONE), pk=pk
+        )
+
+        return FileResponse(
+            job.file.open("rb"), as_attachment=True, filename=job.get_filename()
+        )
+
+    @admin.action(description="Retry selected failed exports")
+    def retry(self, request, queryset):
+        # Failed jobs keep checkpoint, so retried export continues from it
+        updated = queryset.filter(status=ExportJob.FAILED).update(
+            status=ExportJob.PENDING, finished_at=None
+        )
+
+        self.message_user(request, f"{updated} exports scheduled again.")
+
+
+class RetentionPolicyAdmin(RestrictedAdmin):
+    list_display = ("__str__", "leads_days", "lead_log_days")
 
 
 class TokenAdmin(drf_admin.TokenAdmin):
@@ -631,5 +1149,7 @@ admin_site.register(Recommendation, RecommendationAdmin)
 admin_site.register(ScoringModel, ScoringModelAdmin)
 admin_site.register(Lead, LeadAdmin)
 admin_site.register(LeadLog, LeadLogAdmin)
+admin_site.register(ExportJob, ExportJobAdmin)
+admin_site.register(RetentionPolicy, RetentionPolicyAdmin)
 
 admin_site.register(TokenProxy, TokenAdmin)
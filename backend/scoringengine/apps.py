@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ScoringengineConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "scoringengine"
+
+    def ready(self):
+        # Connect signal handlers keeping lead rollups up to date
+        from scoringengine import rollups  # noqa: F401
@@ -0,0 +1,289 @@
+"""Archival of old leads into compressed Parquet files.
+
+Leads and lead log entries older than retention window of their owner are
+written to archive files in (timestamp, pk) ordered batches and deleted from
+database. Each archive holds a batch of single owner, so owner's archives
+read in order yield rows ordered by timestamp. Archived lead ids are indexed
+by ArchivedLead, archived leads are retrieved by id without scanning
+archives.
+
+Archived rows are rebuilt as unsaved leads, with answers and recommendation
+hits in place of prefetched ones, and serialized or exported like live
+leads.
+"""
+import heapq
+import json
+from collections import defaultdict
+from datetime import timedelta
+from operator import attrgetter
+from uuid import UUID
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils.timezone import now
+
+from scoringengine.cache import suppress_cache_invalidation
+from scoringengine.models import (
+    ArchivedLead,
+    Lead,
+    LeadArchive,
+    LeadLog,
+    RecommendationHit,
+    RetentionPolicy,
+)
+
+DEFAULT_BATCH_SIZE = 1000
+
+ARCHIVE_MODELS = {"lead": Lead, "leadlog": LeadLog}
+# Format: (LEAD_ARCHIVE setting, RetentionPolicy field)
+RETENTION_FIELDS = {
+    "lead": ("LEADS_DAYS", "leads_days"),
+    "leadlog": ("LEAD_LOG_DAYS", "lead_log_days"),
+}
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("lead_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("x_axis", pa.decimal128(12, 2)),
+        ("y_axis", pa.decimal128(12, 2)),
+        ("total_score", pa.decimal128(12, 2)),
+        ("customer_email", pa.string()),
+        ("customer_id", pa.string()),
+        # JSON made by LeadLog.dump_answers
+        ("answers", pa.string()),
+        # JSON of [recommendation id, version] of hits
+        ("recommendations", pa.string()),
+    ]
+)
+
+
+def get_archive_setting(name: str, default):
+    return getattr(settings, "LEAD_ARCHIVE", {}).get(name) or default
+
+
+def get_retention_days(owner_id, model_name: str) -> int:
+    """Return number of days owner's rows are kept for, 0 if they are kept forever"""
+    setting, field = RETENTION_FIELDS[model_name]
+
+    days = (
+        RetentionPolicy.objects.filter(owner_id=owner_id)
+        .values_list(field, flat=True)
+        .first()
+    )
+
+    if days is None:
+        days = get_archive_setting(setting, 0)
+
+    return days
+
+
+def write_archive(model_name: str, leads) -> bytes:
+    """Return Parquet file of leads"""
+    rows = [
+        {
+            "lead_id": str(lead.lead_id),
+            "timestamp": lead.timestamp,
+            "x_axis": lead.x_axis,
+            "y_axis": lead.y_axis,
+            "total_score": lead.total_score,
+            "customer_email": lead.customer_email,
+            "customer_id": lead.customer_id,
+            "answers": LeadLog.dump_answers(lead.get_answers()),
+            "recommendations": json.dumps(
+                [
+                    [hit.recommendation_id, hit.version]
+                    for hit in lead.recommendation_hits.all()
+                ]
+                if model_name == "lead"
+                else lead.recommendations
+            ),
+        }
+        for lead in leads
+    ]
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(
+        pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA), sink, compression="zstd"
+    )
+
+    return sink.getvalue().to_pybytes()
+
+
+def read_archive(archive: LeadArchive, filters=None) -> list:
+    """Return rows of archive file as dicts, optionally filtered like `pq.read_table`"""
+    with archive.file.open("rb") as archive_file:
+        data = archive_file.read()
+
+    return pq.read_table(pa.BufferReader(data), filters=filters).to_pylist()
+
+
+def build_lead(archive: LeadArchive, row: dict):
+    """Return unsaved lead or lead log entry of archive row"""
+    lead = ARCHIVE_MODELS[archive.model_name](
+        lead_id=UUID(row["lead_id"]),
+        timestamp=row["timestamp"],
+        x_axis=row["x_axis"],
+        y_axis=row["y_axis"],
+        total_score=row["total_score"],
+        customer_email=row["customer_email"] or "",
+        customer_id=row["customer_id"] or "",
+        owner_id=archive.owner_id,
+    )
+
+    # Served by related managers like prefetched objects
+    lead._prefetched_objects_cache = {
+        "answers": lead.build_answers(LeadLog.load_answers(row["answers"]))
+    }
+
+    if archive.model_name == "lead":
+        lead._prefetched_objects_cache["recommendation_hits"] = [
+            RecommendationHit(lead=lead, recommendation_id=pk, version=version)
+            for pk, version in json.loads(row["recommendations"])
+        ]
+    else:
+        lead.recommendations = json.loads(row["recommendations"])
+
+    return lead
+
+
+def archive_batch(model_name: str, owner_id, before, batch_size=DEFAULT_BATCH_SIZE):
+    """Move oldest owner's rows created before `before` to a new archive.
+
+    Return the archive, None if there is nothing to archive. File is stored
+    first, rows are deleted together with creating the archive, so rows are
+    never lost. File is removed if archive can't be created.
+    """
+    model = ARCHIVE_MODELS[model_name]
+    prefetch = ["answers", "recommendation_hits"] if model is Lead else ["answers"]
+
+    batch = list(
+        model.objects.filter(owner_id=owner_id, timestamp__lt=before)
+        .order_by("timestamp", "pk")
+        .prefetch_related(*prefetch)[:batch_size]
+    )
+
+    if not batch:
+        return None
+
+    archive = LeadArchive(
+        owner_id=owner_id,
+        model_name=model_name,
+        first_timestamp=batch[0].timestamp,
+        last_timestamp=batch[-1].timestamp,
+        rows=len(batch),
+    )
+    archive.file.save(
+        f"{model_name}-{owner_id}-{batch[0].timestamp:%Y-%m-%d}.parquet",
+        ContentFile(write_archive(model_name, batch)),
+        save=False,
+    )
+
+    try:
+        with transaction.atomic(), suppress_cache_invalidation(owner_id):
+            archive.save()
+
+            if model is Lead:
+                lead_ids = [lead.pk for lead in batch]
+
+                # Lead posted again with id of archived one points to latest archive
+                ArchivedLead.objects.filter(lead_id__in=lead_ids).delete()
+                ArchivedLead.objects.bulk_create(
+                    ArchivedLead(lead_id=lead_id, archive=archive)
+                    for lead_id in lead_ids
+                )
+
+            model.objects.filter(pk__in=[row.pk for row in batch]).delete()
+
+    except Exception:
+        archive.file.delete(save=False)
+        raise
+
+    return archive
+
+
+def archive_leads(model_name: str, owner_id, batch_size=DEFAULT_BATCH_SIZE, today=None):
+    """Archive owner's rows older than their retention window batch by batch.
+
+    Yield created archives.
+    """
+    days = get_retention_days(owner_id, model_name)
+
+    if not days:
+        return
+
+    before = (today or now()) - timedelta(days=days)
+
+    while True:
+        archive = archive_batch(model_name, owner_id, before, batch_size)
+
+        if archive is None:
+            return
+
+        yield archive
+
+
+def get_archived_lead(owner_id, lead_id):
+    """Return unsaved archived lead of owner, None if there is no such lead"""
+    try:
+        lead_id = UUID(str(lead_id))
+    except ValueError:
+        return None
+
+    archived = (
+        ArchivedLead.objects.filter(lead_id=lead_id, archive__owner_id=owner_id)
+        .select_related("archive")
+        .first()
+    )
+
+    if archived is None:
+        return None
+
+    rows = read_archive(archived.archive, filters=[("lead_id", "=", str(lead_id))])
+
+    return build_lead(archived.archive, rows[0]) if rows else None
+
+
+def _iter_archives_leads(archives, start, end):
+    for archive in archives:
+        for row in read_archive(archive):
+            if start is not None and row["timestamp"] < start:
+                continue
+            if end is not None and row["timestamp"] >= end:
+                continue
+
+            yield build_lead(archive, row)
+
+
+def iter_archived_leads(model_name: str, owner_id=None, start=None, end=None):
+    """Yield unsaved archived leads ordered by timestamp.
+
+    Leads are limited to owner and [start, end) timestamp range if provided,
+    only archives overlapping the range are read.
+    """
+    archives = LeadArchive.objects.filter(model_name=model_name).order_by(
+        "first_timestamp", "pk"
+    )
+
+    if owner_id is not None:
+        archives = archives.filter(owner_id=owner_id)
+    if start is not None:
+        archives = archives.filter(last_timestamp__gte=start)
+    if end is not None:
+        archives = archives.filter(first_timestamp__lt=end)
+
+    owners_archives = defaultdict(list)
+    for archive in archives:
+        owners_archives[archive.owner_id].append(archive)
+
+    # Archives of different owners overlap
+    return heapq.merge(
+        *(
+            _iter_archives_leads(owner_archives, start, end)
+            for owner_archives in owners_archives.values()
+        ),
+        key=attrgetter("timestamp"),
+    )
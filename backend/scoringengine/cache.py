@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = "cache_generation_{owner_id}"
+LOCK_KEY = "{key}_lock"
+
+DEFAULT_SOFT_TTL = 300
+DEFAULT_HARD_TTL = 3600
+DEFAULT_LOCK_TTL = 30
+COLD_MISS_WAIT = 0.2
+
+_local = threading.local()
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _generation_key(owner_id) -> str:
+    return GENERATION_KEY.format(owner_id=owner_id)
+
+
+def get_cache_generation(owner_id) -> int:
+    """Return current cache generation of owner, initializing it if missing.
+
+    Missing generation is seeded with current time in nanoseconds rather than 0,
+    so a generation evicted from cache never points back to entries stored
+    under an older one.
+    """
+    key = _generation_key(owner_id)
+    generation = cache.get(key)
+
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key, 0)
+
+    return generation
+
+
+def bump_cache_generation(owner_id) -> None:
+    """Move owner to a new cache generation, orphaning all keys of previous one"""
+    key = _generation_key(owner_id)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Generation is not set yet or was evicted
+        cache.set(key, time.time_ns(), None)
+
+
+def analytics_cache_key(prefix: str, owner_id) -> str:
+    """Build cache key of owner's analytics entry bound to current generation"""
+    return f"{prefix}_{owner_id}_v{get_cache_generation(owner_id)}"
+
+
+def _flush_pending_generations(owner_ids: set) -> None:
+    while owner_ids:
+        bump_cache_generation(owner_ids.pop())
+
+
+def cache_invalidation_suppressed() -> bool:
+    return getattr(_local, "suppressed", False)
+
+
+def invalidate_owner_cache(owner_id, using=None) -> None:
+    """Bump owner cache generation once the current transaction commits.
+
+    All invalidations requested within one transaction are coalesced, so every
+    owner is bumped only once regardless of how many rows were written.
+    """
+    connection = transaction.get_connection(using)
+
+    if not connection.in_atomic_block:
+        bump_cache_generation(owner_id)
+        return
+
+    # Reuse callback registered earlier in this transaction if it is still
+    # queued (it is discarded by Django on rollback).
+    pending = getattr(_local, "pending", None)
+    if pending is not None and any(
+        entry[1] is pending[1] for entry in connection.run_on_commit
+    ):
+        pending[0].add(owner_id)
+        return
+
+    owner_ids = {owner_id}
+    callback = lambda: _flush_pending_generations(owner_ids)  # noqa: E731
+    _local.pending = (owner_ids, callback)
+    transaction.on_commit(callback, using=using)
+
+
+@contextmanager
+def suppress_cache_invalidation(*owner_ids):
+    """Suppress per-row cache invalidation from model signals for bulk writes.
+
+    Provided owners are invalidated once when the block exits.
+    """
+    if cache_invalidation_suppressed():
+        yield
+    else:
+        _local.suppressed = True
+
+        try:
+            yield
+        finally:
+            _local.suppressed = False
+
+    for owner_id in owner_ids:
+        invalidate_owner_cache(owner_id)
+
+
+def _record(event: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def get_cache_stats() -> dict:
+    """Return per-process counters of analytics cache lookups"""
+    with _stats_lock:
+        return {event: _stats[event] for event in ("hit", "stale", "miss", "refresh")}
+
+
+def reset_cache_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def get_cache_ttls(name: str) -> Tuple[int, int]:
+    """Return (soft, hard) TTL in seconds configured for analytics action"""
+    ttls = getattr(settings, "ANALYTICS_CACHE_TTLS", {}).get(name, {})
+
+    return (
+        ttls.get("soft", DEFAULT_SOFT_TTL),
+        ttls.get("hard", DEFAULT_HARD_TTL),
+    )
+
+
+def get_or_refresh(key: str, compute, soft_ttl: int, hard_ttl: int):
+    """Return cached value computed by `compute`, serving stale value while refreshing.
+
+    Entry is considered fresh for `soft_ttl` seconds and kept for `hard_ttl`
+    seconds. Once stale, only the request acquiring the refresh lock recomputes
+    the value, concurrent requests keep getting the stale one. On a cold miss
+    other requests wait once for COLD_MISS_WAIT seconds, which covers quick
+    computations of lock holder, and compute the value themselves if it still
+    isn't stored, so they never wait longer than a short computation takes.
+    """
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry is not None and entry["fresh_until"] > now:
+        _record("hit")
+        return entry["value"]
+
+    lock_key = LOCK_KEY.format(key=key)
+    locked = cache.add(lock_key, 1, DEFAULT_LOCK_TTL)
+
+    if entry is not None and not locked:
+        _record("stale")
+        return entry["value"]
+
+    if not locked:
+        time.sleep(COLD_MISS_WAIT)
+        entry = cache.get(key)
+
+        if entry is not None:
+            _record("hit")
+            return entry["value"]
+
+        # Lock is free if previous holder failed without storing the value
+        locked = cache.add(lock_key, 1, DEFAULT_LOCK_TTL)
+
+    _record("refresh" if entry is not None else "miss")
+
+    try:
+        value = compute()
+        cache.set(
+            key, {"value": value, "fresh_until": time.time() + soft_ttl}, hard_ttl
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+    return value
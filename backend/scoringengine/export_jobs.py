@@ -0,0 +1,221 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+import pyarrow.parquet as pq
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpRequest, QueryDict
+from django.utils.timezone import now
+
+from scoringengine.admin import admin_site
+
+from scoringengine.exports import (
+    EXPORT_CHUNK_SIZE,
+    format_csv,
+    get_csv_header,
+    iter_lead_chunks,
+    iter_leads_parquet,
+)
+from scoringengine.models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PER_OWNER = 1
+DEFAULT_STALE_TIMEOUT = 300
+CLAIM_SCAN_LIMIT = 100
+
+
+def get_export_jobs_setting(name: str, default):
+    return getattr(settings, "EXPORT_JOBS", {}).get(name) or default
+
+
+def get_work_dir() -> str:
+    """Return directory of partially written export files, creating it if missing"""
+    work_dir = get_export_jobs_setting(
+        "WORK_DIR", os.path.join(tempfile.gettempdir(), "export_jobs")
+    )
+    os.makedirs(work_dir, exist_ok=True)
+
+    return work_dir
+
+
+def claim_export_jobs(limit: int) -> list:
+    """Mark up to `limit` runnable jobs as running and return them.
+
+    Pending jobs and running jobs without heartbeat for STALE_TIMEOUT seconds,
+    left by a stopped worker, are runnable while their owner has less than
+    MAX_PER_OWNER other running jobs.
+    """
+    if limit < 1:
+        return []
+
+    max_per_owner = get_export_jobs_setting("MAX_PER_OWNER", DEFAULT_MAX_PER_OWNER)
+    stale_before = now() - timedelta(
+        seconds=get_export_jobs_setting("STALE_TIMEOUT", DEFAULT_STALE_TIMEOUT)
+    )
+
+    claimed = []
+    with transaction.atomic():
+        candidates = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ExportJob.PENDING)
+                | Q(status=ExportJob.RUNNING, heartbeat_at__lt=stale_before)
+            )
+            .order_by("created_at")[:CLAIM_SCAN_LIMIT]
+        )
+        running = Counter(
+            ExportJob.objects.filter(
+                status=ExportJob.RUNNING, heartbeat_at__gte=stale_before
+            ).values_list("owner_id", flat=True)
+        )
+
+        for job in candidates:
+            if running[job.owner_id] >= max_per_owner:
+                continue
+
+            job.status = ExportJob.RUNNING
+            job.started_at = job.started_at or now()
+            job.heartbeat_at = now()
+            job.error = ""
+            job.save(update_fields=["status", "started_at", "heartbeat_at", "error"])
+
+            running[job.owner_id] += 1
+            claimed.append(job)
+
+            if len(claimed) >= limit:
+                break
+
+    return claimed
+
+
+def reset_progress(job):
+    job.rows_exported = 0
+    job.bytes_written = 0
+    job.last_timestamp = None
+    job.last_pk = ""
+
+
+def save_checkpoint(job, last_key, rows: int, bytes_written: int):
+    if last_key is not None:
+        job.last_timestamp, job.last_pk = last_key[0], str(last_key[1])
+
+    job.rows_exported += rows
+    job.bytes_written = bytes_written
+    job.heartbeat_at = now()
+    job.save(
+        update_fields=[
+            "rows_exported",
+            "bytes_written",
+            "last_timestamp",
+            "last_pk",
+            "heartbeat_at",
+        ]
+    )
+
+
+def write_csv(job, queryset, answer_columns, path, chunk_size):
+    """Write CSV export, appending chunks after checkpoint of interrupted run.
+
+    Every chunk of compressed export is written as separate gzip member, so
+    the file can be truncated at any checkpoint and continued.
+    """
+    answer_columns = dict.fromkeys(answer_columns, "response")
+
+    if job.export_format == "csv.gz":
+        encode = lambda text: gzip.compress(text.encode())  # noqa: E731
+    else:
+        encode = str.encode
+
+    resume = (
+        job.bytes_written > 0
+        and os.path.exists(path)
+        and os.path.getsize(path) >= job.bytes_written
+    )
+
+    with open(path, "r+b" if resume else "wb") as output:
+        if resume:
+            # Drop data written after the last checkpoint
+            output.truncate(job.bytes_written)
+            output.seek(job.bytes_written)
+        else:
+            reset_progress(job)
+            output.write(encode(format_csv([get_csv_header(answer_columns)])))
+            save_checkpoint(job, None, 0, output.tell())
+
+        after = (job.last_timestamp, job.last_pk) if job.last_timestamp else None
+
+        for last_key, rows in iter_lead_chunks(
+            queryset, answer_columns, chunk_size, after
+        ):
+            output.write(encode(format_csv(rows)))
+            output.flush()
+            os.fsync(output.fileno())
+
+            save_checkpoint(job, last_key, len(rows), output.tell())
+
+
+def write_parquet(job, queryset, answer_columns, path, chunk_size):
+    """Write Parquet export, always from the start as footer is written last"""
+    reset_progress(job)
+
+    with open(path, "wb") as output:
+        for data in iter_leads_parquet(queryset, answer_columns, chunk_size):
+            output.write(data)
+            save_checkpoint(job, None, 0, output.tell())
+
+    job.rows_exported = pq.ParquetFile(path).metadata.num_rows
+
+
+def get_job_queryset(job):
+    """Return leads exported by job, filtered like changelist it was scheduled from.
+
+    Filters, search and ordering of `query_string` are resolved by the model
+    admin of exported leads for job owner, as they are on the changelist.
+    """
+    model_admin = admin_site._registry[apps.get_model("scoringengine", job.model_name)]
+    request = HttpRequest()
+    request.GET = QueryDict(job.query_string)
+    request.user = job.owner
+
+    return model_admin.get_changelist_instance(request).get_queryset(request)
+
+
+def run_export_job(job, chunk_size=EXPORT_CHUNK_SIZE):
+    """Produce export file of claimed job and store it, marking job done or failed"""
+    path = os.path.join(get_work_dir(), f"export-job-{job.pk}.part")
+
+    try:
+        queryset = get_job_queryset(job)
+        answer_columns = json.loads(job.answer_columns)
+
+        if job.export_format == "parquet":
+            write_parquet(job, queryset, answer_columns, path, chunk_size)
+        else:
+            write_csv(job, queryset, answer_columns, path, chunk_size)
+
+        with open(path, "rb") as export_file:
+            job.file.save(job.get_filename(), File(export_file), save=False)
+
+        job.status = ExportJob.DONE
+        job.finished_at = now()
+        job.save()
+
+        os.remove(path)
+
+    except Exception as e:
+        logger.exception("Export job %s failed", job.pk)
+
+        # Checkpoint is kept, retried job continues from it
+        job.status = ExportJob.FAILED
+        job.error = str(e) or e.__class__.__name__
+        job.finished_at = now()
+        job.save(update_fields=["status", "error", "finished_at"])
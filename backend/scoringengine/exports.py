@@ -0,0 +1,377 @@
+import csv
+import io
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.db.models import Q
+
+from scoringengine.models import LeadAbstract, LeadLog, Question
+
+EXPORT_CHUNK_SIZE = 2000
+
+LEAD_EXPORT_FIELDS = ["lead_id", "timestamp", "x_axis", "y_axis", "total_score"]
+# Exported right after lead fields, kept for compatibility with older exports
+CUSTOMER_FIELDS = LeadAbstract.CUSTOMER_FIELDS
+
+ANSWER_ATTRIBUTES = ["response", "value", "date_value"]
+PARQUET_ANSWER_TYPES = {
+    "response": pa.string(),
+    "value": pa.decimal128(20, 2),
+    "date_value": pa.date32(),
+}
+
+# Format: (label, content type)
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv"),
+    "csv.gz": ("CSV (gzip)", "application/gzip"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+}
+
+
+class Echo:
+    """Pseudo-buffer returning written value instead of storing it, used for streaming CSV"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, rows):
+    """Yield CSV encoded lines of header and rows one by one"""
+    writer = csv.writer(Echo())
+
+    yield writer.writerow(header)
+
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_gzip(chunks, level=6):
+    """Yield gzip compressed bytes of text chunks"""
+    # wbits=31 emits gzip header and trailer, not a raw zlib stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def iter_keyset_chunks(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE, after=None):
+    """Yield lists of (pk, *fields) rows of queryset ordered by (timestamp, pk).
+
+    Fields must include timestamp. Each chunk is selected by keyset of the last
+    row of previous one, so every chunk is equally fast to fetch regardless of
+    its position in the table. Iteration starts after (timestamp, pk) key
+    `after` if provided.
+    """
+    fields = ["pk", *fields]
+    timestamp_index = fields.index("timestamp")
+
+    queryset = queryset.order_by("timestamp", "pk").values_list(*fields)
+
+    while True:
+        chunk_qs = queryset
+        if after is not None:
+            timestamp, pk = after
+            chunk_qs = chunk_qs.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+            )
+
+        chunk = list(chunk_qs[:chunk_size])
+
+        if not chunk:
+            return
+
+        yield chunk
+
+        after = (chunk[-1][timestamp_index], chunk[-1][0])
+
+
+def get_answer_columns(questions) -> dict:
+    """Return answer attribute exported for each question field name.
+
+    Takes (field_name, type, multiple_values) of questions. Single value date
+    and number answers are exported typed, other answers and answers to
+    questions of different types sharing field name as response text.
+    Customer fields are excluded, they are always exported.
+    """
+    columns = {}
+
+    for field_name, question_type, multiple_values in questions:
+        if field_name in CUSTOMER_FIELDS:
+            continue
+
+        attribute = "response"
+        if not multiple_values:
+            if question_type == Question.DATE:
+                attribute = "date_value"
+            elif question_type in (Question.INTEGER, Question.SLIDER):
+                attribute = "value"
+
+        if columns.get(field_name, attribute) != attribute:
+            attribute = "response"
+
+        columns[field_name] = attribute
+
+    return columns
+
+
+def iter_lead_chunks(
+    queryset, answer_columns: dict, chunk_size=EXPORT_CHUNK_SIZE, after=None
+):
+    """Yield (last key, rows) chunks of leads with answers pivoted to columns.
+
+    Customer fields are read from lead columns. Answers of each chunk are
+    fetched by a single query, packed answers of lead log are unpacked from
+    its rows. Responses to the same field name are joined with comma, like
+    `LeadAbstract.get_answer_response`, typed columns get first answer value.
+    Columns without answer are None. Last key is (timestamp, pk) of the last
+    lead of chunk, passing it as `after` continues export with the following
+    chunk.
+    """
+    answer_model = queryset.model._meta.get_field("answers").related_model
+    packed = queryset.model is LeadLog
+    fields = LEAD_EXPORT_FIELDS + CUSTOMER_FIELDS
+    # Rows start with pk
+    customer_index = len(LEAD_EXPORT_FIELDS) + 1
+    customer_end = customer_index + len(CUSTOMER_FIELDS)
+
+    if packed:
+        fields = fields + ["answers_data"]
+
+    for chunk in iter_keyset_chunks(queryset, fields, chunk_size, after):
+        answers = defaultdict(lambda: defaultdict(list))
+        unpacked_pks = []
+
+        for row in chunk:
+            if not packed or row[-1] is None:
+                unpacked_pks.append(row[0])
+                continue
+
+            for answer in LeadLog.unpack_answers(row[-1]):
+                if answer["field_name"] in answer_columns:
+                    answers[row[0]][answer["field_name"]].append(
+                        [answer.get(attribute) for attribute in ANSWER_ATTRIBUTES]
+                    )
+
+        if unpacked_pks:
+            answers_qs = (
+                answer_model.objects.filter(
+                    lead_id__in=unpacked_pks, field_name__in=answer_columns
+                )
+                .order_by("pk")
+                .values_list("lead_id", "field_name", *ANSWER_ATTRIBUTES)
+            )
+            for lead_id, field_name, *values in answers_qs.iterator():
+                answers[lead_id][field_name].append(values)
+
+        # Timestamp is the second exported field, after lead_id
+        yield (chunk[-1][2], chunk[-1][0]), [
+            [
+                *row[1:customer_index],
+                # Empty like columns of missing answers
+                *(value or None for value in row[customer_index:customer_end]),
+                *(
+                    _pivot_cell(answers[row[0]][field_name], attribute)
+                    for field_name, attribute in answer_columns.items()
+                ),
+            ]
+            for row in chunk
+        ]
+
+
+def iter_archived_lead_chunks(
+    leads, answer_columns: dict, chunk_size=EXPORT_CHUNK_SIZE
+):
+    """Yield chunks of rows of unsaved archived leads, like `iter_lead_chunks` rows"""
+    leads = iter(leads)
+
+    while True:
+        chunk = list(islice(leads, chunk_size))
+
+        if not chunk:
+            return
+
+        rows = []
+        for lead in chunk:
+            answers = defaultdict(list)
+            for answer in lead.get_answers():
+                if answer.field_name in answer_columns:
+                    answers[answer.field_name].append(
+                        [getattr(answer, attribute) for attribute in ANSWER_ATTRIBUTES]
+                    )
+
+            rows.append(
+                [
+                    *(getattr(lead, field_name) for field_name in LEAD_EXPORT_FIELDS),
+                    *(
+                        getattr(lead, field_name) or None
+                        for field_name in CUSTOMER_FIELDS
+                    ),
+                    *(
+                        _pivot_cell(answers[field_name], attribute)
+                        for field_name, attribute in answer_columns.items()
+                    ),
+                ]
+            )
+
+        yield rows
+
+
+def iter_lead_rows(
+    queryset, answer_columns: dict, chunk_size=EXPORT_CHUNK_SIZE, archived=None
+):
+    """Yield chunks of lead rows, see `iter_lead_chunks`.
+
+    Archived leads, older than leads of queryset, are exported first.
+    """
+    if archived is not None:
+        yield from iter_archived_lead_chunks(archived, answer_columns, chunk_size)
+
+    for _, rows in iter_lead_chunks(queryset, answer_columns, chunk_size):
+        yield rows
+
+
+def _pivot_cell(values, attribute):
+    if not values:
+        return None
+
+    index = ANSWER_ATTRIBUTES.index(attribute)
+
+    if attribute == "response":
+        return ", ".join(v[index] for v in values)
+
+    return next((v[index] for v in values if v[index] is not None), None)
+
+
+def format_csv(rows) -> str:
+    """Return CSV encoded rows"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+
+    return buffer.getvalue()
+
+
+def get_csv_header(answer_columns) -> list:
+    return LEAD_EXPORT_FIELDS + CUSTOMER_FIELDS + list(answer_columns)
+
+
+def iter_leads_csv(
+    queryset, answer_columns, chunk_size=EXPORT_CHUNK_SIZE, archived=None
+):
+    """Yield CSV export of leads, header first and then one string per chunk.
+
+    All answers are exported as response text.
+    """
+    answer_columns = dict.fromkeys(answer_columns, "response")
+
+    yield format_csv([get_csv_header(answer_columns)])
+
+    for rows in iter_lead_rows(queryset, answer_columns, chunk_size, archived):
+        yield format_csv(rows)
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only file collecting written bytes until drained.
+
+    Keeps track of position, as Parquet writer relies on `tell` for offsets
+    stored in file footer.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+
+        return data
+
+
+def get_parquet_schema(answer_columns: dict):
+    return pa.schema(
+        [
+            ("lead_id", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("x_axis", pa.decimal128(12, 2)),
+            ("y_axis", pa.decimal128(12, 2)),
+            ("total_score", pa.decimal128(12, 2)),
+            *((field_name, pa.string()) for field_name in CUSTOMER_FIELDS),
+            *(
+                (field_name, PARQUET_ANSWER_TYPES[attribute])
+                for field_name, attribute in answer_columns.items()
+            ),
+        ]
+    )
+
+
+def iter_leads_parquet(
+    queryset, answer_columns: dict, chunk_size=EXPORT_CHUNK_SIZE, archived=None
+):
+    """Yield Parquet export of leads, written as one row group per chunk"""
+    schema = get_parquet_schema(answer_columns)
+    sink = StreamSink()
+
+    with pq.ParquetWriter(
+        pa.PythonFile(sink, mode="w"), schema, compression="zstd"
+    ) as writer:
+        for rows in iter_lead_rows(queryset, answer_columns, chunk_size, archived):
+            columns = list(zip(*rows))
+            columns[0] = [str(lead_id) for lead_id in columns[0]]
+
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(column, type=field.type)
+                        for column, field in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            yield sink.drain()
+
+    # Footer is written on close
+    yield sink.drain()
+
+
+def iter_leads_export(
+    queryset,
+    answer_columns: dict,
+    export_format,
+    chunk_size=EXPORT_CHUNK_SIZE,
+    archived=None,
+):
+    """Yield bytes of leads export in one of EXPORT_FORMATS.
+
+    Archived leads, unsaved leads of `scoringengine.archive`, are exported
+    before leads of queryset if provided.
+    """
+    if export_format == "parquet":
+        return iter_leads_parquet(queryset, answer_columns, chunk_size, archived)
+
+    chunks = iter_leads_csv(queryset, answer_columns, chunk_size, archived)
+
+    if export_format == "csv.gz":
+        return iter_gzip(chunks)
+
+    return (chunk.encode() for chunk in chunks)
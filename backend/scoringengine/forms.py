@@ -4,6 +4,7 @@ from random import choice, randint
 from django import forms
 
 from scoringengine.models import Question
+from scoringengine.scoring_plan import get_config_owner_id
 
 
 class TestPostLeadForm(forms.Form):
@@ -11,7 +12,9 @@ class TestPostLeadForm(forms.Form):
         self.owner = kwargs.pop("owner")
         super().__init__(*args, **kwargs)
 
-        for question in Question.objects.filter(owner=self.owner).all():
+        for question in Question.objects.filter(
+            owner_id=get_config_owner_id(self.owner.pk)
+        ).all():
             if question.type == Question.DATE:
                 if question.multiple_values:
                     for n in range(0, 5):
@@ -1,35 +1,57 @@
 import re
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
 
 from rest_framework.exceptions import ValidationError
 
-from scoringengine.models import AnswerLog, Lead, LeadLog, Question
+from scoringengine.models import (
+    AnswerFacet,
+    Choice,
+    Lead,
+    LeadLog,
+    LeadLogFacet,
+    LeadLogSearchDocument,
+    Question,
+)
+from scoringengine.scoring_plan import get_config_owner_id, get_scoring_plan
+
+ANSWER_RANGE_PARAM_REGEX = r"^answer__(\w+?)__(gte|lte)$"
 
 
 def add_lead_log(lead: Lead):
-    old_lead = LeadLog.objects.create(
+    """Log lead as a single row, its answers and recommendation hits packed into it"""
+    answers = list(lead.answers.all())
+    entry = LeadLog.objects.create(
         lead_id=lead.lead_id,
         timestamp=lead.timestamp,
         x_axis=lead.x_axis,
         y_axis=lead.y_axis,
         total_score=lead.total_score,
+        customer_email=lead.customer_email,
+        customer_id=lead.customer_id,
         owner=lead.owner,
+        answers_data=LeadLog.pack_answers(answers),
+        recommendations=[
+            [hit.recommendation_id, hit.version]
+            for hit in lead.recommendation_hits.all()
+        ],
     )
-    for answer in lead.answers.all():
-        AnswerLog.objects.create(
-            lead=old_lead,
-            field_name=answer.field_name,
-            response=answer.response,
-            value_number=answer.value_number,
-            value=answer.value,
-            date_value=answer.date_value,
-            values=answer.get_values(),
-            points=answer.points,
-        )
+    index_lead_log(entry, answers)
+
 
+def index_lead_log(entry: LeadLog, answers):
+    """Write facets and search document of packed lead log entry.
 
-def collect_answers_values(owner, answers_data):
+    Packed answers can't be filtered by SQL, lead log admin search and answer
+    range filters match the entry by them.
+    """
+    LeadLogFacet.objects.bulk_create(LeadLogFacet.from_answers(entry, answers))
+    LeadLogSearchDocument.from_answers(entry, answers).save(force_insert=True)
+
+
+def collect_answers_values(owner, answers_data, plan=None):
     """Collect answers values for questions"""
+    plan = plan or get_scoring_plan(owner)
 
     for answer_data in answers_data:
         value_number = re.search(r"\[\d+\]$", answer_data["field_name"])
@@ -42,7 +64,7 @@ def collect_answers_values(owner, answers_data):
         else:
             field_name = answer_data["field_name"]
 
-        question = owner.questions.filter(field_name=field_name).first()
+        question = plan.get_question(field_name)
 
         if question is None:
             raise ValidationError(
@@ -86,7 +108,7 @@ def collect_answers_values(owner, answers_data):
             ).date()
 
         elif question.type == Question.CHOICES:
-            choice = question.choices.filter(slug=answer_data["response"]).first()
+            choice = plan.get_choice(question, answer_data["response"])
 
             if choice is None:
                 raise ValidationError(
@@ -121,10 +143,9 @@ def collect_answers_values(owner, answers_data):
                 )
 
         elif question.type == Question.MULTIPLE_CHOICES:
-            texts = []
-            values = []
+            choices = []
             for slug in answer_data["response"].split(","):
-                choice = question.choices.filter(slug=slug.strip()).first()
+                choice = plan.get_choice(question, slug.strip())
 
                 if choice is None:
                     raise ValidationError(
@@ -138,11 +159,11 @@ def collect_answers_values(owner, answers_data):
                         }
                     )
                 else:
-                    texts.append(choice.text)
-                    values.append(choice.value)
+                    choices.append(choice)
 
-            answer_data["response"] = ", ".join(texts)
-            answer_data["values"] = values
+            answer_data["response"] = ", ".join(choice.text for choice in choices)
+            answer_data["values"] = [choice.value for choice in choices]
+            answer_data["choices_mask"] = Choice.get_mask(choices)
 
         elif question.type == Question.SLIDER:
             try:
@@ -177,8 +198,9 @@ def collect_answers_values(owner, answers_data):
             answer_data["value"] = 1 if answer_data["response"] else 0
 
 
-def calculate_x_and_y_scores(owner, answers_data):
+def calculate_x_and_y_scores(owner, answers_data, plan=None):
     """Calculate answer points and X-axis and Y-axis scores for questions"""
+    plan = plan or get_scoring_plan(owner)
 
     answers = {}
     for answer in answers_data:
@@ -215,7 +237,7 @@ def calculate_x_and_y_scores(owner, answers_data):
 
     for answer_data in answers_data:
         field_name = answer_data["field_name"]
-        question = owner.questions.filter(field_name=field_name).first()
+        question = plan.get_question(field_name)
 
         if field_name not in points:
             p = question.calculate_points(answers)
@@ -233,13 +255,11 @@ def calculate_x_and_y_scores(owner, answers_data):
     return x_axis, y_axis
 
 
-def collect_recommendations(owner, answers_data):
-    """Collect recommendations by checking each question rule against provided answers"""
-
-    # Calculate scores first to make them available for rule evaluation
-    x_axis, y_axis = calculate_x_and_y_scores(owner, answers_data)
-    total_score = x_axis + y_axis
+def get_rule_answers(answers_data) -> dict:
+    """Return answer values by field name as seen by question rules.
 
+    Answers of multiple values questions are collected into lists.
+    """
     answers = {}
     for answer in answers_data:
         field_name = answer["field_name"]
@@ -262,13 +282,98 @@ def collect_recommendations(owner, answers_data):
             elif answer.get("value") is not None:
                 answers[field_name] = answer["value"]
 
+    return answers
+
+
+def collect_recommendations(owner, answers_data, plan=None) -> list:
+    """Return recommendations whose question rule matches provided answers"""
+    plan = plan or get_scoring_plan(owner)
+
+    # Calculate scores first to make them available for rule evaluation
+    x_axis, y_axis = calculate_x_and_y_scores(owner, answers_data, plan)
+    total_score = x_axis + y_axis
+
+    answers = get_rule_answers(answers_data)
+
     # Add calculated scores to answers for rule evaluation
     answers["x_axis_score"] = x_axis
     answers["y_axis_score"] = y_axis
     answers["total_score"] = total_score
 
+    recommendations = []
+    # Answers of multiple values question share its rule
+    checked_field_names = set()
+
     for answer_data in answers_data:
-        question = owner.questions.filter(field_name=answer_data["field_name"]).first()
+        field_name = answer_data["field_name"]
+
+        if field_name in checked_field_names:
+            continue
+        checked_field_names.add(field_name)
+
+        question = plan.get_question(field_name)
 
         if question.check_rule(answers):
-            answer_data.update(question.get_recommendation_dict())
+            recommendations.append(question.recommendation)
+
+    return recommendations
+
+
+def filter_leads_by_answer_ranges(owner, queryset, query_params):
+    """Filter leads by answer range query parameters like "answer__age__gte=30".
+
+    Numeric questions accept numbers and date questions accept YYYY-MM-DD dates.
+    """
+    ranges = {}
+    for param, raw_value in query_params.items():
+        re_param = re.match(ANSWER_RANGE_PARAM_REGEX, param)
+
+        if re_param:
+            field_name, lookup = re_param.groups()
+            ranges.setdefault(field_name, {})[lookup] = raw_value
+
+    if not ranges:
+        return queryset
+
+    question_types = dict(
+        Question.objects.filter(
+            owner_id=get_config_owner_id(owner.pk),
+            field_name__in=ranges.keys(),
+            type__in=[Question.DATE, Question.INTEGER, Question.SLIDER],
+        ).values_list("field_name", "type")
+    )
+
+    for field_name, bounds in ranges.items():
+        question_type = question_types.get(field_name)
+
+        if question_type is None:
+            raise ValidationError(
+                {
+                    "answer": [
+                        f"There are no numeric or date question with '{field_name}' field name"
+                    ]
+                }
+            )
+
+        for lookup, raw_value in bounds.items():
+            try:
+                bounds[lookup] = (
+                    date.fromisoformat(raw_value)
+                    if question_type == Question.DATE
+                    else Decimal(raw_value)
+                )
+
+            except (ValueError, InvalidOperation):
+                raise ValidationError(
+                    {
+                        "answer": [
+                            f"Value '{raw_value}' is invalid for question with '{field_name}' field name"
+                        ]
+                    }
+                )
+
+        queryset = AnswerFacet.filter_leads(
+            queryset, field_name, owners=[owner], **bounds
+        )
+
+    return queryset
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from scoringengine.archive import ARCHIVE_MODELS, archive_leads, get_archive_setting
+
+
+class Command(BaseCommand):
+    help = "Move leads and leads history older than retention window to archive files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Archive leads of this owner id only"
+        )
+        parser.add_argument(
+            "--model",
+            choices=list(ARCHIVE_MODELS),
+            help="Archive leads or leads history only",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=get_archive_setting("BATCH_SIZE", 1000)
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("Batch size must be positive")
+
+        owners = get_user_model().objects.order_by("pk")
+        if options["owner"]:
+            owners = owners.filter(pk=options["owner"])
+
+        model_names = [options["model"]] if options["model"] else list(ARCHIVE_MODELS)
+
+        archived = 0
+        for owner_id in owners.values_list("pk", flat=True).iterator():
+            for model_name in model_names:
+                for archive in archive_leads(
+                    model_name, owner_id, options["batch_size"]
+                ):
+                    archived += archive.rows
+                    self.stdout.write(
+                        f"Archived {archive.rows} {model_name} rows of owner "
+                        f"{owner_id} to {archive.file.name}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f"Done, archived {archived} rows"))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from scoringengine.models import Answer, AnswerFacet
+
+
+class Command(BaseCommand):
+    help = "Rebuild answer facets used for filtering leads by answer ranges"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Rebuild facets of this owner id only"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        answers = Answer.objects.filter(
+            Q(value__isnull=False) | Q(date_value__isnull=False)
+        )
+        facets = AnswerFacet.objects.all()
+
+        if options["owner"]:
+            answers = answers.filter(lead__owner_id=options["owner"])
+            facets = facets.filter(owner_id=options["owner"])
+
+        deleted, _ = facets.delete()
+        self.stdout.write(f"Deleted {deleted} facets")
+
+        answers = answers.only(
+            "pk", "field_name", "lead_id", "value", "date_value", "lead__owner_id"
+        ).select_related("lead")
+
+        created = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination keeps batches equally fast over large tables
+            batch = list(
+                answers.filter(pk__gt=last_pk).order_by("pk")[: options["batch_size"]]
+            )
+
+            if not batch:
+                break
+
+            facets_batch = []
+            for answer in batch:
+                facets_batch += AnswerFacet.from_answers(answer.lead.owner_id, [answer])
+
+            with transaction.atomic():
+                created += len(AnswerFacet.objects.bulk_create(facets_batch))
+
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Created {created} facets")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, created {created} facets"))
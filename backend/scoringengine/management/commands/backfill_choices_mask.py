@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scoringengine.models import Answer, AnswerLog, Choice, Question
+
+
+def parse_choices(response, choices_by_text) -> list:
+    """Return choices of response made by joining choice texts with comma.
+
+    Longest text is matched first, as choice texts may contain comma too.
+    None is returned if some part of response matches no choice.
+    """
+    parts = response.split(", ")
+    choices = []
+
+    start = 0
+    while start < len(parts):
+        for end in range(len(parts), start, -1):
+            choice = choices_by_text.get(", ".join(parts[start:end]))
+            if choice is not None:
+                choices.append(choice)
+                start = end
+                break
+        else:
+            return None
+
+    return choices
+
+
+class Command(BaseCommand):
+    help = "Fill choices mask of multiple choices answers from their responses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Fill masks of this owner id answers only"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        questions = Question.objects.filter(
+            type=Question.MULTIPLE_CHOICES
+        ).prefetch_related("choices")
+        if options["owner"]:
+            questions = questions.filter(owner_id=options["owner"])
+
+        for model in (Answer, AnswerLog):
+            updated = 0
+            for question in questions:
+                updated += self.backfill(model, question, options["batch_size"])
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Done, updated {updated} {model._meta.verbose_name_plural}"
+                )
+            )
+
+    def backfill(self, model, question, batch_size) -> int:
+        choices_by_text = {choice.text: choice for choice in question.choices.all()}
+
+        answers = model.objects.filter(
+            lead__owner_id=question.owner_id,
+            field_name=question.field_name,
+            choices_mask__isnull=True,
+        ).only("pk", "response")
+
+        updated = 0
+        last_pk = None
+        while True:
+            # Keyset pagination keeps batches equally fast over large tables
+            batch_qs = answers.order_by("pk")
+            if last_pk is not None:
+                batch_qs = batch_qs.filter(pk__gt=last_pk)
+
+            batch = list(batch_qs[:batch_size])
+
+            if not batch:
+                break
+
+            changed = []
+            for answer in batch:
+                choices = parse_choices(answer.response, choices_by_text)
+
+                if choices:
+                    answer.choices_mask = Choice.get_mask(choices)
+                    changed.append(answer)
+
+            with transaction.atomic():
+                model.objects.bulk_update(changed, ["choices_mask"])
+
+            updated += len(changed)
+            last_pk = batch[-1].pk
+
+        return updated
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from scoringengine.models import Lead, LeadAbstract, LeadLog
+
+
+class Command(BaseCommand):
+    help = "Fill customer email and id columns of leads and lead log from answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Fill columns of this owner id only"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model in (Lead, LeadLog):
+            updated = self.backfill(model, options["owner"], options["batch_size"])
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Done, updated {updated} {model._meta.verbose_name_plural}"
+                )
+            )
+
+    def backfill(self, model, owner, batch_size) -> int:
+        answer_model = model._meta.get_field("answers").related_model
+
+        fields = ["pk", *LeadAbstract.CUSTOMER_FIELDS]
+        if model is LeadLog:
+            fields.append("answers_data")
+
+        leads = model.objects.only(*fields)
+        if owner:
+            leads = leads.filter(owner_id=owner)
+
+        leads = leads.prefetch_related(
+            Prefetch(
+                "answers",
+                queryset=answer_model.objects.filter(
+                    field_name__in=LeadAbstract.CUSTOMER_FIELDS
+                )
+                .only("lead_id", "field_name", "response")
+                .order_by("pk"),
+            )
+        )
+
+        updated = 0
+        last_pk = None
+        while True:
+            # Keyset pagination keeps batches equally fast over large tables
+            batch_qs = leads.order_by("pk")
+            if last_pk is not None:
+                batch_qs = batch_qs.filter(pk__gt=last_pk)
+
+            batch = list(batch_qs[:batch_size])
+
+            if not batch:
+                break
+
+            changed = []
+            for lead in batch:
+                customer_fields = model.get_customer_fields(
+                    (answer.field_name, answer.response)
+                    for answer in lead.get_answers()
+                )
+
+                if any(getattr(lead, f) != v for f, v in customer_fields.items()):
+                    for field_name, value in customer_fields.items():
+                        setattr(lead, field_name, value)
+                    changed.append(lead)
+
+            with transaction.atomic():
+                model.objects.bulk_update(changed, LeadAbstract.CUSTOMER_FIELDS)
+
+            updated += len(changed)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Updated {updated} {model._meta.verbose_name_plural}")
+
+        return updated
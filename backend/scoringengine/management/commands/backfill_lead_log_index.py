@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scoringengine.models import LeadLog, LeadLogFacet, LeadLogSearchDocument
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild facets and search documents used for searching and filtering "
+        "packed lead log entries in admin"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Rebuild index of this owner id only"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        entries = LeadLog.objects.filter(answers_data__isnull=False)
+        facets = LeadLogFacet.objects.all()
+        documents = LeadLogSearchDocument.objects.all()
+
+        if options["owner"]:
+            entries = entries.filter(owner_id=options["owner"])
+            facets = facets.filter(owner_id=options["owner"])
+            documents = documents.filter(owner_id=options["owner"])
+
+        deleted, _ = facets.delete()
+        self.stdout.write(f"Deleted {deleted} facets")
+        deleted, _ = documents.delete()
+        self.stdout.write(f"Deleted {deleted} search documents")
+
+        entries = entries.only("pk", "lead_id", "owner_id", "answers_data")
+
+        indexed = 0
+        last_pk = None
+        while True:
+            # Keyset pagination keeps batches equally fast over large tables
+            batch_qs = entries.order_by("pk")
+            if last_pk is not None:
+                batch_qs = batch_qs.filter(pk__gt=last_pk)
+
+            batch = list(batch_qs[: options["batch_size"]])
+
+            if not batch:
+                break
+
+            facets_batch = []
+            documents_batch = []
+            for entry in batch:
+                answers = entry.get_answers()
+                facets_batch += LeadLogFacet.from_answers(entry, answers)
+                documents_batch.append(
+                    LeadLogSearchDocument.from_answers(entry, answers)
+                )
+
+            with transaction.atomic():
+                LeadLogFacet.objects.bulk_create(facets_batch)
+                LeadLogSearchDocument.objects.bulk_create(documents_batch)
+
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Indexed {indexed} lead log entries")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, indexed {indexed} lead log entries")
+        )
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from scoringengine.rollups import rebuild_lead_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily lead rollups used by catalogue analytics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Rebuild rollups of this owner id only"
+        )
+
+    def handle(self, *args, **options):
+        owners = get_user_model().objects.filter(leads__isnull=False).distinct()
+
+        if options["owner"]:
+            owners = get_user_model().objects.filter(pk=options["owner"])
+
+        created = 0
+        for owner_id in owners.values_list("pk", flat=True).order_by("pk"):
+            created += rebuild_lead_rollups(owner_id)
+            self.stdout.write(f"Rebuilt rollups of owner {owner_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, created {created} rollups"))
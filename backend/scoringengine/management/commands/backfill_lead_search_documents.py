@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from scoringengine.models import Answer, Lead, LeadSearchDocument
+
+
+class Command(BaseCommand):
+    help = "Rebuild search documents used for searching leads in admin"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Rebuild documents of this owner id only"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        leads = Lead.objects.all()
+        documents = LeadSearchDocument.objects.all()
+
+        if options["owner"]:
+            leads = leads.filter(owner_id=options["owner"])
+            documents = documents.filter(owner_id=options["owner"])
+
+        deleted, _ = documents.delete()
+        self.stdout.write(f"Deleted {deleted} search documents")
+
+        leads = leads.only("lead_id", "owner_id").prefetch_related(
+            Prefetch("answers", queryset=Answer.objects.only("lead_id", "response"))
+        )
+
+        created = 0
+        last_pk = None
+        while True:
+            # Keyset pagination keeps batches equally fast over large tables
+            batch_qs = leads.order_by("pk")
+            if last_pk is not None:
+                batch_qs = batch_qs.filter(pk__gt=last_pk)
+
+            batch = list(batch_qs[: options["batch_size"]])
+
+            if not batch:
+                break
+
+            with transaction.atomic():
+                created += len(
+                    LeadSearchDocument.objects.bulk_create(
+                        [
+                            LeadSearchDocument.from_answers(lead, lead.answers.all())
+                            for lead in batch
+                        ]
+                    )
+                )
+
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Created {created} search documents")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, created {created} search documents")
+        )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scoringengine.models import (
+    AnswerLog,
+    LeadLog,
+    LeadLogFacet,
+    LeadLogSearchDocument,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pack answers of lead log entries logged with AnswerLog rows into the entries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner", type=int, help="Compact entries of this owner id only"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        entries = LeadLog.objects.filter(answers_data__isnull=True)
+
+        if options["owner"]:
+            entries = entries.filter(owner_id=options["owner"])
+
+        entries = entries.only("pk", "lead_id", "owner_id").prefetch_related("answers")
+
+        compacted = 0
+        last_pk = None
+        while True:
+            # Keyset pagination keeps batches equally fast over large tables
+            batch_qs = entries.order_by("pk")
+            if last_pk is not None:
+                batch_qs = batch_qs.filter(pk__gt=last_pk)
+
+            batch = list(batch_qs[: options["batch_size"]])
+
+            if not batch:
+                break
+
+            facets = []
+            documents = []
+            for entry in batch:
+                answers = sorted(entry.answers.all(), key=lambda answer: answer.pk)
+                entry.answers_data = LeadLog.pack_answers(answers)
+                # Packed entries are searched and filtered by these
+                facets += LeadLogFacet.from_answers(entry, answers)
+                documents.append(LeadLogSearchDocument.from_answers(entry, answers))
+
+            with transaction.atomic():
+                LeadLog.objects.bulk_update(batch, ["answers_data"])
+                LeadLogFacet.objects.bulk_create(facets)
+                LeadLogSearchDocument.objects.bulk_create(documents)
+                AnswerLog.objects.filter(lead__in=batch).delete()
+
+            compacted += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Compacted {compacted} lead log entries")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, compacted {compacted} lead log entries")
+        )
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from scoringengine import partitions
+
+
+class Command(BaseCommand):
+    help = "Create monthly partitions of lead log table ahead of time on PostgreSQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=partitions.get_partitioning_setting(
+                "MONTHS_AHEAD", partitions.DEFAULT_MONTHS_AHEAD
+            ),
+            help="Number of months after current one to create partitions for",
+        )
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Partition lead log table first if it is not partitioned yet",
+        )
+
+    def handle(self, *args, **options):
+        if options["months"] < 0:
+            raise CommandError("Number of months can't be negative")
+
+        if connection.vendor != "postgresql":
+            self.stdout.write("Lead log partitioning is only supported on PostgreSQL")
+            return
+
+        table = partitions.get_lead_log_table()
+
+        if not partitions.is_partitioned(connection, table):
+            if not options["convert"]:
+                raise CommandError(
+                    f"Table {table} is not partitioned, run with --convert to partition it"
+                )
+
+            created = partitions.partition_table(connection, table, options["months"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Done, partitioned {table} into {created} monthly partitions"
+                )
+            )
+            return
+
+        created = partitions.create_future_partitions(
+            connection, table, options["months"]
+        )
+
+        for name in created:
+            self.stdout.write(f"Created partition {name}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, created {len(created)} partitions")
+        )
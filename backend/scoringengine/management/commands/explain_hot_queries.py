@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from scoringengine.models import Lead
+from scoringengine.query_plans import (
+    DEFAULT_ROWS_THRESHOLD,
+    HotQueryError,
+    capture_hot_queries,
+    explain,
+    find_regressions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Explain hot queries, failing on full scans of large tables and "
+        "suggesting composite indexes for them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner",
+            type=int,
+            help="Explain queries of this owner id, by default "
+            "of the owner of the latest lead",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=int,
+            default=DEFAULT_ROWS_THRESHOLD,
+            help="Fail on full scans of tables having more rows",
+        )
+
+    def handle(self, *args, **options):
+        if options["owner"]:
+            owner = get_user_model().objects.filter(pk=options["owner"]).first()
+        else:
+            lead = Lead.objects.order_by("-timestamp").select_related("owner").first()
+            owner = lead.owner if lead else None
+
+        if owner is None or not Lead.objects.filter(owner=owner).exists():
+            raise CommandError("Hot queries are explained for owner having leads")
+
+        if not owner.is_staff:
+            self.stdout.write("Admin queries are skipped, owner is not staff")
+
+        try:
+            captured = capture_hot_queries(owner)
+        except HotQueryError as e:
+            raise CommandError(str(e))
+
+        for name, queries in captured.items():
+            scans = ", ".join(
+                f"{table} ({'full scan' if full_scan else 'index'})"
+                for sql in queries
+                for table, full_scan in explain(sql)
+            )
+            self.stdout.write(f"{name}: {scans}")
+
+        regressions = find_regressions(captured, options["threshold"])
+
+        for name, table, rows, columns in regressions:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{name} scans {table} of {rows} rows, suggested index: "
+                    f"{table} ({', '.join(columns)})"
+                )
+            )
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} hot queries scan large tables")
+
+        self.stdout.write(self.style.SUCCESS("Done, No full scans of large tables"))
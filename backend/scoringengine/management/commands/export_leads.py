@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import is_naive, make_aware
+
+from scoringengine.archive import iter_archived_leads
+from scoringengine.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    get_answer_columns,
+    iter_leads_export,
+)
+from scoringengine.models import Lead, LeadLog, Question
+
+
+def parse_datetime(value):
+    value = datetime.fromisoformat(value)
+
+    return make_aware(value) if is_naive(value) else value
+
+
+class Command(BaseCommand):
+    help = "Export leads with answers pivoted to columns into a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the export file")
+        parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="parquet")
+        parser.add_argument(
+            "--owner", type=int, help="Export leads of this owner id only"
+        )
+        parser.add_argument(
+            "--history", action="store_true", help="Export leads history instead"
+        )
+        parser.add_argument(
+            "--start", type=parse_datetime, help="Export leads since ISO 8601 datetime"
+        )
+        parser.add_argument(
+            "--end", type=parse_datetime, help="Export leads before ISO 8601 datetime"
+        )
+        parser.add_argument(
+            "--archived", action="store_true", help="Export archived leads too"
+        )
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("Chunk size must be positive")
+
+        leads = (LeadLog if options["history"] else Lead).objects.all()
+        questions = Question.objects.order_by("number")
+
+        if options["owner"]:
+            leads = leads.filter(owner_id=options["owner"])
+            questions = questions.filter(owner_id=options["owner"])
+
+        if options["start"]:
+            leads = leads.filter(timestamp__gte=options["start"])
+        if options["end"]:
+            leads = leads.filter(timestamp__lt=options["end"])
+
+        archived = None
+        if options["archived"]:
+            archived = iter_archived_leads(
+                "leadlog" if options["history"] else "lead",
+                options["owner"],
+                options["start"],
+                options["end"],
+            )
+
+        answer_columns = get_answer_columns(
+            questions.values_list("field_name", "type", "multiple_values")
+        )
+
+        size = 0
+        with open(options["output"], "wb") as output:
+            for chunk in iter_leads_export(
+                leads,
+                answer_columns,
+                options["format"],
+                options["chunk_size"],
+                archived,
+            ):
+                size += output.write(chunk)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {size} bytes to {options['output']}")
+        )
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from scoringengine.export_jobs import claim_export_jobs, run_export_job
+from scoringengine.exports import EXPORT_CHUNK_SIZE
+
+
+def run_in_thread(job, chunk_size):
+    try:
+        run_export_job(job, chunk_size)
+    finally:
+        # Connections are per thread and would be left open otherwise
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run pending lead export jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Number of jobs run concurrently, single worker runs in main thread",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once there are no more jobs to run instead of polling",
+        )
+        parser.add_argument("--poll-interval", type=float, default=5)
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("Number of workers must be positive")
+
+        if options["workers"] == 1:
+            self.run_inline(options)
+        else:
+            self.run_pool(options)
+
+    def run_inline(self, options):
+        while True:
+            for job in claim_export_jobs(1):
+                self.stdout.write(f"Running export job {job.pk}")
+                run_export_job(job, options["chunk_size"])
+                break
+            else:
+                if options["once"]:
+                    return
+
+                time.sleep(options["poll_interval"])
+
+    def run_pool(self, options):
+        workers = options["workers"]
+        running = set()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                jobs = claim_export_jobs(workers - len(running))
+
+                for job in jobs:
+                    self.stdout.write(f"Running export job {job.pk}")
+                    running.add(pool.submit(run_in_thread, job, options["chunk_size"]))
+
+                if not running:
+                    if options["once"]:
+                        return
+
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                _, running = wait(
+                    running,
+                    timeout=options["poll_interval"],
+                    return_when=FIRST_COMPLETED,
+                )
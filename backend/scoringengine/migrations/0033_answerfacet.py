@@ -0,0 +1,68 @@
+# Generated manually for fast lead filtering by answer ranges
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("scoringengine", "0032_replace_arrayfield_with_textfield"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnswerFacet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field_name", models.CharField(max_length=200)),
+                (
+                    "value",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=20, null=True
+                    ),
+                ),
+                ("date_ordinal", models.IntegerField(blank=True, null=True)),
+                (
+                    "lead",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facets",
+                        to="scoringengine.lead",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="answer_facets",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="answerfacet",
+            index=models.Index(
+                fields=["owner", "field_name", "value", "lead"],
+                name="answerfacet_value_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answerfacet",
+            index=models.Index(
+                fields=["owner", "field_name", "date_ordinal", "lead"],
+                name="answerfacet_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated manually for indexed lead search in admin
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+TABLE = "scoringengine_leadsearchdocument"
+FTS_TABLE = "scoringengine_leadsearchdocument_fts"
+TRIGRAM_INDEX = "leadsearchdocument_trgm_idx"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX {TRIGRAM_INDEX} ON {TABLE} USING gin (document gin_trgm_ops)"
+        )
+
+    elif vendor == "sqlite":
+        # External content FTS5 table kept in sync with documents by triggers.
+        # Note that triggers are dropped whenever Django remakes the table, any
+        # later migration altering LeadSearchDocument must recreate them.
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"document, content='{TABLE}', content_rowid='rowid', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.rowid, new.document); "
+            "END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) "
+            "VALUES ('delete', old.rowid, old.document); "
+            "END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) "
+            "VALUES ('delete', old.rowid, old.document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.rowid, new.document); "
+            "END"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("scoringengine", "0033_answerfacet"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeadSearchDocument",
+            fields=[
+                (
+                    "lead",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="scoringengine.lead",
+                    ),
+                ),
+                ("document", models.TextField()),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lead_search_documents",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
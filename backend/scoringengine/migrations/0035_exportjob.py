@@ -0,0 +1,102 @@
+# Generated manually for background lead exports
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("scoringengine", "0034_leadsearchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_name",
+                    models.CharField(
+                        choices=[("lead", "Leads"), ("leadlog", "Leads history")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "export_format",
+                    models.CharField(
+                        choices=[
+                            ("csv", "CSV"),
+                            ("csv.gz", "CSV (gzip)"),
+                            ("parquet", "Parquet"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "query_string",
+                    models.TextField(
+                        blank=True,
+                        help_text="Changelist filters and search of exported leads",
+                    ),
+                ),
+                (
+                    "answer_columns",
+                    models.TextField(
+                        blank=True,
+                        help_text="JSON of exported answer columns, set on first run",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("P", "Pending"),
+                            ("R", "Running"),
+                            ("D", "Done"),
+                            ("F", "Failed"),
+                        ],
+                        default="P",
+                        max_length=1,
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+                ("rows_exported", models.PositiveBigIntegerField(default=0)),
+                ("bytes_written", models.PositiveBigIntegerField(default=0)),
+                ("last_timestamp", models.DateTimeField(blank=True, null=True)),
+                ("last_pk", models.CharField(blank=True, max_length=64)),
+                ("file", models.FileField(blank=True, upload_to="exports/%Y/%m/")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("heartbeat_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="export_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-created_at",),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="exportjob",
+            index=models.Index(
+                fields=["status", "created_at"], name="exportjob_status_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated manually for keyset pagination of leads in admin
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0035_exportjob"),
+    ]
+
+    operations = [
+        # Match admin ordering by owner and timestamp with primary key as
+        # tiebreaker, so a keyset page is read by a single index range scan.
+        # Lead log uses its primary key as lead_id isn't unique there.
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["owner", "timestamp", "lead_id"], name="lead_owner_ts_pk_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leadlog",
+            index=models.Index(
+                fields=["owner", "timestamp", "id"], name="leadlog_owner_ts_pk_idx"
+            ),
+        ),
+    ]
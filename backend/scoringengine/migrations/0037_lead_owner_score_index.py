@@ -0,0 +1,23 @@
+# Generated manually for lead listing API
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0036_lead_keyset_indexes"),
+    ]
+
+    operations = [
+        # Serves top scored leads of owner, with primary key as tiebreaker
+        # of cursor pagination. Listing by timestamp is served by
+        # lead_owner_ts_pk_idx.
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["owner", "total_score", "lead_id"],
+                name="lead_owner_score_pk_idx",
+            ),
+        ),
+    ]
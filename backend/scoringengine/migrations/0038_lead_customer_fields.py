@@ -0,0 +1,58 @@
+# Generated manually for customer lookups of leads
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0037_lead_owner_score_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="customer_email",
+            field=models.CharField(blank=True, default="", max_length=254),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="customer_id",
+            field=models.CharField(blank=True, default="", max_length=200),
+        ),
+        migrations.AddField(
+            model_name="leadlog",
+            name="customer_email",
+            field=models.CharField(blank=True, default="", max_length=254),
+        ),
+        migrations.AddField(
+            model_name="leadlog",
+            name="customer_id",
+            field=models.CharField(blank=True, default="", max_length=200),
+        ),
+        # Customer leads are looked up within owner
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["owner", "customer_email"], name="lead_owner_email_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["owner", "customer_id"], name="lead_owner_customer_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leadlog",
+            index=models.Index(
+                fields=["owner", "customer_email"], name="leadlog_owner_email_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leadlog",
+            index=models.Index(
+                fields=["owner", "customer_id"], name="leadlog_owner_customer_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated manually for compact lead log
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0038_lead_customer_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="leadlog",
+            name="answers_data",
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,242 @@
+# Generated manually for recommendation hits
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+RECOMMENDATION_FIELDS = (
+    "response_text",
+    "affiliate_name",
+    "affiliate_image",
+    "affiliate_link",
+    "redirect_url",
+)
+
+
+def get_fields(obj):
+    return {
+        field_name: getattr(obj, field_name) for field_name in RECOMMENDATION_FIELDS
+    }
+
+
+def has_recommendation():
+    condition = models.Q()
+    for field_name in RECOMMENDATION_FIELDS:
+        condition |= ~models.Q(**{field_name: ""})
+    return condition
+
+
+def move_recommendations_to_hits(apps, schema_editor):
+    """Store current recommendation fields as version 1 and answers' copies as hits.
+
+    Fields copied to answers which differ from current ones are stored as
+    further versions. Copies on logged answers are stored as [recommendation
+    id, version] of their lead log entries. Answers of questions without
+    recommendation are skipped.
+    """
+    Answer = apps.get_model("scoringengine", "Answer")
+    AnswerLog = apps.get_model("scoringengine", "AnswerLog")
+    LeadLog = apps.get_model("scoringengine", "LeadLog")
+    Recommendation = apps.get_model("scoringengine", "Recommendation")
+    RecommendationHit = apps.get_model("scoringengine", "RecommendationHit")
+    RecommendationVersion = apps.get_model("scoringengine", "RecommendationVersion")
+
+    recommendations = {}
+    versions = {}
+    for recommendation in Recommendation.objects.select_related("question"):
+        key = (recommendation.owner_id, recommendation.question.field_name)
+        recommendations[key] = recommendation
+        versions[recommendation.pk] = {
+            tuple(get_fields(recommendation).values()): 1,
+        }
+        RecommendationVersion.objects.create(
+            recommendation=recommendation, version=1, **get_fields(recommendation)
+        )
+
+    def get_version(recommendation, answer):
+        fields = get_fields(answer)
+        recommendation_versions = versions[recommendation.pk]
+        version = recommendation_versions.get(tuple(fields.values()))
+
+        if version is None:
+            version = len(recommendation_versions) + 1
+            recommendation_versions[tuple(fields.values())] = version
+            RecommendationVersion.objects.create(
+                recommendation=recommendation, version=version, **fields
+            )
+
+        return version
+
+    answers = (
+        Answer.objects.filter(has_recommendation())
+        .select_related("lead")
+        .order_by("pk")
+        .iterator(chunk_size=1000)
+    )
+
+    hits = []
+    for answer in answers:
+        recommendation = recommendations.get((answer.lead.owner_id, answer.field_name))
+        if recommendation is None:
+            continue
+
+        hits.append(
+            RecommendationHit(
+                lead_id=answer.lead_id,
+                recommendation=recommendation,
+                version=get_version(recommendation, answer),
+            )
+        )
+
+        if len(hits) >= 1000:
+            RecommendationHit.objects.bulk_create(hits, ignore_conflicts=True)
+            hits = []
+
+    RecommendationHit.objects.bulk_create(hits, ignore_conflicts=True)
+
+    logged_answers = (
+        AnswerLog.objects.filter(has_recommendation())
+        .select_related("lead")
+        .order_by("lead_id", "pk")
+        .iterator(chunk_size=1000)
+    )
+
+    entries = {}
+    for answer in logged_answers:
+        recommendation = recommendations.get((answer.lead.owner_id, answer.field_name))
+        if recommendation is None:
+            continue
+
+        entry = entries.setdefault(answer.lead_id, answer.lead)
+        entry.recommendations.append(
+            [recommendation.pk, get_version(recommendation, answer)]
+        )
+
+        # Answers are ordered by entry, so stored entries get no more hits
+        if len(entries) > 1000:
+            LeadLog.objects.bulk_update(
+                list(entries.values())[:-1], ["recommendations"]
+            )
+            entries = {answer.lead_id: entry}
+
+    LeadLog.objects.bulk_update(entries.values(), ["recommendations"])
+
+
+def move_hits_to_answers(apps, schema_editor):
+    Answer = apps.get_model("scoringengine", "Answer")
+    AnswerLog = apps.get_model("scoringengine", "AnswerLog")
+    LeadLog = apps.get_model("scoringengine", "LeadLog")
+    RecommendationHit = apps.get_model("scoringengine", "RecommendationHit")
+    RecommendationVersion = apps.get_model("scoringengine", "RecommendationVersion")
+
+    for hit in RecommendationHit.objects.select_related(
+        "recommendation__question"
+    ).iterator():
+        version = RecommendationVersion.objects.get(
+            recommendation_id=hit.recommendation_id, version=hit.version
+        )
+        Answer.objects.filter(
+            lead_id=hit.lead_id, field_name=hit.recommendation.question.field_name
+        ).update(**get_fields(version))
+
+    for entry in LeadLog.objects.exclude(recommendations=[]).iterator():
+        for recommendation_id, version in entry.recommendations:
+            version = RecommendationVersion.objects.select_related(
+                "recommendation__question"
+            ).get(recommendation_id=recommendation_id, version=version)
+            AnswerLog.objects.filter(
+                lead_id=entry.pk,
+                field_name=version.recommendation.question.field_name,
+            ).update(**get_fields(version))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0039_leadlog_answers_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.CreateModel(
+            name="RecommendationVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("response_text", models.TextField(blank=True)),
+                ("affiliate_name", models.CharField(blank=True, max_length=200)),
+                ("affiliate_image", models.URLField(blank=True, max_length=2048)),
+                ("affiliate_link", models.URLField(blank=True, max_length=2048)),
+                ("redirect_url", models.URLField(blank=True, max_length=2048)),
+                ("version", models.PositiveIntegerField()),
+                (
+                    "recommendation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="versions",
+                        to="scoringengine.recommendation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="recommendationversion",
+            constraint=models.UniqueConstraint(
+                fields=("recommendation", "version"),
+                name="unique_recommendation_version",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RecommendationHit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField()),
+                (
+                    "lead",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommendation_hits",
+                        to="scoringengine.lead",
+                    ),
+                ),
+                (
+                    "recommendation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hits",
+                        to="scoringengine.recommendation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="recommendationhit",
+            constraint=models.UniqueConstraint(
+                fields=("lead", "recommendation"), name="unique_recommendation_hit"
+            ),
+        ),
+        migrations.AddField(
+            model_name="leadlog",
+            name="recommendations",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(move_recommendations_to_hits, move_hits_to_answers),
+    ]
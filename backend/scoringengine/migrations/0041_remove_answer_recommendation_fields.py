@@ -0,0 +1,24 @@
+# Generated manually for recommendation hits
+
+from django.db import migrations
+
+RECOMMENDATION_FIELDS = (
+    "response_text",
+    "affiliate_name",
+    "affiliate_image",
+    "affiliate_link",
+    "redirect_url",
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0040_recommendation_hits"),
+    ]
+
+    operations = [
+        migrations.RemoveField(model_name=model_name, name=field_name)
+        for model_name in ("answer", "answerlog")
+        for field_name in RECOMMENDATION_FIELDS
+    ]
@@ -0,0 +1,87 @@
+# Generated manually for native answer values storage
+
+import json
+
+from django.db import migrations, models
+
+import scoringengine.models
+
+
+def assign_choice_bits(apps, schema_editor):
+    Choice = apps.get_model("scoringengine", "Choice")
+
+    bits = {}
+    changed = []
+    for choice in Choice.objects.order_by("question_id", "pk").iterator():
+        bit = bits.get(choice.question_id, 0)
+        bits[choice.question_id] = bit + 1
+
+        if bit < scoringengine.models.CHOICES_MASK_SIZE:
+            choice.bit = bit
+            changed.append(choice)
+
+    Choice.objects.bulk_update(changed, ["bit"], batch_size=1000)
+
+
+def clear_invalid_values(apps, schema_editor):
+    """Values which aren't valid JSON list can't be converted to JSON column"""
+    for model_name in ("Answer", "AnswerLog"):
+        model = apps.get_model("scoringengine", model_name)
+
+        invalid = []
+        for pk, values in (
+            model.objects.filter(values__isnull=False)
+            .values_list("pk", "values")
+            .iterator()
+        ):
+            try:
+                valid = isinstance(json.loads(values), list)
+            except ValueError:
+                valid = False
+
+            if not valid:
+                invalid.append(pk)
+
+        for start in range(0, len(invalid), 1000):
+            model.objects.filter(pk__in=invalid[start : start + 1000]).update(
+                values=None
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0041_remove_answer_recommendation_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="choice",
+            name="bit",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(assign_choice_bits, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="answer",
+            name="choices_mask",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="answerlog",
+            name="choices_mask",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(clear_invalid_values, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="answer",
+            name="values",
+            field=scoringengine.models.AnswerValuesField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="answerlog",
+            name="values",
+            field=scoringengine.models.AnswerValuesField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated manually for lead log partitioning
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from scoringengine import partitions
+
+
+def partition_lead_log(apps, schema_editor):
+    connection = schema_editor.connection
+
+    if not partitions.partitioning_enabled(connection):
+        return
+
+    partitions.partition_table(
+        connection,
+        apps.get_model("scoringengine", "LeadLog")._meta.db_table,
+        partitions.get_partitioning_setting(
+            "MONTHS_AHEAD", partitions.DEFAULT_MONTHS_AHEAD
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0042_answer_values_json"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answerlog",
+            name="lead",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="scoringengine.leadlog",
+            ),
+        ),
+        # Partitioned table is left as is, rows stay in place
+        migrations.RunPython(partition_lead_log, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,115 @@
+# Generated manually for archival of old leads
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("scoringengine", "0043_partition_lead_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RetentionPolicy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "leads_days",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Archive leads older than this number of days, 0 keeps them",
+                        null=True,
+                    ),
+                ),
+                (
+                    "lead_log_days",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Archive leads history older than this number of days, 0 keeps it",
+                        null=True,
+                    ),
+                ),
+                (
+                    "owner",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="retention_policy",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Retention policies",
+            },
+        ),
+        migrations.CreateModel(
+            name="LeadArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_name",
+                    models.CharField(
+                        choices=[("lead", "Leads"), ("leadlog", "Leads history")],
+                        max_length=20,
+                    ),
+                ),
+                ("first_timestamp", models.DateTimeField()),
+                ("last_timestamp", models.DateTimeField()),
+                ("rows", models.PositiveIntegerField()),
+                ("file", models.FileField(upload_to="archives/%Y/%m/")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lead_archives",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("first_timestamp", "pk"),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="leadarchive",
+            index=models.Index(
+                fields=["owner", "model_name", "first_timestamp"],
+                name="leadarchive_owner_ts_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedLead",
+            fields=[
+                ("lead_id", models.UUIDField(primary_key=True, serialize=False)),
+                (
+                    "archive",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leads",
+                        to="scoringengine.leadarchive",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated manually for daily lead rollups
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("scoringengine", "0044_lead_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeadRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("leads", models.IntegerField(default=0)),
+                (
+                    "x_axis",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                (
+                    "y_axis",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                (
+                    "total_score",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                ("low_score_leads", models.IntegerField(default=0)),
+                ("medium_score_leads", models.IntegerField(default=0)),
+                ("high_score_leads", models.IntegerField(default=0)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lead_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="leadrollup",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "day"), name="unique_lead_rollup"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated manually for storing resolved queries of export jobs
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0045_lead_rollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportjob",
+            name="query",
+            field=models.BinaryField(
+                help_text="Pickled query of exported leads, filters resolved",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="exportjob",
+            name="answer_columns",
+            field=models.TextField(
+                blank=True, help_text="JSON of exported answer columns"
+            ),
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated manually for indexed search and answer range filters of packed lead log
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+TABLE = "scoringengine_leadlogsearchdocument"
+FTS_TABLE = "scoringengine_leadlogsearchdocument_fts"
+TRIGRAM_INDEX = "leadlogsearchdocument_trgm_idx"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX {TRIGRAM_INDEX} ON {TABLE} USING gin (document gin_trgm_ops)"
+        )
+
+    elif vendor == "sqlite":
+        # Same as FTS5 table of lead search documents, see migration 0034
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"document, content='{TABLE}', content_rowid='rowid', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.rowid, new.document); "
+            "END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) "
+            "VALUES ('delete', old.rowid, old.document); "
+            "END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) "
+            "VALUES ('delete', old.rowid, old.document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.rowid, new.document); "
+            "END"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("scoringengine", "0046_exportjob_query"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeadLogFacet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field_name", models.CharField(max_length=200)),
+                (
+                    "value",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=20, null=True
+                    ),
+                ),
+                ("date_ordinal", models.IntegerField(blank=True, null=True)),
+                (
+                    "lead_log",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facets",
+                        to="scoringengine.leadlog",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lead_log_facets",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="leadlogfacet",
+            index=models.Index(
+                fields=["owner", "field_name", "value", "lead_log"],
+                name="leadlogfacet_value_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leadlogfacet",
+            index=models.Index(
+                fields=["owner", "field_name", "date_ordinal", "lead_log"],
+                name="leadlogfacet_date_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="LeadLogSearchDocument",
+            fields=[
+                (
+                    "lead_log",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="scoringengine.leadlog",
+                    ),
+                ),
+                ("document", models.TextField()),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lead_log_search_documents",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated manually for resolving export job filters from query string
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoringengine", "0047_leadlog_facets_search_documents"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="exportjob",
+            name="query",
+        ),
+    ]
@@ -2,20 +2,28 @@ import json
 import math
 import re
 import uuid
+import zlib
 from datetime import date
 from decimal import Decimal
 from itertools import chain
+from operator import attrgetter
 from random import randint
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ValidationError
+from django.core.files.storage import default_storage, get_storage_class
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.expressions import RawSQL
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from scoringengine.cache import cache_invalidation_suppressed, invalidate_owner_cache
+
 ARITHMETIC_OPERATORS = ["+", "-", "*", "%", "/", "**", "//"]
 COMPARISON_OPERATORS = [">", "<", "==", "!=", ">=", "<="]
 LOGICAL_OPERATORS = ["and", "or", "not"]
@@ -24,6 +32,11 @@ AGGREGATE_FUNCTIONS = ["count", "max", "mean", "median", "min", "sum"]
 MATH_FUNCTIONS = ["sqrt"]
 DATE_FUNCTIONS = ["days", "today"]
 
+RECOMMENDATION_CATALOG_KEY = "recommendation_catalog_{owner_id}"
+
+# Number of choices of question which get a bit in answers choices mask
+CHOICES_MASK_SIZE = 63
+
 NUMBER_REGEX = r"[0-9.]+"
 DATE_REGEX = r"\d{4}-\d{2}-\d{2}"
 FIELD_NAME_REGEX = r"\w+(\[\-?\d+\])?"
@@ -53,14 +66,12 @@ def create_auth_token(sender, instance=None, created=False, **kwargs):
 
 
 def clear_user_cache(user_id):
-    """Clear cache for a specific user"""
-    cache_keys = [
-        f"lead_summary_{user_id}",
-        f"question_analytics_{user_id}",
-        f"recommendation_effectiveness_{user_id}",
-    ]
-    for key in cache_keys:
-        cache.delete(key)
+    """Clear cache for a specific user.
+
+    Analytics cache keys embed per-user generation, so clearing is a single
+    generation bump coalesced per transaction instead of deleting every key.
+    """
+    invalidate_owner_cache(user_id)
 
 
 def days(dt):
@@ -336,6 +347,9 @@ class RecommendationFieldsMixin(models.Model):
         "redirect_url",
     )
 
+    def get_fields_dict(self) -> dict:
+        return {field_name: getattr(self, field_name) for field_name in self.fields}
+
     class Meta:
         abstract = True
 
@@ -344,6 +358,8 @@ class Recommendation(RecommendationFieldsMixin):
     question = models.OneToOneField(
         "Question", on_delete=models.CASCADE, related_name="recommendation"
     )
+    # Version of current fields, see RecommendationVersion
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     rule = models.CharField(
         max_length=500,
@@ -368,6 +384,34 @@ class Recommendation(RecommendationFieldsMixin):
     def __str__(self):
         return f"Q{self.question.number}: {self.rule}"
 
+    def save(self, *args, **kwargs):
+        """Save recommendation, storing its fields as a new version if they changed"""
+        with transaction.atomic():
+            if self.pk is not None:
+                # Concurrent saves would number their versions the same
+                list(Recommendation.objects.select_for_update().filter(pk=self.pk))
+
+            versions = RecommendationVersion.objects.filter(recommendation_id=self.pk)
+            current = versions.filter(version=self.version).first()
+            changed = current is None or (
+                current.get_fields_dict() != self.get_fields_dict()
+            )
+
+            if changed:
+                self.version = (
+                    versions.aggregate(Max("version"))["version__max"] or 0
+                ) + 1
+
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+
+            super().save(*args, **kwargs)
+
+            if changed:
+                RecommendationVersion.objects.create(
+                    recommendation=self, version=self.version, **self.get_fields_dict()
+                )
+
     def clean_fields(self, exclude=None):
         super().clean_fields(exclude)
 
@@ -387,6 +431,30 @@ class Recommendation(RecommendationFieldsMixin):
             pass
 
 
+class RecommendationVersion(RecommendationFieldsMixin):
+    """Fields of recommendation as they were at given version.
+
+    Versions are never changed, so leads keep recommendations they got on
+    scoring after recommendation is edited.
+    """
+
+    recommendation = models.ForeignKey(
+        Recommendation, on_delete=models.CASCADE, related_name="versions"
+    )
+    version = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recommendation", "version"],
+                name="unique_recommendation_version",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recommendation} (v{self.version})"
+
+
 class ScoringModel(models.Model):
     question = models.OneToOneField(
         "Question", on_delete=models.CASCADE, related_name="scoring_model"
@@ -452,6 +520,13 @@ class ScoringModel(models.Model):
         except ZeroDivisionError:
             return None
 
+    def get_ranges(self) -> list:
+        # Sorted in place of ordered query, so prefetched ranges are used
+        return sorted(self.ranges.all(), key=attrgetter("pk"))
+
+    def get_dates_ranges(self) -> list:
+        return sorted(self.dates_ranges.all(), key=attrgetter("pk"))
+
     def calculate_points(self, answers):
         """Calculate points based on calculated value.
         For Question.MULTIPLE_CHOICES points determined as sum of separate points for each provided value.
@@ -461,7 +536,7 @@ class ScoringModel(models.Model):
             """Return points based on calculated value"""
 
             if self.question.type == Question.DATE:
-                for value_range in self.dates_ranges.order_by("pk").all():
+                for value_range in self.get_dates_ranges():
                     start = (
                         value_range.start if value_range.start is not None else date.min
                     )
@@ -471,7 +546,7 @@ class ScoringModel(models.Model):
                         return round(value_range.points * self.weight, 2)
 
             else:
-                for value_range in self.ranges.order_by("pk").all():
+                for value_range in self.get_ranges():
                     start = (
                         value_range.start
                         if value_range.start is not None
@@ -666,6 +741,31 @@ class Question(models.Model):
         except Recommendation.DoesNotExist:
             return False
 
+    def count_choice_selections(self, answers) -> dict:
+        """Return number of given answers selecting each choice, by choice text.
+
+        Selections are counted by database over answers choices masks, choices
+        without bit are left out.
+        """
+        choices = [choice for choice in self.choices.all() if choice.bit is not None]
+
+        answers = answers.annotate(
+            **{
+                f"choice_{choice.bit}": F("choices_mask").bitand(1 << choice.bit)
+                for choice in choices
+            }
+        )
+        counts = answers.aggregate(
+            **{
+                f"choice_{choice.bit}_count": Count(
+                    "pk", filter=Q(**{f"choice_{choice.bit}__gt": 0})
+                )
+                for choice in choices
+            }
+        )
+
+        return {choice.text: counts[f"choice_{choice.bit}_count"] for choice in choices}
+
     def get_recommendation_dict(self):
         try:
             return {
@@ -722,6 +822,10 @@ class Choice(models.Model):
         "recommended to use highest number in the range.",
     )
 
+    # Bit of choice in choices mask of answers, see AnswerAbstract.choices_mask.
+    # Choices over mask size get none.
+    bit = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["question", "text"], name="unique_choice"),
@@ -731,12 +835,63 @@ class Choice(models.Model):
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.bit is None:
+            # Lowest free bit, bits of deleted choices are reused
+            used_bits = set(
+                Choice.objects.filter(
+                    question_id=self.question_id, bit__isnull=False
+                ).values_list("bit", flat=True)
+            )
+            self.bit = next(
+                (bit for bit in range(CHOICES_MASK_SIZE) if bit not in used_bits),
+                None,
+            )
+
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_mask(choices):
+        """Return choices mask of selected choices, None if some has no bit"""
+        mask = 0
+
+        for choice in choices:
+            if choice.bit is None:
+                return None
+
+            mask |= 1 << choice.bit
+
+        return mask
+
 
 class LeadAbstract(models.Model):
     x_axis = models.DecimalField(max_digits=12, decimal_places=2)
     y_axis = models.DecimalField(max_digits=12, decimal_places=2)
     total_score = models.DecimalField(max_digits=12, decimal_places=2)
 
+    # Extracted from answers to questions of these field names on scoring
+    CUSTOMER_FIELDS = ["customer_email", "customer_id"]
+
+    customer_email = models.CharField(max_length=254, blank=True, default="")
+    customer_id = models.CharField(max_length=200, blank=True, default="")
+
+    def get_answers(self) -> list:
+        return list(self.answers.all())
+
+    def build_answers(self, answers) -> list:
+        """Return unsaved answers of lead made of answer fields dicts"""
+        answer_model = self._meta.get_field("answers").related_model
+        built = []
+
+        for data in answers:
+            values = data.pop("values", None)
+
+            answer = answer_model(lead=self, **data)
+            answer.set_values(values)
+            built.append(answer)
+
+        return built
+
     def get_answer_response(self, field_nane: str) -> str:
         try:
             return self.answers.get(lead=self, field_name__exact=field_nane).response
@@ -753,13 +908,23 @@ class LeadAbstract(models.Model):
 
         return ""
 
-    @property
-    def customer_email(self) -> str:
-        return self.get_answer_response("customer_email")
+    @classmethod
+    def get_customer_fields(cls, answers) -> dict:
+        """Return customer fields of lead extracted from (field_name, response) pairs.
+
+        Responses to the same field name are joined with comma, like
+        `get_answer_response`, and truncated to the column length.
+        """
+        responses = {field_name: [] for field_name in cls.CUSTOMER_FIELDS}
+
+        for field_name, response in answers:
+            if field_name in responses and response:
+                responses[field_name].append(response)
 
-    @property
-    def customer_id(self) -> str:
-        return self.get_answer_response("customer_id")
+        return {
+            field_name: ", ".join(values)[: cls._meta.get_field(field_name).max_length]
+            for field_name, values in responses.items()
+        }
 
     class Meta:
         abstract = True
@@ -782,45 +947,157 @@ class LeadLog(LeadAbstract):
     owner = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="leads_history"
     )
+    # Answers packed by `pack_answers`, empty for entries logged with AnswerLog rows
+    answers_data = models.BinaryField(null=True, blank=True, editable=False)
+    # [recommendation id, version] of recommendations triggered for entry,
+    # like RecommendationHit rows of leads
+    recommendations = models.JSONField(default=list, blank=True, editable=False)
+
+    PACKED_ANSWER_FIELDS = [
+        "field_name",
+        "response",
+        "value_number",
+        "value",
+        "date_value",
+        "values",
+        "points",
+    ]
 
     def __str__(self):
         return f"{str(self.lead_id)} @ {str(self.timestamp)}"
 
+    def get_recommendation_versions(self):
+        """Return versions of recommendations triggered for entry"""
+        condition = Q(pk__in=[])
+        for recommendation_id, version in self.recommendations:
+            condition |= Q(recommendation_id=recommendation_id, version=version)
+
+        return RecommendationVersion.objects.filter(condition).select_related(
+            "recommendation__question"
+        )
+
+    @classmethod
+    def pack_answers(cls, answers) -> bytes:
+        """Return compressed JSON of answers, see `dump_answers`"""
+        return zlib.compress(cls.dump_answers(answers).encode())
+
+    @classmethod
+    def dump_answers(cls, answers) -> str:
+        """Return JSON of answers, leaving out their empty fields"""
+        packed = []
+
+        for answer in answers:
+            data = {}
+            for field_name in cls.PACKED_ANSWER_FIELDS:
+                if field_name == "values":
+                    value = answer.get_values()
+                else:
+                    value = getattr(answer, field_name)
+
+                if value is None or value == "":
+                    continue
+
+                if isinstance(value, (Decimal, date)):
+                    value = str(value)
+
+                data[field_name] = value
+
+            packed.append(data)
+
+        return json.dumps(packed, separators=(",", ":"), cls=AnswerValuesEncoder)
+
+    @classmethod
+    def unpack_answers(cls, data) -> list:
+        """Return list of answer fields dicts packed by `pack_answers`"""
+        return cls.load_answers(zlib.decompress(bytes(data)))
+
+    @staticmethod
+    def load_answers(data) -> list:
+        """Return list of answer fields dicts dumped by `dump_answers`"""
+        answers = json.loads(data, cls=AnswerValuesDecoder)
+
+        for answer in answers:
+            answer.setdefault("response", "")
+
+            for field_name in ("value", "points"):
+                if field_name in answer:
+                    answer[field_name] = Decimal(answer[field_name])
+
+            if "date_value" in answer:
+                answer["date_value"] = date.fromisoformat(answer["date_value"])
+
+        return answers
 
-class AnswerAbstract(RecommendationFieldsMixin):
+    def get_answers(self) -> list:
+        """Return answers of entry, packed ones are unpacked on first access"""
+        if self.answers_data is None:
+            return super().get_answers()
+
+        if not hasattr(self, "_unpacked_answers"):
+            self._unpacked_answers = self.build_answers(
+                self.unpack_answers(self.answers_data)
+            )
+
+        return self._unpacked_answers
+
+
+class AnswerValuesEncoder(json.JSONEncoder):
+    """Encode decimal values as JSON numbers"""
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+
+        return super().default(o)
+
+
+class AnswerValuesDecoder(json.JSONDecoder):
+    """Decode JSON numbers with fraction as decimals, like the choice values"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("parse_float", Decimal)
+        super().__init__(*args, **kwargs)
+
+
+class AnswerValuesField(models.JSONField):
+    """JSON list of answer values.
+
+    Stored natively as jsonb on PostgreSQL and JSON text on SQLite, as text
+    on databases without JSON support, where it can't be used in lookups.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("encoder", AnswerValuesEncoder)
+        kwargs.setdefault("decoder", AnswerValuesDecoder)
+        super().__init__(*args, **kwargs)
+
+    def _check_supported(self, databases):
+        return []
+
+    def db_type(self, connection):
+        if not connection.features.supports_json_field:
+            return "text"
+
+        return super().db_type(connection)
+
+
+class AnswerAbstract(models.Model):
     field_name = models.CharField(max_length=200)
     response = models.CharField(max_length=200, blank=True)
 
     value_number = models.PositiveBigIntegerField(blank=True, null=True)
     value = models.DecimalField(max_digits=20, decimal_places=2, blank=True, null=True)
     date_value = models.DateField(blank=True, null=True)
-    values = models.TextField(
-        null=True, blank=True
-    )  # Store JSON as text for SQLite compatibility
+    values = AnswerValuesField(null=True, blank=True)
+    # Bits of selected choices of multiple choices answers, see Choice.bit
+    choices_mask = models.BigIntegerField(blank=True, null=True)
     points = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
 
     def get_values(self):
-        """Get values as a list, deserializing from JSON text"""
-        if not self.values:
-            return None
-        try:
-            return json.loads(self.values)
-        except (json.JSONDecodeError, TypeError):
-            return None
+        return self.values
 
     def set_values(self, values_list):
-        """Set values by serializing list to JSON text"""
-        if values_list is None:
-            self.values = None
-        else:
-            # Convert Decimal objects to float for JSON serialization
-            serializable_values = []
-            for value in values_list:
-                if isinstance(value, Decimal):
-                    serializable_values.append(float(value))
-                else:
-                    serializable_values.append(value)
-            self.values = json.dumps(serializable_values)
+        self.values = None if values_list is None else list(values_list)
 
     def __str__(self):
         return f"{self.field_name}: {self.response}"
@@ -834,26 +1111,566 @@ class Answer(AnswerAbstract):
 
 
 class AnswerLog(AnswerAbstract):
-    lead = models.ForeignKey(LeadLog, on_delete=models.CASCADE, related_name="answers")
+    # Without database constraint, partitioned lead log has no unique id column,
+    # see scoringengine.partitions
+    lead = models.ForeignKey(
+        LeadLog, on_delete=models.CASCADE, related_name="answers", db_constraint=False
+    )
+
+
+class RecommendationHit(models.Model):
+    """Recommendation triggered for lead, at version it had on scoring"""
+
+    lead = models.ForeignKey(
+        Lead, on_delete=models.CASCADE, related_name="recommendation_hits"
+    )
+    recommendation = models.ForeignKey(
+        Recommendation, on_delete=models.CASCADE, related_name="hits"
+    )
+    version = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lead", "recommendation"], name="unique_recommendation_hit"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recommendation} (v{self.version})"
+
+
+def get_recommendation_catalog(owner_id, refresh=False) -> dict:
+    """Return recommendation versions of owner keyed by (recommendation id, version).
+
+    Every version maps to dict of question field name and recommendation
+    fields. Catalog is cached until owner's recommendations or questions change.
+    Recommendations of catalogue master are included for slaves it shares
+    configuration with, as they are hit by leads scored with it. Hits of
+    slave's leads are moved to slave's copies once configuration is forked.
+    """
+    key = RECOMMENDATION_CATALOG_KEY.format(owner_id=owner_id)
+    catalog = None if refresh else cache.get(key)
+
+    if catalog is None:
+        catalog = {
+            (version.recommendation_id, version.version): {
+                "field_name": version.recommendation.question.field_name,
+                **version.get_fields_dict(),
+            }
+            for version in RecommendationVersion.objects.filter(
+                Q(recommendation__owner_id=owner_id)
+                | Q(
+                    recommendation__owner__catalogue_as_master__shared_configs__slave=owner_id
+                )
+            ).select_related("recommendation__question")
+        }
+        cache.set(key, catalog, None)
+
+    return catalog
+
+
+def invalidate_recommendation_catalog(owner_id) -> None:
+    # Deleted after commit, so catalog isn't cached again from the old state
+    transaction.on_commit(
+        lambda: cache.delete(RECOMMENDATION_CATALOG_KEY.format(owner_id=owner_id))
+    )
+
+
+class AnswerFacetAbstract(models.Model):
+    """Compact typed copy of numeric or date answer, used to filter by answer ranges"""
+
+    field_name = models.CharField(max_length=200)
+
+    value = models.DecimalField(max_digits=20, decimal_places=2, blank=True, null=True)
+    date_ordinal = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def build_facets(cls, answers, **fields) -> list:
+        """Build facets for answers having numeric or date value"""
+        return [
+            cls(
+                field_name=answer.field_name,
+                value=answer.value,
+                date_ordinal=(
+                    answer.date_value.toordinal() if answer.date_value else None
+                ),
+                **fields,
+            )
+            for answer in answers
+            if answer.value is not None or answer.date_value is not None
+        ]
+
+    @classmethod
+    def filter_facets(cls, field_name, gte=None, lte=None, owners=None):
+        """Return facets of answers within [gte, lte] range.
+
+        Range bounds may be numbers or dates, owners restrict facets scanned.
+        """
+        facets = cls.objects.filter(field_name=field_name)
+
+        if owners is not None:
+            facets = facets.filter(owner__in=owners)
+
+        for lookup, bound in (("gte", gte), ("lte", lte)):
+            if bound is None:
+                continue
+
+            if isinstance(bound, date):
+                facets = facets.filter(**{f"date_ordinal__{lookup}": bound.toordinal()})
+            else:
+                facets = facets.filter(**{f"value__{lookup}": bound})
+
+        return facets
+
+    def __str__(self):
+        return f"{self.field_name}: {self.value if self.value is not None else date.fromordinal(self.date_ordinal)}"
+
+
+class AnswerFacet(AnswerFacetAbstract):
+    """Answer facet of lead"""
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="answer_facets"
+    )
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name="facets")
+
+    class Meta:
+        indexes = [
+            # Leading owner and field name with trailing lead make both indexes
+            # covering for range filters selecting lead ids.
+            models.Index(
+                fields=["owner", "field_name", "value", "lead"],
+                name="answerfacet_value_idx",
+            ),
+            models.Index(
+                fields=["owner", "field_name", "date_ordinal", "lead"],
+                name="answerfacet_date_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_answers(cls, owner_id, answers) -> list:
+        """Build facets for answers of leads"""
+        return list(
+            chain.from_iterable(
+                cls.build_facets([answer], owner_id=owner_id, lead_id=answer.lead_id)
+                for answer in answers
+            )
+        )
+
+    @classmethod
+    def filter_leads(cls, queryset, field_name, gte=None, lte=None, owners=None):
+        """Filter leads queryset to leads having answer within [gte, lte] range"""
+        facets = cls.filter_facets(field_name, gte=gte, lte=lte, owners=owners)
+
+        return queryset.filter(lead_id__in=facets.values("lead_id"))
+
+
+class LeadLogFacet(AnswerFacetAbstract):
+    """Answer facet of lead log entry with packed answers"""
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="lead_log_facets"
+    )
+    # Partitioned lead log can't be referenced by foreign key constraint
+    lead_log = models.ForeignKey(
+        LeadLog, on_delete=models.CASCADE, related_name="facets", db_constraint=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["owner", "field_name", "value", "lead_log"],
+                name="leadlogfacet_value_idx",
+            ),
+            models.Index(
+                fields=["owner", "field_name", "date_ordinal", "lead_log"],
+                name="leadlogfacet_date_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_answers(cls, entry, answers) -> list:
+        """Build facets for answers of lead log entry"""
+        return cls.build_facets(answers, owner_id=entry.owner_id, lead_log_id=entry.pk)
+
+    @classmethod
+    def filter_entries(cls, queryset, field_name, gte=None, lte=None, owners=None):
+        """Filter lead log queryset to entries having answer within [gte, lte] range"""
+        facets = cls.filter_facets(field_name, gte=gte, lte=lte, owners=owners)
+
+        return queryset.filter(pk__in=facets.values("lead_log_id"))
+
+
+class SearchDocumentAbstract(models.Model):
+    """Lowercased lead id and answer responses indexed for substring search.
+
+    Indexed with trigram GIN index on PostgreSQL and mirrored into FTS5 table
+    on SQLite (see migrations 0034 and 0047), both supporting substring search.
+    """
+
+    FTS_TABLE = None
+    # Trigram tokenizer can't match phrases shorter than a trigram
+    FTS_MIN_TERM_LENGTH = 3
+
+    document = models.TextField()
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def build_document(lead_id, answers) -> str:
+        lines = [str(lead_id)]
+        lines += [answer.response for answer in answers if answer.response]
+
+        return "\n".join(lines).lower()
+
+    @classmethod
+    def filter_documents(cls, search_terms, owners=None):
+        """Return documents containing all search terms"""
+        documents = cls.objects.all()
+
+        if owners is not None:
+            documents = documents.filter(owner__in=owners)
+
+        for term in search_terms:
+            term = term.lower()
+
+            if connection.vendor == "sqlite" and len(term) >= cls.FTS_MIN_TERM_LENGTH:
+                phrase = '"{}"'.format(term.replace('"', '""'))
+                documents = documents.filter(
+                    pk__in=RawSQL(
+                        f"SELECT {cls._meta.pk.column} FROM {cls._meta.db_table} WHERE rowid IN "
+                        f"(SELECT rowid FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s)",
+                        [phrase],
+                    )
+                )
+            else:
+                # Served by trigram index on PostgreSQL
+                documents = documents.filter(document__contains=term)
+
+        return documents
+
+
+class LeadSearchDocument(SearchDocumentAbstract):
+    """Search document of lead"""
+
+    FTS_TABLE = "scoringengine_leadsearchdocument_fts"
+
+    lead = models.OneToOneField(
+        Lead,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="lead_search_documents"
+    )
+
+    @classmethod
+    def from_answers(cls, lead, answers):
+        """Build search document of lead from its answers"""
+        return cls(
+            lead=lead,
+            owner_id=lead.owner_id,
+            document=cls.build_document(lead.lead_id, answers),
+        )
+
+    @classmethod
+    def filter_leads(cls, queryset, search_terms, owners=None):
+        """Filter leads queryset to leads whose document contains all search terms"""
+        documents = cls.filter_documents(search_terms, owners=owners)
+
+        return queryset.filter(lead_id__in=documents.values("lead_id"))
+
+    def __str__(self):
+        return str(self.lead_id)
+
+
+class LeadLogSearchDocument(SearchDocumentAbstract):
+    """Search document of lead log entry with packed answers"""
+
+    FTS_TABLE = "scoringengine_leadlogsearchdocument_fts"
+
+    # Partitioned lead log can't be referenced by foreign key constraint
+    lead_log = models.OneToOneField(
+        LeadLog,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+        db_constraint=False,
+    )
+    owner = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="lead_log_search_documents",
+    )
+
+    @classmethod
+    def from_answers(cls, entry, answers):
+        """Build search document of lead log entry from its answers"""
+        return cls(
+            lead_log=entry,
+            owner_id=entry.owner_id,
+            document=cls.build_document(entry.lead_id, answers),
+        )
+
+    @classmethod
+    def filter_entries(cls, queryset, search_terms, owners=None):
+        """Filter lead log queryset to entries whose document contains all terms"""
+        documents = cls.filter_documents(search_terms, owners=owners)
+
+        return queryset.filter(pk__in=documents.values("lead_log_id"))
+
+    def __str__(self):
+        return str(self.lead_log_id)
+
+
+class LeadRollup(models.Model):
+    """Daily totals of owner's leads, kept up to date on lead create and delete.
+
+    Summaries over many owners, like catalogue analytics, sum rollups instead
+    of scanning leads, see scoringengine.rollups.
+    """
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="lead_rollups"
+    )
+    day = models.DateField()
+
+    leads = models.IntegerField(default=0)
+    # Sums of lead scores
+    x_axis = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    y_axis = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    total_score = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    low_score_leads = models.IntegerField(default=0)
+    medium_score_leads = models.IntegerField(default=0)
+    high_score_leads = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Serves filtering owners' rollups by day range
+            models.UniqueConstraint(fields=["owner", "day"], name="unique_lead_rollup"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} {self.day}"
+
+
+def get_export_storage():
+    """Return storage of export files, default storage unless configured otherwise"""
+    storage = getattr(settings, "EXPORT_JOBS", {}).get("STORAGE")
+
+    return get_storage_class(storage)() if storage else default_storage
+
+
+class ExportJob(models.Model):
+    """Leads export produced in background by `run_export_jobs` command"""
+
+    PENDING = "P"
+    RUNNING = "R"
+    DONE = "D"
+    FAILED = "F"
+
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    MODEL_CHOICES = (
+        ("lead", "Leads"),
+        ("leadlog", "Leads history"),
+    )
+
+    # Keep in sync with scoringengine.exports.EXPORT_FORMATS
+    FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("csv.gz", "CSV (gzip)"),
+        ("parquet", "Parquet"),
+    )
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="export_jobs"
+    )
+    model_name = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    query_string = models.TextField(
+        blank=True, help_text="Changelist filters and search of exported leads"
+    )
+    answer_columns = models.TextField(
+        blank=True, help_text="JSON of exported answer columns"
+    )
+
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+
+    # Checkpoint of the last exported chunk, export resumes right after it
+    rows_exported = models.PositiveBigIntegerField(default=0)
+    bytes_written = models.PositiveBigIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    last_pk = models.CharField(max_length=64, blank=True)
+
+    file = models.FileField(
+        upload_to="exports/%Y/%m/", storage=get_export_storage, blank=True
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="exportjob_status_idx"),
+        ]
+
+    def get_filename(self) -> str:
+        return f"{self.model_name}-{self.pk}-{self.created_at:%Y-%m-%d}.{self.export_format}"
+
+    def __str__(self):
+        return f"Export #{self.pk}"
+
+
+class RetentionPolicy(models.Model):
+    """Retention window of owner's leads, overriding LEAD_ARCHIVE defaults.
+
+    Leads and lead log entries older than their window are moved to archive
+    files by `archive_leads` command.
+    """
+
+    owner = models.OneToOneField(
+        get_user_model(), on_delete=models.CASCADE, related_name="retention_policy"
+    )
+    leads_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Archive leads older than this number of days, 0 keeps them",
+    )
+    lead_log_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Archive leads history older than this number of days, 0 keeps it",
+    )
+
+    class Meta:
+        verbose_name_plural = "Retention policies"
+
+    def __str__(self):
+        return f"Retention policy of {self.owner}"
+
+
+def get_archive_storage():
+    """Return storage of archive files, default storage unless configured otherwise"""
+    storage = getattr(settings, "LEAD_ARCHIVE", {}).get("STORAGE")
+
+    return get_storage_class(storage)() if storage else default_storage
+
+
+class LeadArchive(models.Model):
+    """Batch of leads or lead log entries moved to compressed Parquet file"""
+
+    MODEL_CHOICES = ExportJob.MODEL_CHOICES
+
+    owner = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="lead_archives"
+    )
+    model_name = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    rows = models.PositiveIntegerField()
+    file = models.FileField(upload_to="archives/%Y/%m/", storage=get_archive_storage)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("first_timestamp", "pk")
+        indexes = [
+            models.Index(
+                fields=["owner", "model_name", "first_timestamp"],
+                name="leadarchive_owner_ts_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archive #{self.pk}"
+
+
+class ArchivedLead(models.Model):
+    """Archive holding lead, so archived leads are found without reading archives"""
+
+    lead_id = models.UUIDField(primary_key=True)
+    archive = models.ForeignKey(
+        LeadArchive, on_delete=models.CASCADE, related_name="leads"
+    )
+
+    def __str__(self):
+        return str(self.lead_id)
 
 
 # Signal handlers - placed at the end to avoid circular imports
 @receiver([post_save, post_delete], sender=Lead)
 def clear_lead_cache(sender, instance=None, **kwargs):
     """Clear cache when leads are modified"""
-    if instance and instance.owner:
-        clear_user_cache(instance.owner.id)
+    if cache_invalidation_suppressed():
+        return
+
+    if instance and instance.owner_id:
+        clear_user_cache(instance.owner_id)
 
 
 @receiver([post_save, post_delete], sender=Question)
 def clear_question_cache(sender, instance=None, **kwargs):
     """Clear cache when questions are modified"""
-    if instance and instance.owner:
-        clear_user_cache(instance.owner.id)
+    if cache_invalidation_suppressed():
+        return
+
+    if instance and instance.owner_id:
+        clear_user_cache(instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Recommendation)
+def clear_recommendation_catalog(sender, instance=None, **kwargs):
+    """Clear catalog when recommendations or field names of questions change"""
+    if instance and instance.owner_id:
+        invalidate_recommendation_catalog(instance.owner_id)
+
+
+@receiver(post_delete, sender=Choice)
+def clear_choice_bit(sender, instance=None, **kwargs):
+    """Clear bit of deleted choice from answers masks, so it can be reused.
+
+    Masks of logged answers are cleared too, otherwise they would select the
+    choice which gets the bit next. Logged answers keep their responses and
+    values, only their masks no longer tell the deleted choice was selected.
+    """
+    if instance is None or instance.bit is None:
+        return
+
+    question = Question.objects.filter(pk=instance.question_id).first()
+    if question is None:
+        return
+
+    for model in (Answer, AnswerLog):
+        model.objects.filter(
+            lead__owner_id=question.owner_id,
+            field_name=question.field_name,
+            choices_mask__isnull=False,
+        ).update(choices_mask=F("choices_mask").bitand(~(1 << instance.bit)))
 
 
 @receiver([post_save, post_delete], sender=Answer)
 def clear_answer_cache(sender, instance=None, **kwargs):
     """Clear cache when answers are modified"""
-    if instance and instance.lead and instance.lead.owner:
-        clear_user_cache(instance.lead.owner.id)
+    if cache_invalidation_suppressed():
+        return
+
+    if instance and instance.lead_id and instance.lead.owner_id:
+        clear_user_cache(instance.lead.owner_id)
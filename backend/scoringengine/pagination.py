@@ -0,0 +1,158 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"d": str(value)}
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return parse_datetime(value["dt"])
+        if "d" in value:
+            return Decimal(value["d"])
+    return value
+
+
+def encode_cursor(*values) -> str:
+    """Encode keyset values into opaque URL safe cursor"""
+    payload = json.dumps([_encode_value(value) for value in values])
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    """Decode cursor made by `encode_cursor` holding `length` values"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_decode_value(value) for value in json.loads(payload)]
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+    if len(values) != length or any(value is None for value in values):
+        raise InvalidCursor("Invalid cursor")
+
+    return values
+
+
+def get_ordering_field(model, name):
+    """Return model field `name` of ordering refers to, following relations"""
+    opts = model._meta
+    field = None
+
+    for part in name.lstrip("-").split("__"):
+        field = opts.pk if part == "pk" else opts.get_field(part)
+        if field.is_relation:
+            opts = field.related_model._meta
+
+    return field.target_field if field.is_relation else field
+
+
+def clean_keyset_values(model, ordering, values) -> list:
+    """Convert decoded cursor values to types of ordering fields.
+
+    Cursor is client input, values of wrong type would fail in the query.
+    """
+    try:
+        return [
+            get_ordering_field(model, field).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except (ValidationError, ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def keyset_filter(ordering, values, reverse=False) -> Q:
+    """Build filter selecting rows following `values` key in `ordering`.
+
+    Ordering lists fields with "-" prefix for descending ones, like
+    `order_by` arguments. Rows preceding the key are selected if `reverse`.
+    """
+    condition = None
+
+    for field, value in reversed(list(zip(ordering, values))):
+        descending = field.startswith("-")
+        lookup = "lt" if descending != reverse else "gt"
+        field = field.lstrip("-")
+
+        field_condition = Q(**{f"{field}__{lookup}": value})
+        if condition is not None:
+            field_condition |= Q(**{field: value}) & condition
+
+        condition = field_condition
+
+    return condition
+
+
+def reverse_ordering(ordering) -> list:
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+def estimate_count(queryset):
+    """Return number of rows of queryset estimated by query planner.
+
+    Only PostgreSQL is supported, None is returned for other databases.
+    """
+    connection = connections[queryset.db]
+
+    if connection.vendor != "postgresql":
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using planner estimated count when it is above threshold.
+
+    Exact `COUNT(*)` has to scan every matching row, which takes seconds on
+    large tables, while estimate precision doesn't matter there.
+    """
+
+    estimate_threshold = ESTIMATED_COUNT_THRESHOLD
+
+    @cached_property
+    def estimated(self) -> bool:
+        return self._estimate is not None and self._estimate >= self.estimate_threshold
+
+    @cached_property
+    def _estimate(self):
+        return estimate_count(self.object_list)
+
+    @cached_property
+    def count(self):
+        if self.estimated:
+            return self._estimate
+
+        return super().count
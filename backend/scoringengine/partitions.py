@@ -0,0 +1,230 @@
+"""Monthly range partitioning of lead log table on PostgreSQL.
+
+Lead log is partitioned by month of timestamp when LEAD_LOG_PARTITIONING
+setting is enabled. Queries filtered by timestamp only scan partitions of
+matching months and old months can be dropped or detached as a whole.
+Other databases and disabled setting keep the plain table.
+
+Only lead log is partitioned. Primary key of partitioned table has to
+include timestamp, so it can't be referenced by foreign keys, while leads
+are referenced by answers, facets, search documents and recommendation hits.
+"""
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db import transaction
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_PARTITION_SUFFIX = "default"
+UNPARTITIONED_SUFFIX = "unpartitioned"
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def get_partitioning_setting(name: str, default):
+    return getattr(settings, "LEAD_LOG_PARTITIONING", {}).get(name) or default
+
+
+def partitioning_enabled(connection=default_connection) -> bool:
+    return connection.vendor == "postgresql" and bool(
+        get_partitioning_setting("ENABLED", False)
+    )
+
+
+def get_lead_log_table() -> str:
+    from scoringengine.models import LeadLog
+
+    return LeadLog._meta.db_table
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(start: date, end: date):
+    """Yield first days of months from month of `start` to month of `end`"""
+    month = month_start(start)
+
+    while month <= end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    if connection.vendor != "postgresql":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions(connection, table: str) -> list:
+    """Return names of partitions of table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid) "
+            "ORDER BY c.relname",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_month_partition(connection, table: str, month: date) -> bool:
+    """Create partition of table for month, return False if it exists.
+
+    Rows of the month stored in default partition are moved to the new one,
+    PostgreSQL refuses to create partition overlapping default partition rows.
+    """
+    name = partition_name(table, month)
+
+    if name in get_partitions(connection, table):
+        return False
+
+    qn = connection.ops.quote_name
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end_month = add_months(month, 1)
+    end = datetime(end_month.year, end_month.month, 1, tzinfo=timezone.utc)
+    default = f"{table}_{DEFAULT_PARTITION_SUFFIX}"
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT 1 FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s '
+            "LIMIT 1",
+            [start, end],
+        )
+        move_rows = cursor.fetchone() is not None
+
+        if move_rows:
+            cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+            "FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+
+        if move_rows:
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {qn(default)} "
+                'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f"INSERT INTO {qn(name)} SELECT * FROM moved",
+                [start, end],
+            )
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT"
+            )
+
+    return True
+
+
+def create_future_partitions(
+    connection, table: str, months_ahead: int, today=None
+) -> list:
+    """Create partitions from current month to `months_ahead` months ahead.
+
+    Return names of created partitions.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    created = []
+
+    for month in iter_months(today, add_months(month_start(today), months_ahead)):
+        if create_month_partition(connection, table, month):
+            created.append(partition_name(table, month))
+
+    return created
+
+
+def partition_table(connection, table: str, months_ahead: int) -> int:
+    """Convert plain table to table partitioned by month of timestamp.
+
+    Rows are copied to partitions of their months, indexes are recreated on
+    the partitioned table and so on every partition. Runs in a single
+    transaction, holding lock of the table while rows are copied. Return
+    number of created partitions.
+    """
+    if is_partitioned(connection, table):
+        raise PartitioningError(f"Table {table} is already partitioned")
+
+    from scoringengine.models import LeadLog
+
+    qn = connection.ops.quote_name
+    old = f"{table}_{UNPARTITIONED_SUFFIX}"
+    owner_table = LeadLog._meta.get_field("owner").related_model._meta.db_table
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND schemaname = current_schema()",
+            [table],
+        )
+        indexes = [
+            index_def
+            for index_name, index_def in cursor.fetchall()
+            if index_name != f"{table}_pkey"
+        ]
+
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(old)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS) "
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(
+            f"CREATE TABLE {qn(table + '_' + DEFAULT_PARTITION_SUFFIX)} "
+            f"PARTITION OF {qn(table)} DEFAULT"
+        )
+
+        cursor.execute(f'SELECT MIN("timestamp") FROM {qn(old)}')
+        first = cursor.fetchone()[0]
+        today = datetime.now(timezone.utc).date()
+        end = add_months(month_start(today), months_ahead)
+
+        created = 0
+        for month in iter_months(first.date() if first else today, end):
+            created += create_month_partition(connection, table, month)
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(old)}")
+
+        # Keep id sequence when the old table is dropped
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [old])
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}."id"')
+
+        cursor.execute(f"DROP TABLE {qn(old)}")
+
+        # Constraint and index names are free once the old table is dropped,
+        # definitions read before renaming refer to the new table
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_pkey')} "
+            'PRIMARY KEY ("id", "timestamp")'
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(table)} ADD FOREIGN KEY ("owner_id") '
+            f'REFERENCES {qn(owner_table)} ("id") DEFERRABLE INITIALLY DEFERRED'
+        )
+        for index_def in indexes:
+            cursor.execute(index_def)
+
+    return created
@@ -0,0 +1,428 @@
+"""Query plans of hot queries, checked for sequential scans of large tables.
+
+Hot queries are the queries behind lead create, retrieve and list, analytics
+actions, admin changelist filters and search, exports and export job claims.
+They are captured while the real API and admin views serve test client
+requests of sample owner, and while export worker code runs, all in a
+transaction rolled back afterwards. Each captured SELECT is explained on the
+current database, SQLite `EXPLAIN QUERY PLAN` and PostgreSQL `EXPLAIN
+(FORMAT JSON)` are both read into the list of scanned tables. Full scans of
+tables holding more rows than threshold are reported together with composite
+index suggested from the filtered and ordered columns of the scanned table.
+
+Used by tests/test_query_plans.py on seeded dataset and by
+`explain_hot_queries` command on any database.
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+
+from scoringengine.cache import bump_cache_generation
+from scoringengine.export_jobs import claim_export_jobs
+from scoringengine.exports import (
+    EXPORT_CHUNK_SIZE,
+    get_answer_columns,
+    iter_lead_chunks,
+)
+from scoringengine.models import Lead, LeadLog, Question
+
+DEFAULT_ROWS_THRESHOLD = 1000
+
+# SQLite "SCAN" reads whole table or index, "SEARCH" reads range of index,
+# unless the index is automatic one built for every run of query
+SQLITE_SCAN_REGEX = re.compile(r"^(?:SCAN|SEARCH) (\w+)(?: AS \w+)?( USING AUTOMATIC)?")
+# Aliases of subquery tables, shown by SQLite in place of table names
+SQL_ALIAS_REGEX = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+# Column compared in condition, like "lead"."owner_id" = 1 or U0."value" >= 0
+SQL_CONDITION_REGEX = re.compile(
+    r'(?:"(\w+)"|\b([A-Z]\d+))\."(\w+)" (=|IN|IS|>=|<=|>|<|BETWEEN)(?=[ (])'
+)
+SQL_COLUMN_REGEX = re.compile(r'(?:"(\w+)"|\b([A-Z]\d+))\."(\w+)"')
+SQL_ORDER_BY_REGEX = re.compile(
+    r" ORDER BY (.*?)(?: LIMIT \d+| OFFSET \d+| FOR UPDATE|\)|$)"
+)
+
+# Operators placed first in suggested index, before range ones
+EQUALITY_OPERATORS = {"=", "IN", "IS"}
+
+
+class HotQueryError(Exception):
+    pass
+
+
+_hot_queries = {}
+
+
+def hot_query(name, admin=False):
+    """Register function running code path of hot query for sample.
+
+    Function gets sample made by `get_sample` and returns response of its
+    request, if it makes one. Admin requests are made only by staff owners.
+    """
+
+    def register(func):
+        _hot_queries[name] = (func, admin)
+        return func
+
+    return register
+
+
+def get_client_host() -> str:
+    """Return host allowed by ALLOWED_HOSTS, so test client requests pass"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+
+    return "testserver"
+
+
+def get_sample(owner) -> dict:
+    """Return sample lead, answer field name, clients and time range of owner"""
+    token, _ = Token.objects.get_or_create(user=owner)
+    host = get_client_host()
+
+    sample = {
+        "owner": owner,
+        "lead": Lead.objects.filter(owner=owner).order_by("-timestamp").first(),
+        "field_name": Question.objects.filter(
+            owner=owner, type__in=[Question.INTEGER, Question.SLIDER]
+        )
+        .values_list("field_name", flat=True)
+        .first()
+        or "",
+        "end": now(),
+        "api_client": Client(HTTP_HOST=host, HTTP_AUTHORIZATION=f"Token {token.key}"),
+        "admin_client": Client(HTTP_HOST=host),
+    }
+    sample["start"] = sample["end"] - timedelta(days=30)
+
+    if owner.is_staff:
+        sample["admin_client"].force_login(owner)
+
+    return sample
+
+
+def capture_hot_queries(owner, using=DEFAULT_DB_ALIAS) -> dict:
+    """Return SQL of SELECT queries run by each hot query code path of owner.
+
+    Code paths run in a transaction which is rolled back, so leads created and
+    jobs claimed by them are not kept.
+    """
+    connection = connections[using]
+    captured = {}
+
+    # Analytics are computed, not served from cache
+    bump_cache_generation(owner.pk)
+
+    with transaction.atomic(using=using):
+        sample = get_sample(owner)
+
+        for name, (func, admin) in _hot_queries.items():
+            if admin and not owner.is_staff:
+                continue
+
+            with CaptureQueriesContext(connection) as queries:
+                response = func(sample)
+
+            if response is not None and response.status_code >= 400:
+                raise HotQueryError(
+                    f"Request of {name} failed with status {response.status_code}"
+                )
+
+            captured[name] = [
+                query["sql"]
+                for query in queries.captured_queries
+                if query["sql"].lstrip().upper().startswith("SELECT")
+            ]
+
+        transaction.set_rollback(True, using=using)
+
+    return captured
+
+
+@hot_query("lead_create")
+def _lead_create(sample):
+    # Replays responses of the latest lead
+    answers = {
+        answer.field_name: answer.response for answer in sample["lead"].answers.all()
+    }
+
+    return sample["api_client"].post(
+        reverse("api:v1:leads-list"),
+        {"answers": answers},
+        content_type="application/json",
+    )
+
+
+@hot_query("lead_retrieve")
+def _lead_retrieve(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:leads-detail", args=[sample["lead"].pk])
+    )
+
+
+@hot_query("lead_list")
+def _lead_list(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:leads-list"),
+        {"start": sample["start"].isoformat(), "end": sample["end"].isoformat()},
+    )
+
+
+@hot_query("lead_list_by_score")
+def _lead_list_by_score(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:leads-list"), {"ordering": "-total_score"}
+    )
+
+
+@hot_query("lead_list_by_customer")
+def _lead_list_by_customer(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:leads-list"),
+        {"customer_email": sample["lead"].customer_email or ""},
+    )
+
+
+@hot_query("lead_list_by_answer_range")
+def _lead_list_by_answer_range(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:leads-list"), {f"answer__{sample['field_name']}__gte": 0}
+    )
+
+
+@hot_query("analytics_lead_summary")
+def _analytics_lead_summary(sample):
+    return sample["api_client"].get(reverse("api:v1:analytics-lead-summary"))
+
+
+@hot_query("analytics_question_analytics")
+def _analytics_question_analytics(sample):
+    return sample["api_client"].get(reverse("api:v1:analytics-question-analytics"))
+
+
+@hot_query("analytics_timeseries")
+def _analytics_timeseries(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:analytics-timeseries"),
+        {"start": sample["start"].isoformat(), "end": sample["end"].isoformat()},
+    )
+
+
+@hot_query("analytics_points_contribution")
+def _analytics_points_contribution(sample):
+    return sample["api_client"].get(
+        reverse("api:v1:analytics-points-contribution"),
+        {"start": sample["start"].isoformat(), "end": sample["end"].isoformat()},
+    )
+
+
+@hot_query("admin_leads", admin=True)
+def _admin_leads(sample):
+    return sample["admin_client"].get(reverse("admin:scoringengine_lead_changelist"))
+
+
+@hot_query("admin_leads_by_timestamp", admin=True)
+def _admin_leads_by_timestamp(sample):
+    return sample["admin_client"].get(
+        reverse("admin:scoringengine_lead_changelist"),
+        {
+            "timestamp__range__gte": sample["start"].date().isoformat(),
+            "timestamp__range__lte": sample["end"].date().isoformat(),
+        },
+    )
+
+
+@hot_query("admin_leads_by_score", admin=True)
+def _admin_leads_by_score(sample):
+    return sample["admin_client"].get(
+        reverse("admin:scoringengine_lead_changelist"),
+        {"total_score__gte": 20, "total_score__lte": 40},
+    )
+
+
+@hot_query("admin_leads_search", admin=True)
+def _admin_leads_search(sample):
+    return sample["admin_client"].get(
+        reverse("admin:scoringengine_lead_changelist"),
+        {"q": str(sample["lead"].lead_id)},
+    )
+
+
+@hot_query("admin_lead_log", admin=True)
+def _admin_lead_log(sample):
+    return sample["admin_client"].get(
+        reverse("admin:scoringengine_leadlog_changelist"),
+        {
+            "timestamp__range__gte": sample["start"].date().isoformat(),
+            "timestamp__range__lte": sample["end"].date().isoformat(),
+        },
+    )
+
+
+def _export_chunks(model, sample):
+    lead = sample["lead"]
+    answer_columns = get_answer_columns(
+        Question.objects.filter(owner=sample["owner"])
+        .order_by("number")
+        .values_list("field_name", "type", "multiple_values")
+    )
+    chunks = iter_lead_chunks(
+        model.objects.filter(owner=sample["owner"]),
+        answer_columns,
+        EXPORT_CHUNK_SIZE,
+        after=(lead.timestamp, lead.pk) if model is Lead else None,
+    )
+    # Chunk following the key, like all chunks but the first one
+    next(chunks, None)
+
+
+@hot_query("export_leads_chunk")
+def _export_leads_chunk(sample):
+    _export_chunks(Lead, sample)
+
+
+@hot_query("export_lead_log_chunk")
+def _export_lead_log_chunk(sample):
+    _export_chunks(LeadLog, sample)
+
+
+@hot_query("export_jobs_claim")
+def _export_jobs_claim(sample):
+    claim_export_jobs(1)
+
+
+def explain(sql: str, using=DEFAULT_DB_ALIAS) -> list:
+    """Return (table, full scan) of every table access in plan of SQL query"""
+    connection = connections[using]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+
+            return list(_iter_postgresql_scans(plan[0]["Plan"]))
+
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        aliases = {alias: table for table, alias in SQL_ALIAS_REGEX.findall(sql)}
+
+        return list(_iter_sqlite_scans((row[-1] for row in cursor.fetchall()), aliases))
+
+
+def _iter_postgresql_scans(node):
+    if "Relation Name" in node:
+        # Index scan without condition reads whole index, e.g. for ordering
+        yield node["Relation Name"], node["Node Type"] == "Seq Scan" or (
+            "Index Cond" not in node and node["Node Type"].startswith("Index")
+        )
+
+    for child in node.get("Plans", []):
+        yield from _iter_postgresql_scans(child)
+
+
+def _iter_sqlite_scans(details, aliases):
+    for detail in details:
+        scan = SQLITE_SCAN_REGEX.match(detail)
+
+        if scan and detail != "SCAN CONSTANT ROW":
+            table, automatic = scan.groups()
+            # FTS5 tables are searched through their own index
+            full_scan = (
+                detail.startswith("SCAN") and "VIRTUAL TABLE INDEX" not in detail
+            )
+            yield aliases.get(table, table), full_scan or bool(automatic)
+
+
+def get_table_rows(connection, table: str) -> int:
+    """Return number of rows of table, planner estimate on PostgreSQL"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+            return max(cursor.fetchone()[0], 0)
+
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+def suggest_index(sql: str, table: str) -> list:
+    """Return columns of composite index of table serving SQL query.
+
+    Columns compared for equality go first, then columns compared by range
+    and the rest of ordering columns, like (owner_id, timestamp, id).
+    """
+    aliases = {alias for name, alias in SQL_ALIAS_REGEX.findall(sql) if name == table}
+    aliases.add(table)
+    equality = []
+    ranges = []
+
+    for name, alias, column, operator in SQL_CONDITION_REGEX.findall(sql):
+        if (name or alias) not in aliases:
+            continue
+
+        if operator in EQUALITY_OPERATORS:
+            equality.append(column)
+        else:
+            ranges.append(column)
+
+    ordering = []
+    for order_by in SQL_ORDER_BY_REGEX.findall(sql):
+        for name, alias, column in SQL_COLUMN_REGEX.findall(order_by):
+            if (name or alias) in aliases:
+                ordering.append(column)
+
+    columns = []
+    for column in equality + ranges + ordering:
+        if column not in columns:
+            columns.append(column)
+
+    return columns
+
+
+def find_regressions(
+    captured: dict, rows_threshold=DEFAULT_ROWS_THRESHOLD, using=DEFAULT_DB_ALIAS
+) -> list:
+    """Return (query name, table, rows, suggested index) of regressed plans.
+
+    Plan regressed when it scans whole table holding more than threshold rows.
+    Captured are SQL queries by name, like returned by `capture_hot_queries`.
+    """
+    connection = connections[using]
+    regressions = []
+    table_rows = {}
+
+    for name, queries in captured.items():
+        for sql in queries:
+            for table, full_scan in explain(sql, using):
+                if not full_scan:
+                    continue
+
+                if table not in table_rows:
+                    table_rows[table] = get_table_rows(connection, table)
+
+                if table_rows[table] > rows_threshold:
+                    regressions.append(
+                        (name, table, table_rows[table], suggest_index(sql, table))
+                    )
+
+    return regressions
+
+
+def check_hot_queries(
+    owner, rows_threshold=DEFAULT_ROWS_THRESHOLD, using=DEFAULT_DB_ALIAS
+) -> list:
+    """Return regressed plans of hot queries of owner, see `find_regressions`"""
+    return find_regressions(capture_hot_queries(owner, using), rows_threshold, using)
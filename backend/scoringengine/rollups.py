@@ -0,0 +1,201 @@
+"""Daily rollups of leads summarized over many owners.
+
+Every owner has a LeadRollup row per day holding number of leads, sums of
+their scores and number of leads in each score range. Rows are updated on
+lead create and delete, leads written in bulk, like cloned ones, are rolled
+up by `rebuild_lead_rollups`. Sums merge by addition, so summary of any set
+of owners and days is a single aggregate over their rollups, taking the same
+time regardless of number of leads.
+"""
+from datetime import datetime, time, timedelta, timezone
+from typing import Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from scoringengine.models import Lead, LeadRollup
+
+# Total scores below the first are low, from the second on are high
+SCORE_THRESHOLDS = (20, 40)
+
+ROLLUP_SUMS = (
+    "leads",
+    "x_axis",
+    "y_axis",
+    "total_score",
+    "low_score_leads",
+    "medium_score_leads",
+    "high_score_leads",
+)
+
+
+def get_rollup_day(timestamp):
+    return timestamp.astimezone(timezone.utc).date()
+
+
+def get_day_start(day) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def get_rollup_values(lead) -> dict:
+    low, high = SCORE_THRESHOLDS
+
+    return {
+        "leads": 1,
+        "x_axis": lead.x_axis,
+        "y_axis": lead.y_axis,
+        "total_score": lead.total_score,
+        "low_score_leads": int(lead.total_score < low),
+        "medium_score_leads": int(low <= lead.total_score < high),
+        "high_score_leads": int(lead.total_score >= high),
+    }
+
+
+def add_to_rollup(lead, sign=1) -> None:
+    """Add lead to rollup of its owner and day, or remove it with sign -1"""
+    rollups = LeadRollup.objects.filter(
+        owner_id=lead.owner_id, day=get_rollup_day(lead.timestamp)
+    )
+    values = {name: value * sign for name, value in get_rollup_values(lead).items()}
+    updates = {name: F(name) + value for name, value in values.items()}
+
+    if rollups.update(**updates) or sign < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            LeadRollup.objects.create(
+                owner_id=lead.owner_id, day=get_rollup_day(lead.timestamp), **values
+            )
+    except IntegrityError:
+        # Created concurrently
+        rollups.update(**updates)
+
+
+def rebuild_lead_rollups(owner_id, start=None, end=None) -> int:
+    """Replace owner's rollups of days in [start, end) by ones counted from leads.
+
+    All days are rebuilt if range isn't provided. Return number of rollups.
+    """
+    leads = Lead.objects.filter(owner_id=owner_id)
+    rollups = LeadRollup.objects.filter(owner_id=owner_id)
+
+    if start is not None:
+        leads = leads.filter(timestamp__gte=get_day_start(start))
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        leads = leads.filter(timestamp__lt=get_day_start(end))
+        rollups = rollups.filter(day__lt=end)
+
+    low, high = SCORE_THRESHOLDS
+    rows = (
+        leads.annotate(day=TruncDate("timestamp", tzinfo=timezone.utc))
+        .values("day")
+        .annotate(
+            leads=Count("pk"),
+            x_axis_sum=Sum("x_axis"),
+            y_axis_sum=Sum("y_axis"),
+            total_score_sum=Sum("total_score"),
+            low_score_leads=Count("pk", filter=Q(total_score__lt=low)),
+            medium_score_leads=Count(
+                "pk", filter=Q(total_score__gte=low, total_score__lt=high)
+            ),
+            high_score_leads=Count("pk", filter=Q(total_score__gte=high)),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+
+        created = LeadRollup.objects.bulk_create(
+            LeadRollup(
+                owner_id=owner_id,
+                day=row["day"],
+                leads=row["leads"],
+                x_axis=row["x_axis_sum"],
+                y_axis=row["y_axis_sum"],
+                total_score=row["total_score_sum"],
+                low_score_leads=row["low_score_leads"],
+                medium_score_leads=row["medium_score_leads"],
+                high_score_leads=row["high_score_leads"],
+            )
+            for row in rows
+        )
+
+    return len(created)
+
+
+def format_summary(totals: dict) -> dict:
+    """Return summary of rollup sums shaped like lead summary analytics"""
+    leads = totals["leads"] or 0
+
+    def average(name):
+        return round(totals[name] / leads, 2) if leads else 0
+
+    return {
+        "total_leads": leads,
+        "average_scores": {
+            "x_axis": average("x_axis"),
+            "y_axis": average("y_axis"),
+            "total": average("total_score"),
+        },
+        "score_distribution": {
+            "low": totals["low_score_leads"] or 0,
+            "medium": totals["medium_score_leads"] or 0,
+            "high": totals["high_score_leads"] or 0,
+        },
+    }
+
+
+def summarize_rollups(owner_ids, start=None, end=None) -> Tuple[dict, dict]:
+    """Return summary of all owners and summaries by owner id of days in [start, end)"""
+    rollups = LeadRollup.objects.filter(owner_id__in=owner_ids)
+
+    if start is not None:
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        rollups = rollups.filter(day__lt=end)
+
+    rows = list(
+        rollups.values("owner_id")
+        .annotate(**{f"{name}_sum": Sum(name) for name in ROLLUP_SUMS})
+        .order_by()
+    )
+
+    by_owner = {}
+    totals = dict.fromkeys(ROLLUP_SUMS, 0)
+
+    for row in rows:
+        sums = {name: row[f"{name}_sum"] for name in ROLLUP_SUMS}
+        by_owner[row["owner_id"]] = format_summary(sums)
+
+        for name in ROLLUP_SUMS:
+            totals[name] += sums[name]
+
+    empty = format_summary(dict.fromkeys(ROLLUP_SUMS, 0))
+
+    return format_summary(totals), {
+        owner_id: by_owner.get(owner_id, empty) for owner_id in owner_ids
+    }
+
+
+@receiver(post_save, sender=Lead)
+def add_lead_to_rollup(sender, instance=None, created=False, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        add_to_rollup(instance)
+    else:
+        # Scores of existing lead changed, recount its day
+        day = get_rollup_day(instance.timestamp)
+        rebuild_lead_rollups(instance.owner_id, day, day + timedelta(days=1))
+
+
+@receiver(post_delete, sender=Lead)
+def remove_lead_from_rollup(sender, instance=None, **kwargs):
+    add_to_rollup(instance, sign=-1)
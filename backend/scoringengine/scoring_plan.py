@@ -0,0 +1,123 @@
+"""In-memory scoring plans shared by owners of the same scoring configuration.
+
+Plan holds owner's questions with their choices, scoring models with ranges
+and recommendations, loaded by a fixed number of queries. Lead scoring looks
+questions and choices up in the plan instead of querying them per answer.
+
+Plans of catalogue masters, which are shared with their slaves (see
+users.SharedScoringConfig), are kept in memory of the worker keyed by master
+and configuration version, so all slaves scoring leads with the master's
+configuration use a single plan. Configuration version is bumped on every
+change of master's configuration, plans of older versions are dropped.
+Plans of other owners are built per request.
+"""
+import threading
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+
+from scoringengine.models import DatesRange, Question, ValueRange
+
+MAX_CACHED_PLANS = 64
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+class ScoringPlan:
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+
+        questions = (
+            Question.objects.filter(owner_id=owner_id)
+            .select_related("scoring_model", "recommendation")
+            .prefetch_related(
+                "choices",
+                Prefetch("scoring_model__ranges", ValueRange.objects.order_by("pk")),
+                Prefetch(
+                    "scoring_model__dates_ranges", DatesRange.objects.order_by("pk")
+                ),
+            )
+        )
+
+        self.questions = {question.field_name: question for question in questions}
+        self.choices = {
+            (question.field_name, choice.slug): choice
+            for question in self.questions.values()
+            for choice in question.choices.all()
+        }
+
+    def get_question(self, field_name: str):
+        return self.questions.get(field_name)
+
+    def get_choice(self, question: Question, slug: str):
+        return self.choices.get((question.field_name, slug))
+
+
+def get_config_source(owner_id) -> tuple:
+    """Return (owner of scoring configuration, version) of owner.
+
+    Version is None unless configuration is one of catalogue master.
+    """
+    row = (
+        get_user_model()
+        .objects.filter(pk=owner_id)
+        .values_list(
+            "shared_scoring_config__catalogue__master_id",
+            "shared_scoring_config__catalogue__config_version",
+            "catalogue_as_master__config_version",
+        )
+        .first()
+    )
+
+    if row is None:
+        return owner_id, None
+
+    master_id, shared_version, own_version = row
+
+    if master_id is not None:
+        return master_id, shared_version
+
+    return owner_id, own_version
+
+
+def get_config_owner_id(owner_id):
+    """Return owner of scoring configuration used for leads of owner"""
+    return get_config_source(owner_id)[0]
+
+
+def get_scoring_plan(owner) -> ScoringPlan:
+    """Return scoring plan of configuration used for leads of owner"""
+    config_owner_id, version = get_config_source(owner.pk)
+
+    if version is None:
+        return ScoringPlan(config_owner_id)
+
+    key = (config_owner_id, version)
+
+    with _plans_lock:
+        plan = _plans.get(key)
+
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+
+    # Built outside of the lock, concurrent builds of one plan are harmless
+    plan = ScoringPlan(config_owner_id)
+
+    with _plans_lock:
+        for cached_key in [k for k in _plans if k[0] == config_owner_id]:
+            del _plans[cached_key]
+
+        _plans[key] = plan
+
+        while len(_plans) > MAX_CACHED_PLANS:
+            _plans.popitem(last=False)
+
+    return plan
+
+
+def clear_scoring_plans() -> None:
+    with _plans_lock:
+        _plans.clear()
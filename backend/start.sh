@@ -22,6 +22,23 @@ python manage.py collectstatic --noinput --verbosity=0
 # echo "Creating admin user..."
 # python manage.py create_admin
 
+# Run background job workers alongside Gunicorn, restarting them if they exit.
+# Set RUN_WORKERS=false when they run as a separate service, export files are
+# then downloadable only with media shared with it or EXPORT_JOBS_STORAGE set.
+run_worker() {
+    while true; do
+        python manage.py "$@"
+        echo "Worker $1 exited, restarting in 5s..."
+        sleep 5
+    done
+}
+
+if [ "${RUN_WORKERS:-true}" = "true" ]; then
+    echo "Starting background workers..."
+    run_worker run_export_jobs &
+    run_worker run_clone_jobs &
+fi
+
 # Start the application
 echo "Starting Gunicorn..."
 exec gunicorn hfcscoringengine.wsgi:application \
@@ -0,0 +1,185 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from scoringengine.models import Choice, Lead, Question
+from scoringengine.scoring_plan import clear_scoring_plans, get_scoring_plan
+from users.models import Catalogue, SharedScoringConfig
+from users.scoring_config import share_scoring_config
+
+pytestmark = pytest.mark.django_db
+
+LEAD_DATA = {
+    "answers": {
+        "q1u": "1-2",
+        "q2u": "1",
+        "q3u": "5",
+        "zc": "ZC29076",
+        "q5u": "1,3",
+        "q6u": "text",
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def scoring_plans():
+    clear_scoring_plans()
+    yield
+    clear_scoring_plans()
+
+
+@pytest.fixture()
+def slave(django_user_model):
+    return django_user_model.objects.create(username="slave", is_staff=True)
+
+
+@pytest.fixture()
+def catalogue(user, slave, questions):
+    catalogue = Catalogue.objects.create(master=user)
+    catalogue.slaves.add(slave)
+
+    assert share_scoring_config(catalogue, [slave]) == [slave]
+
+    return catalogue
+
+
+class TestShareScoringConfig:
+    def test_slave_with_questions_keeps_them(self, catalogue, user1):
+        catalogue.slaves.add(user1)
+
+        assert share_scoring_config(catalogue, [user1]) == []
+        assert not SharedScoringConfig.objects.filter(slave=user1).exists()
+
+    def test_plan_shared_until_master_changes(self, catalogue, user, slave):
+        plan = get_scoring_plan(slave)
+
+        assert plan.owner_id == user.pk
+        assert get_scoring_plan(user) is plan
+
+        question = Question.objects.get(owner=user, field_name="zc")
+        question.text = "Changed"
+        question.save()
+
+        catalogue.refresh_from_db()
+        assert catalogue.config_version == 2
+        assert get_scoring_plan(slave) is not plan
+
+    def test_removed_slave_gets_copy(self, catalogue, user, slave):
+        catalogue.slaves.remove(slave)
+
+        assert not SharedScoringConfig.objects.filter(slave=slave).exists()
+        assert set(
+            Question.objects.filter(owner=slave).values_list("field_name", flat=True)
+        ) == set(
+            Question.objects.filter(owner=user).values_list("field_name", flat=True)
+        )
+
+
+class TestSharedScoringConfigViews:
+    def test_create_lead(self, catalogue, user, slave, api_client_for_user):
+        url = reverse("api:v1:leads-list")
+
+        master_response = api_client_for_user(user).post(
+            url, data=LEAD_DATA, format="json"
+        )
+        response = api_client_for_user(slave).post(url, data=LEAD_DATA, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert {**response.json(), "lead_id": None} == {
+            **master_response.json(),
+            "lead_id": None,
+        }
+        assert Lead.objects.filter(owner=slave).count() == 1
+        assert not Question.objects.filter(owner=slave).exists()
+
+    def test_list_shared_questions(self, catalogue, user, slave, api_client_for_user):
+        response = api_client_for_user(slave).get(reverse("api:v1:questions-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {question["field_name"] for question in response.json()} == set(
+            Question.objects.filter(owner=user).values_list("field_name", flat=True)
+        )
+
+    def test_change_copies_config(self, catalogue, user, slave, api_client_for_user):
+        shared = Question.objects.get(owner=user, field_name="zc")
+
+        response = api_client_for_user(slave).patch(
+            reverse("api:v1:questions-detail", kwargs={"pk": shared.pk}),
+            data={"text": "Slave zip code"},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["id"] != shared.pk
+        assert Question.objects.get(owner=slave, field_name="zc").text == (
+            "Slave zip code"
+        )
+        assert Question.objects.get(pk=shared.pk).text == shared.text
+        assert not SharedScoringConfig.objects.filter(slave=slave).exists()
+
+    def test_create_child_of_shared_row(
+        self, catalogue, user, slave, api_client_for_user
+    ):
+        shared = Question.objects.get(owner=user, field_name="q2u")
+
+        response = api_client_for_user(slave).post(
+            reverse("api:v1:choices-list"),
+            data={"question": shared.pk, "text": "New", "slug": "new", "value": 7},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Choice.objects.get(slug="new").question.owner == slave
+        assert not Choice.objects.filter(question=shared, slug="new").exists()
+
+    def test_fork_moves_recommendation_hits(
+        self, catalogue, user, slave, api_client_for_user
+    ):
+        response = api_client_for_user(slave).post(
+            reverse("api:v1:leads-list"), data=LEAD_DATA, format="json"
+        )
+        lead = Lead.objects.get(owner=slave)
+        assert lead.recommendation_hits.filter(recommendation__owner=user).exists()
+
+        catalogue.slaves.remove(slave)
+
+        assert not lead.recommendation_hits.exclude(
+            recommendation__owner=slave
+        ).exists()
+
+        retrieved = api_client_for_user(slave).get(
+            reverse("api:v1:leads-detail", kwargs={"pk": lead.pk})
+        )
+
+        assert retrieved.json()["recommendations"] == response.json()["recommendations"]
+
+    def test_filter_by_answer_range(self, catalogue, user, slave, api_client_for_user):
+        client = api_client_for_user(slave)
+        client.post(reverse("api:v1:leads-list"), data=LEAD_DATA, format="json")
+
+        response = client.get(reverse("api:v1:leads-list"), {"answer__q3u__gte": 1})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["results"]) == 1
+
+        response = client.get(
+            reverse("api:v1:analytics-timeseries"), {"answer__q3u__gte": 1}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_admin_answer_range_filters(
+        self, catalogue, user, slave, lead_admin_and_model, fake_request
+    ):
+        lead_admin, _ = lead_admin_and_model
+        fake_request.user = slave
+
+        list_filter = lead_admin.get_list_filter(fake_request)
+
+        assert len(
+            [item for item in list_filter if item[0].startswith("answers__")]
+        ) == (
+            Question.objects.filter(
+                owner=user, type__in=[Question.DATE, Question.INTEGER, Question.SLIDER]
+            ).count()
+        )
@@ -1,7 +1,25 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+from uuid import UUID
+
 import pytest
+from django.db.models import F
 from django.urls import reverse
+from django.utils.timezone import now
 from rest_framework import status
 
+from api.v1.scoringengine.views import AnalyticsViewSet
+from scoringengine.archive import archive_batch
+from scoringengine.models import (
+    Answer,
+    AnswerFacet,
+    Lead,
+    Recommendation,
+    RecommendationHit,
+)
+from scoringengine.pagination import encode_cursor
+
 pytestmark = pytest.mark.django_db
 
 
@@ -382,3 +400,550 @@ class TestLeadViewSet:
         assert response.status_code == status.HTTP_201_CREATED
         assert not user.leads.filter(lead_id=lead_id).exists()
         assert user1.leads.filter(lead_id=lead_id).exists()
+
+
+class TestLeadList:
+    @pytest.fixture()
+    def listed_leads(self, user, user1):
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        leads = []
+
+        for n, score in enumerate([5, 30, 10, 30, 20]):
+            lead = Lead.objects.create(
+                x_axis=score, y_axis=0, total_score=score, owner=user
+            )
+            Answer.objects.create(lead=lead, field_name="q1u", response=str(n))
+            # First two leads share timestamp to check lead id tiebreaker
+            Lead.objects.filter(pk=lead.pk).update(
+                timestamp=base + timedelta(hours=max(n, 1))
+            )
+            leads.append(lead)
+
+        Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user1)
+
+        return leads
+
+    def get_pages(self, api_client, params):
+        response = api_client.get(reverse("api:v1:leads-list"), params)
+        pages = []
+
+        while response.json()["results"]:
+            assert response.status_code == status.HTTP_200_OK
+            pages.append([lead["lead_id"] for lead in response.json()["results"]])
+
+            if not response.json()["next"]:
+                break
+            response = api_client.get(response.json()["next"])
+
+        return pages, response
+
+    def test_list_pages_by_timestamp(
+        self, api_client, user, listed_leads, django_assert_max_num_queries
+    ):
+        expected = [
+            str(pk)
+            for pk in Lead.objects.filter(owner=user)
+            .order_by("timestamp", "lead_id")
+            .values_list("pk", flat=True)
+        ]
+
+        # Authentication, leads, answers and recommendation hits of page
+        with django_assert_max_num_queries(4):
+            response = api_client.get(reverse("api:v1:leads-list"), {"limit": 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.json()["results"][0]) == {
+            "lead_id",
+            "timestamp",
+            "x_axis",
+            "y_axis",
+            "total_score",
+            "answers",
+            "recommendations",
+        }
+
+        pages, last_response = self.get_pages(api_client, {"limit": 2})
+
+        assert sum(pages, []) == expected
+        assert [len(page) for page in pages] == [2, 2, 1]
+
+        # Last page links to leads created later
+        next_url = last_response.json()["next"]
+        assert api_client.get(next_url).json()["results"] == []
+
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        response = api_client.get(next_url)
+
+        assert [r["lead_id"] for r in response.json()["results"]] == [str(lead.lead_id)]
+
+    def test_poll_relists_recent_leads(self, api_client, user, listed_leads):
+        _, last_response = self.get_pages(api_client, {"limit": 10})
+        next_url = last_response.json()["next"]
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        response = api_client.get(next_url)
+
+        assert [r["lead_id"] for r in response.json()["results"]] == [str(lead.pk)]
+
+        # Lead committing late gets timestamp before already listed lead
+        late_lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        Lead.objects.filter(pk=late_lead.pk).update(
+            timestamp=lead.timestamp - timedelta(seconds=1)
+        )
+        response = api_client.get(response.json()["next"])
+
+        assert [r["lead_id"] for r in response.json()["results"]] == [
+            str(late_lead.pk),
+            str(lead.pk),
+        ]
+
+        # Leads older than poll overlap are not listed again
+        Lead.objects.filter(pk__in=[lead.pk, late_lead.pk]).update(
+            timestamp=F("timestamp") - timedelta(minutes=5)
+        )
+        response = api_client.get(response.json()["next"])
+
+        assert len(response.json()["results"]) == 2
+        assert api_client.get(response.json()["next"]).json()["results"] == []
+
+    def test_list_top_scored(self, api_client, listed_leads):
+        pages, _ = self.get_pages(api_client, {"ordering": "-total_score", "limit": 2})
+
+        scores = dict(
+            Lead.objects.filter(pk__in=sum(pages, [])).values_list(
+                "lead_id", "total_score"
+            )
+        )
+        listed_scores = [scores[UUID(pk)] for pk in sum(pages, [])]
+
+        assert listed_scores == [30, 30, 20, 10, 5]
+        assert [len(page) for page in pages] == [2, 2, 1]
+
+    def test_list_filtered(self, api_client, listed_leads):
+        response = api_client.get(
+            reverse("api:v1:leads-list"),
+            {
+                "total_score__gte": "10",
+                "total_score__lte": "25",
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-01T04:00:00Z",
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r["lead_id"] for r in response.json()["results"]] == [
+            str(listed_leads[2].lead_id)
+        ]
+
+    def test_list_filtered_by_customer(self, api_client, user, listed_leads):
+        Lead.objects.filter(pk=listed_leads[1].pk).update(
+            customer_email="john@example.com"
+        )
+
+        response = api_client.get(
+            reverse("api:v1:leads-list"), {"customer_email": "john@example.com"}
+        )
+
+        assert [r["lead_id"] for r in response.json()["results"]] == [
+            str(listed_leads[1].lead_id)
+        ]
+
+    @pytest.mark.usefixtures("questions")
+    def test_list_filtered_by_answer_range(self, api_client, user, listed_leads):
+        answer = Answer.objects.create(lead=listed_leads[3], field_name="q3u", value=7)
+        AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(user.id, [answer]))
+
+        response = api_client.get(
+            reverse("api:v1:leads-list"), {"answer__q3u__gte": "5"}
+        )
+
+        assert [r["lead_id"] for r in response.json()["results"]] == [
+            str(listed_leads[3].lead_id)
+        ]
+
+    @pytest.mark.parametrize(
+        "params,status_code",
+        [
+            ({"cursor": "invalid"}, status.HTTP_404_NOT_FOUND),
+            ({"cursor": encode_cursor("timestamp", 1, 2)}, status.HTTP_404_NOT_FOUND),
+            ({"ordering": "x_axis"}, status.HTTP_400_BAD_REQUEST),
+            ({"total_score__gte": "abc"}, status.HTTP_400_BAD_REQUEST),
+            (
+                {"start": "2024-01-02T00:00:00Z", "end": "2024-01-01T00:00:00Z"},
+                status.HTTP_400_BAD_REQUEST,
+            ),
+        ],
+    )
+    def test_list_invalid_params(self, api_client, params, status_code):
+        response = api_client.get(reverse("api:v1:leads-list"), params)
+
+        assert response.status_code == status_code
+
+    def test_list_cursor_of_other_ordering(self, api_client, listed_leads):
+        response = api_client.get(reverse("api:v1:leads-list"), {"limit": 1})
+        cursor = parse_qs(urlparse(response.json()["next"]).query)["cursor"][0]
+
+        response = api_client.get(
+            reverse("api:v1:leads-list"), {"cursor": cursor, "ordering": "-total_score"}
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestAnalyticsViewSet:
+    @pytest.fixture()
+    def timeseries_leads(self, user, user1):
+        timestamps = [
+            datetime(2024, 1, 1, 10, 15, tzinfo=timezone.utc),
+            datetime(2024, 1, 1, 10, 45, tzinfo=timezone.utc),
+            datetime(2024, 1, 2, 9, 0, tzinfo=timezone.utc),
+        ]
+
+        for n, timestamp in enumerate(timestamps):
+            lead = Lead.objects.create(
+                x_axis=n, y_axis=2 * n, total_score=3 * n, owner=user
+            )
+            Lead.objects.filter(pk=lead.pk).update(timestamp=timestamp)
+
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user1)
+        Lead.objects.filter(pk=lead.pk).update(timestamp=timestamps[0])
+
+    @pytest.mark.usefixtures("timeseries_leads")
+    def test_timeseries_per_day(self, api_client):
+        url = reverse("api:v1:analytics-timeseries")
+
+        response = api_client.get(
+            url,
+            {
+                "interval": "day",
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-03T00:00:00Z",
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["results"] == [
+            {
+                "period": "2024-01-01T00:00:00+00:00",
+                "leads": 2,
+                "x_axis": 0.5,
+                "y_axis": 1.0,
+                "total_score": 1.5,
+            },
+            {
+                "period": "2024-01-02T00:00:00+00:00",
+                "leads": 1,
+                "x_axis": 2.0,
+                "y_axis": 4.0,
+                "total_score": 6.0,
+            },
+        ]
+
+    @pytest.mark.usefixtures("timeseries_leads")
+    def test_timeseries_csv(self, api_client):
+        url = reverse("api:v1:analytics-timeseries")
+
+        response = api_client.get(
+            url,
+            {
+                "interval": "hour",
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-02T00:00:00Z",
+                "output": "csv",
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        assert b"".join(response.streaming_content).decode().splitlines() == [
+            "period,leads,x_axis,y_axis,total_score",
+            "2024-01-01T10:00:00+00:00,2,0.50,1.00,1.50",
+        ]
+
+    def test_timeseries_invalid_range(self, api_client):
+        url = reverse("api:v1:analytics-timeseries")
+
+        response = api_client.get(
+            url, {"start": "2024-01-02T00:00:00Z", "end": "2024-01-01T00:00:00Z"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.usefixtures("questions")
+    def test_points_contribution(self, api_client, user, django_assert_max_num_queries):
+        url = reverse("api:v1:analytics-points-contribution")
+
+        for n, (q1u_points, q3u_points) in enumerate([(1, 9), (2, 9), (3, 18)]):
+            lead = Lead.objects.create(
+                x_axis=q1u_points + q3u_points,
+                y_axis=q1u_points,
+                total_score=2 * q1u_points + q3u_points,
+                owner=user,
+            )
+            Answer.objects.create(lead=lead, field_name="q1u", points=q1u_points)
+            Answer.objects.create(lead=lead, field_name="q3u", points=q3u_points)
+            # Multiple values answer repeats points of question
+            Answer.objects.create(
+                lead=lead, field_name="q3u", points=q3u_points, value_number=1
+            )
+
+        # Authentication + 2 aggregate queries
+        with django_assert_max_num_queries(4):
+            response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+
+        data = {q["field_name"]: q for q in response.json()}
+
+        assert data["q1u"]["answers"] == 3
+        assert data["q1u"]["total_points"] == 6.0
+        assert data["q1u"]["mean_points"] == 2.0
+        assert data["q1u"]["x_axis_share"] == 0.1429
+        assert data["q1u"]["y_axis_share"] == 1.0
+        assert data["q3u"]["total_points"] == 36.0
+        assert data["q3u"]["x_axis_share"] == 0.8571
+        assert data["q3u"]["y_axis_share"] is None
+        assert data["q3u"]["total_score_correlation"] == 0.9897
+        assert data["q2u"]["answers"] == 0
+        assert data["q2u"]["total_score_correlation"] is None
+
+    def test_points_contribution_default_range(self, api_client, mocker):
+        url = reverse("api:v1:analytics-points-contribution")
+        get_cached = mocker.patch.object(
+            AnalyticsViewSet, "get_cached", return_value=[]
+        )
+
+        api_client.get(url)
+        api_client.get(url)
+
+        first, second = get_cached.call_args_list
+        assert first.args[2:] == second.args[2:]
+        start, end = first.args[2:]
+        assert end % 3600 == 0
+        assert end - start == 30 * 24 * 3600
+
+    @pytest.mark.usefixtures("questions", "timeseries_leads")
+    def test_timeseries_filtered_by_answer_range(self, api_client, user):
+        url = reverse("api:v1:analytics-timeseries")
+
+        lead = user.leads.order_by("timestamp").last()
+        answer = Answer.objects.create(lead=lead, field_name="q3u", value=7)
+        AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(user.id, [answer]))
+
+        response = api_client.get(
+            url,
+            {
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-03T00:00:00Z",
+                "answer__q3u__gte": "5",
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r["period"] for r in response.json()["results"]] == [
+            "2024-01-02T00:00:00+00:00"
+        ]
+
+    @pytest.mark.usefixtures("questions")
+    @pytest.mark.parametrize(
+        "param,value", [("answer__unknown__gte", "1"), ("answer__q3u__gte", "abc")]
+    )
+    def test_timeseries_filtered_by_invalid_answer_range(
+        self, api_client, param, value
+    ):
+        url = reverse("api:v1:analytics-timeseries")
+
+        response = api_client.get(url, {param: value})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestLeadRecommendations:
+    data = {
+        "answers": {
+            "q1u": "1-2",
+            "q2u": "1",
+            "q3u": "5",
+            "zc": "ZC29076",
+            "q5u": "1,3",
+            "q6u": "text",
+        },
+    }
+
+    @pytest.mark.usefixtures("questions")
+    def test_create_lead_stores_recommendation_hits(self, api_client):
+        response = api_client.post(
+            reverse("api:v1:leads-list"), data=self.data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["recommendations"] == {
+            "q2u": {
+                "response_text": "Rule is True",
+                "affiliate_name": "Example affiliate",
+                "affiliate_image": "https://example.com/image.jpeg",
+                "affiliate_link": "https://example.com/",
+                "redirect_url": "",
+            }
+        }
+
+        lead = Lead.objects.get(lead_id=response.json()["lead_id"])
+        hit = lead.recommendation_hits.get()
+
+        assert hit.recommendation_id == 1
+        assert hit.version == 1
+
+        answers = {a["field_name"]: a for a in response.json()["answers"]}
+
+        assert answers["q2u"]["response_text"] == "Rule is True"
+        assert answers["q1u"]["response_text"] == ""
+
+    @pytest.mark.usefixtures("questions")
+    def test_lead_keeps_recommendation_version(self, api_client):
+        response = api_client.post(
+            reverse("api:v1:leads-list"), data=self.data, format="json"
+        )
+        url = reverse("api:v1:leads-detail", kwargs={"pk": response.json()["lead_id"]})
+
+        recommendation = Recommendation.objects.get(pk=1)
+        recommendation.response_text = "Changed"
+        recommendation.save()
+
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["recommendations"]["q2u"]["response_text"] == (
+            "Rule is True"
+        )
+
+        response = api_client.post(
+            reverse("api:v1:leads-list"), data=self.data, format="json"
+        )
+
+        assert response.json()["recommendations"]["q2u"]["response_text"] == "Changed"
+        assert RecommendationHit.objects.filter(version=2).count() == 1
+
+
+class TestMultipleChoicesAnswers:
+    @pytest.mark.usefixtures("questions")
+    def test_create_lead_stores_values_and_choices_mask(self, api_client):
+        data = {**TestLeadRecommendations.data}
+
+        response = api_client.post(
+            reverse("api:v1:leads-list"), data=data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+
+        answer = Answer.objects.get(
+            lead_id=response.json()["lead_id"], field_name="q5u"
+        )
+
+        assert answer.values == [Decimal("1"), Decimal("3")]
+        assert answer.choices_mask == 0b101
+
+        answers = {a["field_name"]: a for a in response.json()["answers"]}
+
+        assert answers["q5u"]["values"] == [1.0, 3.0]
+
+    @pytest.mark.usefixtures("questions")
+    def test_question_analytics_counts_choice_selections(self, api_client):
+        for response in ["1,3", "1", "out-of-ranges,3"]:
+            data = {"answers": {**TestLeadRecommendations.data["answers"]}}
+            data["answers"]["q5u"] = response
+            api_client.post(reverse("api:v1:leads-list"), data=data, format="json")
+
+        response = api_client.get(reverse("api:v1:analytics-question-analytics"))
+
+        assert response.status_code == status.HTTP_200_OK
+
+        questions = {q["field_name"]: q for q in response.json()}
+
+        assert questions["q5u"]["total_answers"] == 3
+        assert questions["q5u"]["choice_selections"] == {"1": 2, "-10": 1, "3": 2}
+        assert "choice_selections" not in questions["q1u"]
+
+
+class TestArchivedLeadRetrieve:
+    @pytest.fixture(autouse=True)
+    def archive_settings(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path / "media")
+
+    def test_read_through_archive(self, api_client, lead):
+        url = reverse("api:v1:leads-detail", kwargs={"pk": str(lead.lead_id)})
+        expected = api_client.get(url).json()
+
+        archive_batch("lead", lead.owner_id, now() + timedelta(seconds=1))
+        assert not Lead.objects.filter(pk=lead.pk).exists()
+
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == expected
+        assert response.json()["recommendations"]["q1u"]["response_text"] == "Response"
+
+    def test_other_owner_archive(self, api_client_for_user, user1, lead):
+        archive_batch("lead", lead.owner_id, now() + timedelta(seconds=1))
+
+        response = api_client_for_user(user1).get(
+            reverse("api:v1:leads-detail", kwargs={"pk": str(lead.lead_id)})
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestCatalogueSummary:
+    @pytest.fixture()
+    def catalogue(self, user, user1, django_user_model):
+        from users.models import Catalogue
+
+        master = django_user_model.objects.create(username="master", is_staff=True)
+        catalogue = Catalogue.objects.create(master=master)
+        catalogue.slaves.set([user, user1])
+
+        for owner, total_score in [(user, 10), (user, 30), (user1, 50)]:
+            Lead.objects.create(
+                x_axis=total_score, y_axis=0, total_score=total_score, owner=owner
+            )
+
+        return catalogue
+
+    def test_summary(self, catalogue, user, user1, api_client_for_user):
+        url = reverse("api:v1:analytics-catalogue-summary")
+
+        response = api_client_for_user(catalogue.master).get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"]["total_leads"] == 3
+        assert data["total"]["average_scores"]["total"] == 30
+        assert data["total"]["score_distribution"] == {
+            "low": 1,
+            "medium": 1,
+            "high": 1,
+        }
+        assert [
+            (slave["username"], slave["total_leads"]) for slave in data["slaves"]
+        ] == [(user.username, 2), (user1.username, 1)]
+
+    def test_selected_slaves(self, catalogue, user1, api_client_for_user):
+        url = reverse("api:v1:analytics-catalogue-summary")
+
+        response = api_client_for_user(catalogue.master).get(url, {"slave": user1.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["total"]["total_leads"] == 1
+        assert [slave["id"] for slave in response.json()["slaves"]] == [user1.id]
+
+    def test_slaves_limit(self, catalogue, api_client_for_user, settings):
+        settings.CATALOGUE_ANALYTICS = {"MAX_SLAVES": 1}
+        url = reverse("api:v1:analytics-catalogue-summary")
+
+        response = api_client_for_user(catalogue.master).get(url)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.usefixtures("catalogue")
+    def test_not_master(self, api_client):
+        url = reverse("api:v1:analytics-catalogue-summary")
+
+        assert api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
@@ -19,6 +19,7 @@ from scoringengine.models import (
     Lead,
     Question,
     Recommendation,
+    RecommendationHit,
     ScoringModel,
     ValueRange,
 )
@@ -387,11 +388,6 @@ def lead(lead_data, questions_for_user):
         lead=l,
         field_name=questions_for_user[0].field_name,
         response=questions_for_user[0].choices.first().text,
-        response_text="Response",
-        affiliate_name="Example affiliate",
-        affiliate_image="https://example.com/image.jpeg",
-        affiliate_link="https://example.com/",
-        redirect_url="https://example.com/redirect",
     )
     a2 = Answer(
         lead=l,
@@ -402,6 +398,21 @@ def lead(lead_data, questions_for_user):
     a1.save()
     a2.save()
 
+    r = Recommendation(
+        question=questions_for_user[0],
+        rule="If {q1u} > 0",
+        response_text="Response",
+        affiliate_name="Example affiliate",
+        affiliate_image="https://example.com/image.jpeg",
+        affiliate_link="https://example.com/",
+        redirect_url="https://example.com/redirect",
+        owner=questions_for_user[0].owner,
+    )
+
+    r.save()
+
+    RecommendationHit.objects.create(lead=l, recommendation=r, version=r.version)
+
     yield l
 
     l.delete()
@@ -1,8 +1,30 @@
+import csv
+import gzip
+import io
+from datetime import timedelta
+
+import pyarrow.parquet as pq
 import pytest
 from django import forms
 from django.urls import resolve, reverse
+from django.utils.timezone import now
 
-from scoringengine.models import Question
+from scoringengine.admin import (
+    AnswerRangeFilterBuilder,
+    KeysetChangeList,
+    LeadAdmin,
+    RecommendationHitInline,
+)
+from scoringengine.helpers import add_lead_log
+from scoringengine.models import (
+    Answer,
+    AnswerFacet,
+    Lead,
+    LeadLog,
+    LeadSearchDocument,
+    Question,
+)
+from scoringengine.pagination import encode_cursor
 
 pytestmark = pytest.mark.django_db
 
@@ -251,6 +273,219 @@ class TestLeadAdmin:
 
         assert not lead_admin.has_change_permission(fake_request)
 
+    def test_answer_range_filter_uses_facets(
+        self, lead_admin_and_model, fake_request, user, user1
+    ):
+        lead_admin, Lead = lead_admin_and_model
+
+        leads = []
+        for owner, value in [(user, 5), (user, 9), (user1, 9)]:
+            lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=owner)
+            answer = Answer.objects.create(lead=lead, field_name="q3u", value=value)
+            AnswerFacet.objects.bulk_create(
+                AnswerFacet.from_answers(owner.id, [answer])
+            )
+            leads.append(lead)
+
+        filter_cls = AnswerRangeFilterBuilder("Q3", Question.SLIDER, "q3u")
+        list_filter = filter_cls(
+            Answer._meta.get_field("value"),
+            fake_request,
+            {"q3u__gte": "6"},
+            Lead,
+            lead_admin,
+            "answers__value",
+        )
+
+        queryset = list_filter.queryset(fake_request, Lead.objects.all())
+
+        assert list(queryset) == [leads[1]]
+
+    def test_search_uses_search_documents(
+        self, lead_admin_and_model, fake_request, user, user1
+    ):
+        lead_admin, Lead = lead_admin_and_model
+
+        leads = []
+        for owner, response in [(user, "Red car"), (user, "blue car"), (user1, "red")]:
+            lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=owner)
+            answer = Answer.objects.create(
+                lead=lead, field_name="q1", response=response
+            )
+            LeadSearchDocument.from_answers(lead, [answer]).save()
+            leads.append(lead)
+
+        queryset, may_have_duplicates = lead_admin.get_search_results(
+            fake_request, Lead.objects.all(), '"red car"'
+        )
+
+        assert list(queryset) == [leads[0]]
+        assert not may_have_duplicates
+
+    def test_empty_search_returns_queryset(self, lead_admin_and_model, fake_request):
+        lead_admin, Lead = lead_admin_and_model
+        queryset = Lead.objects.all()
+
+        assert lead_admin.get_search_results(fake_request, queryset, " ") == (
+            queryset,
+            False,
+        )
+
+    @pytest.mark.usefixtures("questions")
+    def test_export_streams_filtered_leads(self, django_client, user):
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        Answer.objects.create(lead=lead, field_name="zc", response="12345")
+        Lead.objects.create(x_axis=5, y_axis=5, total_score=10, owner=user)
+
+        url = reverse("admin:scoringengine_lead_export", args=["csv"])
+        response = django_client.get(url, {"total_score__lte": "5"})
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "text/csv"
+
+        header, *rows = csv.reader(
+            io.StringIO(b"".join(response.streaming_content).decode())
+        )
+
+        assert header[:5] == ["lead_id", "timestamp", "x_axis", "y_axis", "total_score"]
+        assert len(rows) == 1
+        assert rows[0][0] == str(lead.lead_id)
+        assert rows[0][header.index("zc")] == "12345"
+
+    def test_export_gzip(self, django_client):
+        url = reverse("admin:scoringengine_leadlog_export", args=["csv.gz"])
+        response = django_client.get(url)
+
+        assert response["Content-Type"] == "application/gzip"
+        assert gzip.decompress(b"".join(response.streaming_content)).startswith(
+            b"lead_id,"
+        )
+
+    def test_export_parquet(self, django_client, user):
+        Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+
+        url = reverse("admin:scoringengine_lead_export", args=["parquet"])
+        response = django_client.get(url)
+
+        assert response["Content-Type"] == "application/vnd.apache.parquet"
+        assert response["Content-Disposition"].endswith('.parquet"')
+
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        assert table.num_rows == 1
+
+    def test_export_unknown_format(self, django_client):
+        url = reverse("admin:scoringengine_lead_export", args=["xls"])
+
+        assert django_client.get(url).status_code == 404
+
+    def test_changelist_keyset_pagination(self, django_client, user, monkeypatch):
+        monkeypatch.setattr(KeysetChangeList, "keyset_threshold", 3)
+        monkeypatch.setattr(LeadAdmin, "list_per_page", 2)
+
+        base = now()
+        leads = [
+            Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+            for _ in range(5)
+        ]
+        # Two leads share timestamp to check primary key tiebreaker
+        for lead, minutes in zip(leads, [5, 4, 3, 3, 1]):
+            Lead.objects.filter(pk=lead.pk).update(
+                timestamp=base - timedelta(minutes=minutes)
+            )
+        expected = list(
+            Lead.objects.order_by("-timestamp", "-pk").values_list("pk", flat=True)
+        )
+
+        url = reverse("admin:scoringengine_lead_changelist")
+        pages = []
+        response = django_client.get(url)
+
+        while True:
+            cl = response.context["cl"]
+            assert cl.keyset
+            pages.append([lead.pk for lead in cl.result_list])
+
+            if not cl.keyset_next_url:
+                break
+            response = django_client.get(url + cl.keyset_next_url)
+
+        assert sum(pages, []) == expected
+        assert [len(page) for page in pages] == [2, 2, 1]
+
+        response = django_client.get(url + cl.keyset_previous_url)
+        cl = response.context["cl"]
+        assert [lead.pk for lead in cl.result_list] == pages[1]
+
+        response = django_client.get(url + cl.keyset_previous_url)
+        cl = response.context["cl"]
+        assert [lead.pk for lead in cl.result_list] == pages[0]
+        assert cl.keyset_previous_url is None
+
+    def test_changelist_below_keyset_threshold(self, django_client, user):
+        Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+
+        response = django_client.get(reverse("admin:scoringengine_lead_changelist"))
+        cl = response.context["cl"]
+
+        assert not cl.keyset
+        assert cl.result_count == 1
+
+    @pytest.mark.parametrize("cursor", ["invalid", encode_cursor("next", 1, 2, 3)])
+    def test_changelist_invalid_cursor(self, django_client, cursor):
+        url = reverse("admin:scoringengine_lead_changelist")
+        response = django_client.get(url, {"cursor": cursor})
+
+        # Admin redirects to changelist with error flag on invalid lookups
+        assert response.status_code == 302
+
+
+class TestLeadLogAdmin:
+    @pytest.fixture()
+    def packed_lead_log(self, user):
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        answer = Answer.objects.create(
+            lead=lead, field_name="q3u", response="Boston", value=7
+        )
+
+        add_lead_log(lead)
+
+        # Entry is matched by its own answers, not the current ones of lead
+        answer.response = "Austin"
+        answer.value = 9
+        answer.save()
+        AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(user.id, [answer]))
+        LeadSearchDocument.from_answers(lead, [answer]).save()
+
+        return LeadLog.objects.get(lead_id=lead.lead_id)
+
+    def test_change_view_shows_packed_answers(self, django_client, packed_lead_log):
+        url = reverse("admin:scoringengine_leadlog_change", args=[packed_lead_log.pk])
+
+        response = django_client.get(url)
+
+        assert response.status_code == 200
+        assert "Boston" in response.content.decode()
+
+    def test_search_packed_entries(self, django_client, packed_lead_log):
+        url = reverse("admin:scoringengine_leadlog_changelist")
+
+        response = django_client.get(url, {"q": "boston"})
+        assert list(response.context["cl"].result_list) == [packed_lead_log]
+
+        response = django_client.get(url, {"q": "austin"})
+        assert list(response.context["cl"].result_list) == []
+
+    @pytest.mark.usefixtures("questions")
+    def test_answer_range_filter_packed_entries(self, django_client, packed_lead_log):
+        url = reverse("admin:scoringengine_leadlog_changelist")
+
+        response = django_client.get(url, {"q3u__gte": "5"})
+        assert list(response.context["cl"].result_list) == [packed_lead_log]
+
+        response = django_client.get(url, {"q3u__gte": "8"})
+        assert list(response.context["cl"].result_list) == []
+
 
 class TestAnswerInline:
     def test_fields_order(self, answer_inline_and_model, fake_request):
@@ -263,19 +498,31 @@ class TestAnswerInline:
             "value",
             "date_value",
             "values",
+            "choices_mask",
             "points",
             "lead",
-            "response_text",
-            "affiliate_name",
-            "affiliate_image",
-            "affiliate_link",
-            "redirect_url",
         ]
         fields = answer_inline.get_fields(fake_request)
 
         assert fields == expected_fields_order
 
 
+class TestRecommendationHitInline:
+    @pytest.mark.usefixtures("questions")
+    def test_recommendation_fields_show_hit_version(self, admin_site, lead):
+        inline = RecommendationHitInline(parent_model=Lead, admin_site=admin_site)
+        hit = lead.recommendation_hits.get()
+
+        recommendation = hit.recommendation
+        recommendation.response_text = "Changed"
+        recommendation.save()
+
+        html = inline.recommendation_fields(hit)
+
+        assert "<b>response_text:</b> Response" in html
+        assert "Changed" not in html
+
+
 class TestTokenAdmin:
     def test_get_queryset_returns_only_owned_tokens_for_non_superuser(
         self, user, user1, token_admin_and_model, fake_request
@@ -0,0 +1,209 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+import pytest
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from scoringengine.archive import (
+    archive_batch,
+    get_archived_lead,
+    get_retention_days,
+    iter_archived_leads,
+)
+from scoringengine.exports import iter_leads_csv
+from scoringengine.models import (
+    Answer,
+    ArchivedLead,
+    Lead,
+    LeadArchive,
+    LeadLog,
+    RetentionPolicy,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def archive_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.LEAD_ARCHIVE = {"LEADS_DAYS": 30, "LEAD_LOG_DAYS": 0}
+
+
+@pytest.fixture()
+def old_leads(user):
+    leads = []
+
+    for n, days in enumerate([60, 50, 40, 1]):
+        lead = Lead.objects.create(
+            x_axis=n, y_axis=1, total_score=n + 1, customer_id=f"c{n}", owner=user
+        )
+        Lead.objects.filter(pk=lead.pk).update(timestamp=now() - timedelta(days=days))
+        lead.refresh_from_db()
+
+        Answer.objects.create(
+            lead=lead, field_name="age", response=str(n), value=n, values=[n]
+        )
+        leads.append(lead)
+
+    return leads
+
+
+class TestRetentionDays:
+    def test_setting_default(self, user):
+        assert get_retention_days(user.id, "lead") == 30
+        assert get_retention_days(user.id, "leadlog") == 0
+
+    def test_owner_policy(self, user):
+        RetentionPolicy.objects.create(owner=user, leads_days=0, lead_log_days=90)
+
+        assert get_retention_days(user.id, "lead") == 0
+        assert get_retention_days(user.id, "leadlog") == 90
+
+    def test_empty_policy_field_falls_back_to_setting(self, user):
+        RetentionPolicy.objects.create(owner=user, lead_log_days=90)
+
+        assert get_retention_days(user.id, "lead") == 30
+
+
+class TestArchiveBatch:
+    def test_rows_moved_to_archive(self, old_leads, user):
+        archive = archive_batch("lead", user.id, now() - timedelta(days=30), 2)
+
+        assert archive.rows == 2
+        assert archive.first_timestamp == old_leads[0].timestamp
+        assert archive.last_timestamp == old_leads[1].timestamp
+        assert set(ArchivedLead.objects.values_list("lead_id", flat=True)) == {
+            old_leads[0].pk,
+            old_leads[1].pk,
+        }
+        assert list(Lead.objects.order_by("timestamp")) == old_leads[2:]
+        assert not Answer.objects.filter(lead_id=old_leads[0].pk).exists()
+
+        with archive.file.open("rb") as archive_file:
+            table = pq.read_table(io.BytesIO(archive_file.read()))
+
+        assert table.column("lead_id").to_pylist() == [
+            str(lead.lead_id) for lead in old_leads[:2]
+        ]
+
+    def test_nothing_to_archive(self, old_leads, user):
+        assert archive_batch("lead", user.id, now() - timedelta(days=90)) is None
+        assert not LeadArchive.objects.exists()
+
+    def test_lead_log(self, user):
+        entry = LeadLog.objects.create(
+            x_axis=1,
+            y_axis=1,
+            total_score=2,
+            owner=user,
+            timestamp=now() - timedelta(days=10),
+            answers_data=LeadLog.pack_answers(
+                [Answer(field_name="city", response="Boston")]
+            ),
+            recommendations=[[1, 2]],
+        )
+
+        archive = archive_batch("leadlog", user.id, now())
+
+        assert archive.rows == 1
+        assert not LeadLog.objects.exists()
+        # Lead log entries share lead ids, they are not indexed
+        assert not ArchivedLead.objects.exists()
+
+        archived = list(iter_archived_leads("leadlog", user.id))
+        assert [lead.lead_id for lead in archived] == [entry.lead_id]
+        assert archived[0].get_answers()[0].response == "Boston"
+        assert archived[0].recommendations == [[1, 2]]
+
+
+class TestArchivedLeads:
+    def test_get_archived_lead(self, old_leads, user, user1):
+        call_command("archive_leads", stdout=io.StringIO())
+
+        lead = get_archived_lead(user.id, old_leads[1].lead_id)
+
+        assert lead.lead_id == old_leads[1].lead_id
+        assert lead.timestamp == old_leads[1].timestamp
+        assert lead.total_score == Decimal("2.00")
+        assert lead.customer_id == "c1"
+
+        answer = lead.get_answers()[0]
+        assert (answer.field_name, answer.value, answer.values) == (
+            "age",
+            Decimal("1"),
+            [1],
+        )
+
+        assert get_archived_lead(user1.id, old_leads[1].lead_id) is None
+        assert get_archived_lead(user.id, old_leads[3].lead_id) is None
+        assert get_archived_lead(user.id, "not-uuid") is None
+
+    def test_iter_archived_leads_by_date_range(self, old_leads, user):
+        call_command("archive_leads", batch_size=2, stdout=io.StringIO())
+
+        archived = iter_archived_leads(
+            "lead",
+            user.id,
+            start=now() - timedelta(days=55),
+            end=now() - timedelta(days=35),
+        )
+
+        assert [lead.lead_id for lead in archived] == [
+            lead.lead_id for lead in old_leads[1:3]
+        ]
+
+    def test_export_reads_archived_leads_first(self, old_leads, user):
+        call_command("archive_leads", stdout=io.StringIO())
+
+        content = "".join(
+            iter_leads_csv(
+                Lead.objects.all(),
+                ["age"],
+                chunk_size=2,
+                archived=iter_archived_leads("lead", user.id),
+            )
+        )
+        rows = [line.split(",") for line in content.splitlines()[1:]]
+
+        assert [row[0] for row in rows] == [str(lead.lead_id) for lead in old_leads]
+        assert [row[-1] for row in rows] == ["0", "1", "2", "3"]
+
+
+class TestArchiveLeadsCommand:
+    def test_archives_in_batches(self, old_leads, user):
+        stdout = io.StringIO()
+
+        call_command("archive_leads", batch_size=2, stdout=stdout)
+
+        assert list(LeadArchive.objects.values_list("rows", flat=True)) == [2, 1]
+        assert list(Lead.objects.all()) == old_leads[3:]
+        assert "Done, archived 3 rows" in stdout.getvalue()
+
+    def test_owner_without_retention(self, old_leads, user):
+        RetentionPolicy.objects.create(owner=user, leads_days=0)
+
+        call_command("archive_leads", owner=user.id, stdout=io.StringIO())
+
+        assert Lead.objects.count() == len(old_leads)
+        assert not LeadArchive.objects.exists()
+
+    def test_export_command_with_archived(self, old_leads, user, tmp_path):
+        call_command("archive_leads", stdout=io.StringIO())
+        output = tmp_path / "leads.parquet"
+
+        call_command(
+            "export_leads",
+            str(output),
+            "--start",
+            (now() - timedelta(days=45)).isoformat(),
+            owner=user.id,
+            archived=True,
+            stdout=io.StringIO(),
+        )
+
+        assert pq.read_table(str(output)).column("lead_id").to_pylist() == [
+            str(lead.lead_id) for lead in old_leads[2:]
+        ]
@@ -0,0 +1,197 @@
+import threading
+import time
+
+from control_plane.audit_shipper import AuditShipper, RejectedEvent
+from control_plane.repo_b_audit_adapter import BILLABLE_KEY, RepoBAuditAdapter
+
+TENANT = "6f1b7c2e-0d3a-4e5f-9a8b-1c2d3e4f5a6b"
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class Hub:
+    def __init__(self):
+        self.events = []
+        self.down = False
+
+    def send(self, event):
+        if self.down:
+            raise ConnectionError("Hub is down")
+        if event.get("invalid"):
+            raise RejectedEvent("Invalid event")
+        self.events.append(event)
+
+
+class TestAuditShipper:
+    def test_ships_in_background(self):
+        hub = Hub()
+        shipper = AuditShipper(hub.send, flush_interval=0.01)
+
+        for i in range(3):
+            shipper.enqueue({"id": i})
+        shipper.enqueue({"invalid": True})
+
+        wait_for(lambda: shipper.stats()["rejected"] == 1)
+        shipper.close()
+
+        assert hub.events == [{"id": 0}, {"id": 1}, {"id": 2}]
+        assert shipper.stats() == {
+            "queue_depth": 0,
+            "sent": 3,
+            "dropped": 0,
+            "rejected": 1,
+            "spilled": 0,
+        }
+
+    def test_spills_to_journal_and_replays(self, tmp_path):
+        hub = Hub()
+        hub.down = True
+        journal = tmp_path / "audit.jsonl"
+        shipper = AuditShipper(
+            hub.send,
+            flush_interval=0.01,
+            max_retries=1,
+            backoff=0.01,
+            journal_path=str(journal),
+        )
+
+        shipper.enqueue({"id": 1})
+        shipper.enqueue({"id": 2})
+
+        wait_for(lambda: shipper.stats()["spilled"] == 2)
+        assert journal.read_text().count("\n") == 2
+
+        hub.down = False
+
+        wait_for(lambda: not journal.exists())
+        shipper.close()
+        assert sorted(event["id"] for event in hub.events) == [1, 2]
+
+    def test_full_queue_without_journal_drops(self):
+        hub = Hub()
+        release = threading.Event()
+        sending = threading.Event()
+
+        def send(event):
+            sending.set()
+            release.wait()
+            hub.send(event)
+
+        shipper = AuditShipper(send, max_queue=1, batch_size=1, flush_interval=0.01)
+
+        shipper.enqueue({"id": 1})
+        sending.wait(5)
+        shipper.enqueue({"id": 2})
+        shipper.enqueue({"id": 3})
+
+        assert shipper.stats()["queue_depth"] == 1
+        assert shipper.stats()["dropped"] == 1
+
+        release.set()
+        shipper.close()
+
+        assert hub.events == [{"id": 1}, {"id": 2}]
+
+    def test_close_spills_queued_events(self, tmp_path):
+        hub = Hub()
+        hub.down = True
+        journal = tmp_path / "audit.jsonl"
+        shipper = AuditShipper(
+            hub.send, flush_interval=0.01, backoff=10, journal_path=str(journal)
+        )
+
+        shipper.enqueue({"id": 1})
+        shipper.enqueue({"id": 2})
+        shipper.close()
+        shipper.enqueue({"id": 3})
+
+        assert journal.read_text().count("\n") == 3
+
+    def test_journal_shared_by_shippers(self, tmp_path):
+        hub = Hub()
+        hub.down = True
+        journal = tmp_path / "audit.jsonl"
+        shippers = [
+            AuditShipper(
+                hub.send,
+                flush_interval=0.01,
+                max_retries=0,
+                batch_size=2,
+                journal_path=str(journal),
+            )
+            for _ in range(2)
+        ]
+
+        for i in range(20):
+            shippers[i % 2].enqueue({"id": i})
+
+        wait_for(lambda: sum(s.stats()["spilled"] for s in shippers) == 20)
+        hub.down = False
+
+        wait_for(lambda: not journal.exists())
+        for shipper in shippers:
+            shipper.close()
+        # Each event is replayed by one of shippers only
+        assert sorted(event["id"] for event in hub.events) == list(range(20))
+
+    def test_counters_are_thread_safe(self):
+        shipper = AuditShipper(lambda event: None)
+        threads = [
+            threading.Thread(target=lambda: [shipper._spill([{}]) for _ in range(1000)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert shipper.stats()["dropped"] == 4000
+
+
+def test_adapter_log_is_queued(mocker):
+    adapter = RepoBAuditAdapter(
+        governance_url="https://hub",
+        kernel_id="leadscore-kernel",
+        kernel_api_key="kernel-key",
+        shipper_options={"flush_interval": 0.01},
+    )
+    post = mocker.patch.object(adapter._session, "post")
+    post.return_value.status_code = 200
+
+    adapter.log({"tenant_id": TENANT, "action": "meta.version", "result": "success"})
+    adapter.shipper.close()
+
+    post.assert_called_once()
+    assert post.call_args.kwargs["json"]["tenant_id"] == TENANT
+    assert adapter.stats()["sent"] == 1
+
+
+def test_adapter_reports_billable_events_sent(mocker):
+    sent = []
+    adapter = RepoBAuditAdapter(
+        governance_url="https://hub",
+        kernel_id="leadscore-kernel",
+        kernel_api_key="kernel-key",
+        shipper_options={"flush_interval": 0.01},
+        on_billable_sent=sent.append,
+    )
+    post = mocker.patch.object(adapter._session, "post")
+    post.return_value.status_code = 200
+
+    entry = {"tenant_id": TENANT, "action": "domain.leadscoring.leads.create"}
+    adapter.log({**entry, "result": "success", "billable": True})
+    adapter.log({**entry, "result": "success", "billable": True, "dry_run": True})
+    adapter.log({**entry, "result": "error", "billable": True})
+    adapter.log({**entry, "result": "success", "billable": False})
+    # Queued by another process sharing journal
+    adapter.shipper.enqueue({"tenant_id": TENANT, BILLABLE_KEY: "other"})
+    adapter.shipper.close()
+
+    assert sent == [TENANT]
+    assert post.call_count == 5
+    assert all(BILLABLE_KEY not in call.kwargs["json"] for call in post.call_args_list)
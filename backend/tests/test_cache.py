@@ -0,0 +1,202 @@
+import pytest
+from django.core.cache import cache
+from django.db import transaction
+
+from scoringengine.cache import (
+    COLD_MISS_WAIT,
+    analytics_cache_key,
+    bump_cache_generation,
+    get_cache_generation,
+    get_cache_stats,
+    get_cache_ttls,
+    get_or_refresh,
+    invalidate_owner_cache,
+    reset_cache_stats,
+    suppress_cache_invalidation,
+)
+from scoringengine.models import Answer, Lead
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    cache.clear()
+
+    yield
+
+    cache.clear()
+
+
+@pytest.fixture()
+def bumps(mocker):
+    return mocker.patch(
+        "scoringengine.cache.bump_cache_generation",
+        side_effect=bump_cache_generation,
+    )
+
+
+@pytest.fixture()
+def django_capture_on_commit():
+    """Collect on_commit callbacks registered within the block"""
+
+    class Capture:
+        def __init__(self):
+            self.callbacks = []
+
+        def __enter__(self):
+            connection = transaction.get_connection()
+            self.start = len(connection.run_on_commit)
+            return self.callbacks
+
+        def __exit__(self, *args):
+            connection = transaction.get_connection()
+            self.callbacks.extend(
+                entry[1] for entry in connection.run_on_commit[self.start :]
+            )
+
+    return Capture
+
+
+class TestCacheGeneration:
+    def test_generation_is_stable_until_bumped(self):
+        key = analytics_cache_key("lead_summary", 1)
+
+        assert analytics_cache_key("lead_summary", 1) == key
+
+        bump_cache_generation(1)
+
+        assert analytics_cache_key("lead_summary", 1) != key
+
+    def test_generations_are_per_owner(self):
+        generation = get_cache_generation(2)
+
+        bump_cache_generation(1)
+
+        assert get_cache_generation(2) == generation
+
+    def test_evicted_generation_does_not_reuse_old_keys(self):
+        key = analytics_cache_key("lead_summary", 1)
+
+        cache.delete("cache_generation_1")
+
+        assert analytics_cache_key("lead_summary", 1) != key
+
+
+class TestInvalidateOwnerCache:
+    def test_bump_deferred_until_commit(self, bumps, django_capture_on_commit):
+        with django_capture_on_commit() as callbacks:
+            invalidate_owner_cache(1)
+            invalidate_owner_cache(1)
+            invalidate_owner_cache(2)
+
+            bumps.assert_not_called()
+
+        assert len(callbacks) == 1
+
+        callbacks[0]()
+
+        assert sorted(c.args[0] for c in bumps.call_args_list) == [1, 2]
+
+    def test_lead_with_answers_bumps_once(self, bumps, user, django_capture_on_commit):
+        with django_capture_on_commit() as callbacks:
+            lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+            for n in range(5):
+                Answer.objects.create(lead=lead, field_name=f"q{n}", response="1")
+
+        for callback in callbacks:
+            callback()
+
+        assert bumps.call_count == 1
+
+    def test_suppressed_block_bumps_provided_owners_only(
+        self, bumps, user, django_capture_on_commit
+    ):
+        with django_capture_on_commit() as callbacks:
+            with suppress_cache_invalidation(user.id):
+                lead = Lead.objects.create(
+                    x_axis=1, y_axis=1, total_score=2, owner=user
+                )
+                Answer.objects.create(lead=lead, field_name="q1", response="1")
+
+        for callback in callbacks:
+            callback()
+
+        bumps.assert_called_once_with(user.id)
+
+
+class TestGetOrRefresh:
+    @pytest.fixture(autouse=True)
+    def stats(self):
+        reset_cache_stats()
+
+        yield
+
+        reset_cache_stats()
+
+    def test_miss_then_hit(self, mocker):
+        compute = mocker.Mock(return_value={"total": 1})
+
+        assert get_or_refresh("k", compute, 60, 600) == {"total": 1}
+        assert get_or_refresh("k", compute, 60, 600) == {"total": 1}
+
+        compute.assert_called_once()
+        assert get_cache_stats() == {"hit": 1, "stale": 0, "miss": 1, "refresh": 0}
+
+    def test_stale_entry_refreshed(self):
+        get_or_refresh("k", lambda: 1, 0, 600)
+
+        assert get_or_refresh("k", lambda: 2, 0, 600) == 2
+        assert get_cache_stats()["refresh"] == 1
+
+    def test_stale_entry_served_while_refresh_locked(self, mocker):
+        get_or_refresh("k", lambda: 1, 0, 600)
+        cache.add("k_lock", 1)
+        compute = mocker.Mock(return_value=2)
+
+        assert get_or_refresh("k", compute, 0, 600) == 1
+
+        compute.assert_not_called()
+        assert get_cache_stats()["stale"] == 1
+
+    def test_cold_miss_served_value_stored_while_waiting(self, mocker):
+        cache.add("k_lock", 1)
+        sleep = mocker.patch(
+            "scoringengine.cache.time.sleep",
+            side_effect=lambda _: cache.set("k", {"value": 1, "fresh_until": 0}),
+        )
+        compute = mocker.Mock(return_value=2)
+
+        assert get_or_refresh("k", compute, 60, 600) == 1
+
+        sleep.assert_called_once_with(COLD_MISS_WAIT)
+        compute.assert_not_called()
+
+    def test_cold_miss_computed_after_single_wait(self, mocker):
+        cache.add("k_lock", 1)
+        sleep = mocker.patch("scoringengine.cache.time.sleep")
+
+        assert get_or_refresh("k", lambda: 2, 60, 600) == 2
+
+        sleep.assert_called_once_with(COLD_MISS_WAIT)
+        assert get_cache_stats()["miss"] == 1
+        # Lock of the other request is kept
+        assert cache.get("k_lock") == 1
+
+    def test_lock_released_when_compute_fails(self):
+        def compute():
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            get_or_refresh("k", compute, 60, 600)
+
+        assert cache.get("k_lock") is None
+
+    def test_ttls_from_settings(self, settings):
+        settings.ANALYTICS_CACHE_TTLS = {"lead_summary": {"soft": 10, "hard": 20}}
+
+        assert get_cache_ttls("lead_summary") == (10, 20)
+        assert get_cache_ttls("unknown") == (300, 3600)
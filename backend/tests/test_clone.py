@@ -0,0 +1,221 @@
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from scoringengine.models import (
+    Answer,
+    AnswerFacet,
+    Choice,
+    DatesRange,
+    Lead,
+    LeadSearchDocument,
+    Question,
+    Recommendation,
+    RecommendationHit,
+    ScoringModel,
+)
+from users.clone_jobs import claim_clone_job, run_clone_job
+from users.forms import CloneUserForm
+from users.helpers import clone_account
+from users.models import CloneJob
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def source(user, lead):
+    question = Question.objects.create(
+        type=Question.DATE, number=10, text="Birthday?", field_name="bd", owner=user
+    )
+    scoring_model = ScoringModel.objects.create(
+        question=question, weight=1, x_axis=True, y_axis=False, owner=user
+    )
+    DatesRange.objects.create(
+        scoring_model=scoring_model, start=date(2000, 1, 1), points=5
+    )
+
+    # Lead fixture has hit of the first version, keep it behind the latest one
+    recommendation = lead.recommendation_hits.get().recommendation
+    recommendation.response_text = "Changed response"
+    recommendation.save()
+
+    Lead.objects.filter(pk=lead.pk).update(timestamp=now() - timedelta(days=10))
+
+    for n in range(4):
+        other = Lead.objects.create(x_axis=n, y_axis=1, total_score=n, owner=user)
+        Answer.objects.create(
+            lead=other,
+            field_name="bd",
+            response="2001-02-03",
+            date_value=date(2001, 2, 3),
+        )
+
+    return user
+
+
+@pytest.fixture()
+def target(django_user_model):
+    return django_user_model.objects.create(username="clone", is_staff=True)
+
+
+def create_job(source, target, **kwargs):
+    return CloneJob.objects.create(source=source, target=target, **kwargs)
+
+
+class TestCloneAccount:
+    def test_structure(self, source, target, lead):
+        clone_account(source, target, leads_and_answers=False)
+
+        assert set(
+            Question.objects.filter(owner=target).values_list("field_name", flat=True)
+        ) == set(
+            Question.objects.filter(owner=source).values_list("field_name", flat=True)
+        )
+        assert list(
+            Choice.objects.filter(question__owner=target)
+            .order_by("question__field_name", "bit")
+            .values_list("question__field_name", "text", "bit")
+        ) == list(
+            Choice.objects.filter(question__owner=source)
+            .order_by("question__field_name", "bit")
+            .values_list("question__field_name", "text", "bit")
+        )
+
+        dates_range = DatesRange.objects.get(scoring_model__owner=target)
+        assert dates_range.start == date(2000, 1, 1)
+        assert dates_range.points == 5
+
+        source_recommendation = lead.recommendation_hits.get().recommendation
+        recommendation = Recommendation.objects.get(
+            owner=target, question__field_name=source_recommendation.question.field_name
+        )
+        assert recommendation.response_text == "Changed response"
+        assert list(
+            recommendation.versions.order_by("version").values_list(
+                "version", "response_text"
+            )
+        ) == list(
+            source_recommendation.versions.order_by("version").values_list(
+                "version", "response_text"
+            )
+        )
+
+        assert not Lead.objects.filter(owner=target).exists()
+
+    def test_leads(self, source, target, lead):
+        clone_account(source, target, chunk_size=2)
+
+        leads = Lead.objects.filter(owner=target)
+        assert leads.count() == 5
+        assert not leads.filter(pk__in=Lead.objects.filter(owner=source)).exists()
+        assert sorted(leads.values_list("timestamp", flat=True)) == sorted(
+            Lead.objects.filter(owner=source).values_list("timestamp", flat=True)
+        )
+
+        assert (
+            Answer.objects.filter(
+                lead__owner=target, date_value=date(2001, 2, 3)
+            ).count()
+            == 4
+        )
+        assert AnswerFacet.objects.filter(owner=target).exists()
+        assert LeadSearchDocument.objects.filter(owner=target).count() == 5
+
+        hit = RecommendationHit.objects.get(lead__owner=target)
+        assert hit.recommendation.owner == target
+        assert hit.version == RecommendationHit.objects.get(lead=lead).version
+        assert (
+            hit.recommendation.versions.get(version=hit.version).response_text
+            == "Response"
+        )
+
+
+class TestCloneJob:
+    def test_claim(self, source, target):
+        job = create_job(source, target)
+        done = create_job(source, target, status=CloneJob.DONE)
+
+        assert claim_clone_job() == job
+        assert claim_clone_job() is None
+
+        job.refresh_from_db()
+        assert job.status == CloneJob.RUNNING
+
+        CloneJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=now() - timedelta(hours=1)
+        )
+        assert claim_clone_job() == job
+        assert done.status == CloneJob.DONE
+
+    def test_run(self, source, target):
+        job = create_job(source, target)
+
+        run_clone_job(claim_clone_job(), chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == CloneJob.DONE
+        assert job.structure_cloned
+        assert job.leads_cloned == job.leads_total == 5
+        assert Lead.objects.filter(owner=target).count() == 5
+
+    def test_resume_from_checkpoint(self, source, target, mocker):
+        job = create_job(source, target)
+        mocker.patch(
+            "users.helpers.RecommendationHit.objects.bulk_create",
+            side_effect=[[], RuntimeError("Database is gone")],
+        )
+
+        run_clone_job(claim_clone_job(), chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == CloneJob.FAILED
+        assert job.error == "Database is gone"
+        assert job.leads_cloned == 2
+        # Failed chunk is rolled back
+        assert Lead.objects.filter(owner=target).count() == 2
+
+        mocker.stopall()
+        CloneJob.objects.filter(pk=job.pk).update(status=CloneJob.PENDING)
+        run_clone_job(claim_clone_job(), chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == CloneJob.DONE
+        assert job.leads_cloned == 5
+        assert Lead.objects.filter(owner=target).count() == 5
+        assert (
+            Question.objects.filter(owner=target).count()
+            == Question.objects.filter(owner=source).count()
+        )
+
+    def test_command(self, source, target):
+        create_job(source, target, leads_and_answers=False)
+
+        call_command("run_clone_jobs", "--once")
+
+        assert CloneJob.objects.get().status == CloneJob.DONE
+        assert Question.objects.filter(owner=target).exists()
+        assert not Lead.objects.filter(owner=target).exists()
+
+
+class TestCloneUserForm:
+    def test_schedules_job(self, source):
+        form = CloneUserForm(
+            data={
+                "username": "cloned",
+                "password1": "secret",
+                "password2": "secret",
+                "copy_quiz_structure": True,
+                "copy_scoring_model": True,
+            }
+        )
+        assert form.is_valid()
+
+        user = form.clone_user(source)
+
+        job = CloneJob.objects.get(target=user)
+        assert job.source == source
+        assert job.scoring_model
+        assert not job.leads_and_answers
+        assert not Question.objects.filter(owner=user).exists()
@@ -114,3 +114,98 @@ class TestControlPlaneManage:
         lead_body = lead_preview.json()
         assert lead_body["ok"] is True
         assert lead_body["data"]["preview"] is True
+
+
+@pytest.mark.django_db
+class TestPrincipalCache:
+    @pytest.fixture(autouse=True)
+    def cache(self):
+        from control_plane.principal_cache import principal_cache
+
+        principal_cache.clear()
+        yield principal_cache
+        principal_cache.clear()
+
+    def test_repeat_caller_costs_no_queries(self, client, django_assert_num_queries):
+        user = get_user_model().objects.create_user(username="acp_cache", password="pw")
+        token = Token.objects.get(user=user)
+
+        def post():
+            return client.post(
+                "/api/manage",
+                data=json.dumps({"action": "meta.actions"}),
+                content_type="application/json",
+                **{"HTTP_X_API_KEY": token.key},
+            )
+
+        assert post().status_code == 200
+        with django_assert_num_queries(0):
+            assert post().status_code == 200
+
+    def test_invalidated_on_changes(self, cache):
+        from control_plane.models import UserTenantMapping
+
+        user = get_user_model().objects.create_user(
+            username="acp_cache2", password="pw"
+        )
+        token = Token.objects.get(user=user)
+
+        assert cache.get(token.key).tenant_uuid is None
+
+        tenant_uuid = "6f1b7c2e-0d3a-4e5f-9a8b-1c2d3e4f5a6b"
+        UserTenantMapping.objects.create(user=user, tenant_uuid=tenant_uuid)
+        assert len(cache) == 0
+        assert cache.get(token.key).tenant_uuid == tenant_uuid
+
+        token.delete()
+        assert cache.get(token.key) is None
+
+    def test_expired(self, cache, settings):
+        settings.ACP_PRINCIPAL_CACHE = {"TTL": 0, "MAX_SIZE": 1}
+        user = get_user_model().objects.create_user(
+            username="acp_cache3", password="pw"
+        )
+
+        assert cache.get(Token.objects.get(user=user).key).user == user
+        assert len(cache) == 0
+
+    def test_invalid_mapping_not_replaced_by_default_tenant(self, cache):
+        from django.test import RequestFactory
+
+        from control_plane.acp.router import create_manage_router
+        from control_plane.models import UserTenantMapping
+        from control_plane.usage_meter import UsageMeter
+        from tests.test_usage_meter import FakeControlPlane
+
+        user = get_user_model().objects.create_user(
+            username="acp_cache4", password="pw"
+        )
+        token = Token.objects.get(user=user)
+        UserTenantMapping.objects.create(user=user, tenant_uuid="not-a-uuid")
+
+        principal = cache.get(token.key)
+        assert principal.tenant_uuid is None
+        assert principal.tenant_mapping_invalid
+
+        control_plane = FakeControlPlane()
+        router = create_manage_router(
+            audit_adapter=None,
+            idempotency_adapter=None,
+            rate_limit_adapter=None,
+            ceilings_adapter=None,
+            bindings={"governanceTenantId": "6f1b7c2e-0d3a-4e5f-9a8b-1c2d3e4f5a6b"},
+            packs=[],
+            control_plane=control_plane,
+            usage_meter=UsageMeter(control_plane),
+        )
+        request = RequestFactory().post("/api/manage", HTTP_X_API_KEY=token.key)
+
+        assert router({"action": "meta.version"}, {"request": request})["ok"] is True
+        # Usage of default tenant isn't checked for user of invalid mapping
+        assert control_plane.requests == 0
+
+        UserTenantMapping.objects.filter(user=user).delete()
+
+        assert not cache.get(token.key).tenant_mapping_invalid
+        assert router({"action": "meta.version"}, {"request": request})["ok"] is True
+        assert control_plane.requests == 1
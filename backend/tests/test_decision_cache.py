@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+from control_plane.control_plane_adapter import (
+    AuthorizationRequest,
+    AuthorizationResponse,
+    DecisionCache,
+    HttpControlPlaneAdapter,
+    parse_expires_at,
+)
+
+
+def make_request(action="domain.leadscoring.leads.create", request_hash="h1"):
+    return AuthorizationRequest(
+        kernel_id="leadscore-kernel",
+        tenant_id="tenant",
+        actor={"type": "api_key", "id": "key", "api_key_id": "key"},
+        action=action,
+        request_hash=request_hash,
+    )
+
+
+def make_response(decision="allow", policy_version="1", **kwargs):
+    return AuthorizationResponse(
+        decision_id="d1", decision=decision, policy_version=policy_version, **kwargs
+    )
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2026-10-19T22:00:00Z", 1792447200.0),
+        ("2026-10-19T22:00:00+00:00", 1792447200.0),
+        ("2026-10-19T22:00:00", 1792447200.0),
+        (1792447200, 1792447200.0),
+        ("1792447200000", 1792447200.0),
+        ("tomorrow", None),
+        ("nan", None),
+        ({}, None),
+    ],
+)
+def test_parse_expires_at(value, expected):
+    assert parse_expires_at(value) == expected
+
+
+class TestDecisionCache:
+    def test_honors_ttls(self):
+        cache = DecisionCache()
+        request = make_request()
+
+        cache.store(request, make_response())
+        assert cache.get(request) is None
+
+        cache.store(request, make_response(decision_ttl_ms=60000))
+        assert cache.get(request).decision == "allow"
+        # Not keyed by request hash by default
+        assert cache.get(make_request(request_hash="h2")) is not None
+
+        cache.store(request, make_response(expires_at=int(time.time()) - 1))
+        assert cache.get(request) is None
+
+        cache.store(request, make_response(expires_at="2099-01-01T00:00:00Z"))
+        assert cache.get(request) is not None
+
+        # Unparsable expiry isn't cached
+        cache.store(request, make_response(expires_at="soon", decision_ttl_ms=60000))
+        assert cache.get(request) is None
+
+        assert cache.stats() == {
+            "size": 0,
+            "negative": 0,
+            "hits": 3,
+            "misses": 3,
+            "evictions": 0,
+            "hit_rate": 0.5,
+        }
+
+    def test_denies_capped(self):
+        cache = DecisionCache(deny_ttl_ms=0, max_negative=1)
+        request = make_request()
+
+        cache.store(request, make_response("deny", decision_ttl_ms=60000))
+        assert cache.get(request) is None
+
+        cache = DecisionCache(max_negative=1)
+        other = make_request(action="other")
+        cache.store(request, make_response("deny", decision_ttl_ms=60000))
+        cache.store(other, make_response("deny", decision_ttl_ms=60000))
+        cache.store(request, make_response("require_approval", decision_ttl_ms=60000))
+
+        assert cache.get(request) is None
+        assert cache.get(other).decision == "deny"
+        assert cache.stats()["negative"] == 1
+
+    def test_new_policy_version_drops_decisions(self):
+        cache = DecisionCache()
+        request, other = make_request(), make_request(action="other")
+
+        cache.store(request, make_response(decision_ttl_ms=60000))
+        cache.store(other, make_response(policy_version="2", decision_ttl_ms=60000))
+
+        assert cache.get(request) is None
+        assert cache.get(other) is not None
+
+    def test_bounded(self):
+        cache = DecisionCache(max_size=1, key_request_hash=True)
+
+        cache.store(make_request(), make_response(decision_ttl_ms=60000))
+        cache.store(
+            make_request(request_hash="h2"), make_response(decision_ttl_ms=60000)
+        )
+
+        assert cache.get(make_request()) is None
+        assert cache.stats()["evictions"] == 1
+
+
+def test_adapter_skips_remote_call(mocker):
+    post = mocker.patch("control_plane.control_plane_adapter.requests.post")
+    post.return_value.json.return_value = {
+        "data": {
+            "decision_id": "d1",
+            "decision": "allow",
+            "policy_version": "1",
+            "decision_ttl_ms": 60000,
+        }
+    }
+    adapter = HttpControlPlaneAdapter(
+        "https://hub", "kernel-key", decision_cache=DecisionCache()
+    )
+
+    assert adapter.authorize(make_request()).decision == "allow"
+    assert adapter.authorize(make_request(request_hash="h2")).decision_id == "d1"
+    assert post.call_count == 1
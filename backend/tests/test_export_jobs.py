@@ -0,0 +1,264 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import timedelta
+
+import pyarrow.parquet as pq
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils.timezone import now
+
+from scoringengine import export_jobs
+from scoringengine.export_jobs import (
+    claim_export_jobs,
+    get_job_queryset,
+    run_export_job,
+)
+from scoringengine.exports import get_answer_columns
+from scoringengine.models import Answer, ExportJob, Lead, Question
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def export_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.EXPORT_JOBS = {"WORK_DIR": str(tmp_path / "work"), "MAX_PER_OWNER": 1}
+
+
+@pytest.fixture()
+def job_leads(user, questions):
+    leads = []
+    for n in range(5):
+        lead = Lead.objects.create(x_axis=n, y_axis=1, total_score=n + 1, owner=user)
+        Answer.objects.create(lead=lead, field_name="zc", response=f"0000{n}")
+        leads.append(lead)
+
+    return leads
+
+
+def create_job(owner, export_format="csv", **kwargs):
+    job = ExportJob(
+        owner=owner, model_name="lead", export_format=export_format, **kwargs
+    )
+    job.answer_columns = json.dumps(
+        get_answer_columns(
+            Question.objects.filter(owner=owner)
+            .order_by("number")
+            .values_list("field_name", "type", "multiple_values")
+        )
+    )
+    job.save()
+
+    return job
+
+
+def read_rows(job):
+    content = job.file.read()
+    if job.export_format == "csv.gz":
+        content = gzip.decompress(content)
+
+    return list(csv.reader(io.StringIO(content.decode())))
+
+
+class TestClaimExportJobs:
+    def test_bounded_per_owner(self, user, user1):
+        jobs = [create_job(user), create_job(user), create_job(user1)]
+
+        claimed = claim_export_jobs(10)
+
+        assert claimed == [jobs[0], jobs[2]]
+        assert claim_export_jobs(10) == []
+
+        jobs[0].refresh_from_db()
+        assert jobs[0].status == ExportJob.RUNNING
+
+    def test_stale_running_job_reclaimed(self, user):
+        job = create_job(
+            user,
+            status=ExportJob.RUNNING,
+            heartbeat_at=now() - timedelta(hours=1),
+        )
+        pending = create_job(user)
+
+        assert claim_export_jobs(10) == [job]
+        assert claim_export_jobs(10) == []
+
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.DONE)
+
+        assert claim_export_jobs(10) == [pending]
+
+    def test_limit(self, user, user1):
+        create_job(user)
+        create_job(user1)
+
+        assert len(claim_export_jobs(1)) == 1
+        assert claim_export_jobs(0) == []
+
+
+class TestRunExportJob:
+    @pytest.mark.parametrize("export_format", ["csv", "csv.gz"])
+    def test_csv(self, job_leads, user, tmp_path, export_format):
+        job = create_job(user, export_format, query_string="total_score__gte=2")
+        (job,) = claim_export_jobs(1)
+
+        run_export_job(job, chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == ExportJob.DONE
+        assert job.rows_exported == 4
+        assert job.finished_at is not None
+
+        header, *rows = read_rows(job)
+        assert rows[0][0] == str(job_leads[1].lead_id)
+        assert rows[0][header.index("zc")] == "00001"
+        assert len(rows) == 4
+
+        assert not os.listdir(tmp_path / "work")
+
+    def test_parquet(self, job_leads, user):
+        job = create_job(user, "parquet")
+
+        run_export_job(job, chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == ExportJob.DONE
+        assert job.rows_exported == 5
+        assert pq.read_table(job.file.path).num_rows == 5
+
+    @pytest.mark.parametrize("export_format", ["csv", "csv.gz"])
+    def test_resumed_after_failure(self, job_leads, user, mocker, export_format):
+        job = create_job(user, export_format)
+
+        calls = []
+        original_save_checkpoint = export_jobs.save_checkpoint
+
+        def save_checkpoint(*args):
+            # Header and first chunk are saved, worker stops on the second one
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError("Worker stopped")
+
+            original_save_checkpoint(*args)
+
+        mocker.patch(
+            "scoringengine.export_jobs.save_checkpoint", side_effect=save_checkpoint
+        )
+
+        run_export_job(job, chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == ExportJob.FAILED
+        assert job.error == "Worker stopped"
+        assert job.rows_exported == 2
+
+        mocker.stopall()
+        run_export_job(job, chunk_size=2)
+
+        job.refresh_from_db()
+        assert job.status == ExportJob.DONE
+        assert job.rows_exported == 5
+
+        header, *rows = read_rows(job)
+        assert [row[0] for row in rows] == [str(lead.lead_id) for lead in job_leads]
+
+    def test_owner_leads_only(self, job_leads, user1):
+        Lead.objects.create(x_axis=1, y_axis=1, total_score=1, owner=user1)
+        job = create_job(user1)
+
+        run_export_job(job)
+
+        job.refresh_from_db()
+        assert job.rows_exported == 1
+
+    def test_failure_recorded(self, user):
+        job = create_job(user, query_string="unknown__gte=1")
+
+        run_export_job(job)
+
+        job.refresh_from_db()
+        assert job.status == ExportJob.FAILED
+        assert job.error
+
+
+class TestRunExportJobsCommand:
+    def test_once(self, job_leads, user, user1):
+        jobs = [create_job(user), create_job(user1, "parquet")]
+
+        call_command("run_export_jobs", workers=1, once=True, stdout=io.StringIO())
+
+        for job in jobs:
+            job.refresh_from_db()
+            assert job.status == ExportJob.DONE
+
+
+class TestExportJobAdmin:
+    def test_schedule_from_changelist(self, django_client, job_leads, user):
+        url = reverse("admin:scoringengine_lead_export_job", args=["csv.gz"])
+
+        assert django_client.get(url).status_code == 405
+
+        response = django_client.post(f"{url}?total_score__gte=4")
+
+        assert response.status_code == 302
+        assert response.url == reverse("admin:scoringengine_exportjob_changelist")
+
+        job = ExportJob.objects.get()
+        assert job.owner == user
+        assert job.model_name == "lead"
+        assert job.export_format == "csv.gz"
+        assert job.query_string == "total_score__gte=4"
+        assert "zc" in json.loads(job.answer_columns)
+        assert set(get_job_queryset(job)) == set(job_leads[3:])
+
+    def test_download(self, django_client, job_leads, user, user1):
+        job = create_job(user)
+        run_export_job(job)
+
+        response = django_client.get(
+            reverse("admin:scoringengine_exportjob_download", args=[job.pk])
+        )
+
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content).startswith(b"lead_id,")
+
+        other = create_job(user1)
+        run_export_job(other)
+
+        response = django_client.get(
+            reverse("admin:scoringengine_exportjob_download", args=[other.pk])
+        )
+
+        assert response.status_code == 404
+
+    def test_changelist_shows_download_link(self, django_client, job_leads, user):
+        job = create_job(user)
+        run_export_job(job)
+
+        response = django_client.get(
+            reverse("admin:scoringengine_exportjob_changelist")
+        )
+
+        assert response.status_code == 200
+        assert (
+            reverse("admin:scoringengine_exportjob_download", args=[job.pk])
+            in response.content.decode()
+        )
+
+    def test_retry(self, django_client, user):
+        failed = create_job(user, status=ExportJob.FAILED, finished_at=now())
+        done = create_job(user, status=ExportJob.DONE)
+
+        django_client.post(
+            reverse("admin:scoringengine_exportjob_changelist"),
+            {"action": "retry", "_selected_action": [failed.pk, done.pk]},
+        )
+
+        failed.refresh_from_db()
+        done.refresh_from_db()
+        assert failed.status == ExportJob.PENDING
+        assert failed.finished_at is None
+        assert done.status == ExportJob.DONE
@@ -0,0 +1,234 @@
+import csv
+import gzip
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+import pytest
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from scoringengine.exports import (
+    get_answer_columns,
+    iter_gzip,
+    iter_keyset_chunks,
+    iter_leads_csv,
+    iter_leads_parquet,
+)
+from scoringengine.models import Answer, AnswerLog, Lead, LeadLog, Question
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def export_leads(user):
+    timestamp = now()
+    leads = []
+
+    # Two leads share timestamp to check keyset tie-break on pk
+    for n, delta in enumerate([0, 1, 1, 2, 3]):
+        lead = Lead.objects.create(
+            x_axis=n,
+            y_axis=1,
+            total_score=n + 1,
+            customer_email=f"{n}@x.com",
+            owner=user,
+        )
+        Lead.objects.filter(pk=lead.pk).update(
+            timestamp=timestamp + timedelta(seconds=delta)
+        )
+        lead.refresh_from_db()
+
+        Answer.objects.create(lead=lead, field_name="city", response=f"City {n}")
+        Answer.objects.create(
+            lead=lead, field_name="customer_email", response=f"{n}@x.com"
+        )
+        leads.append(lead)
+
+    Answer.objects.create(lead=leads[0], field_name="city", response="Other")
+
+    return sorted(leads, key=lambda lead: (lead.timestamp, lead.pk))
+
+
+def read_csv(content):
+    return list(csv.reader(io.StringIO(content)))
+
+
+class TestIterKeysetChunks:
+    @pytest.mark.parametrize("chunk_size", [1, 2, 10])
+    def test_chunks_cover_all_rows_in_order(self, export_leads, chunk_size):
+        chunks = list(iter_keyset_chunks(Lead.objects.all(), ["timestamp"], chunk_size))
+
+        assert [row[0] for chunk in chunks for row in chunk] == [
+            lead.pk for lead in export_leads
+        ]
+        assert all(len(chunk) <= chunk_size for chunk in chunks)
+
+    def test_each_chunk_is_one_query(self, export_leads, django_assert_num_queries):
+        chunks = iter_keyset_chunks(Lead.objects.all(), ["timestamp"], 2)
+
+        # Three chunks and the empty one ending iteration
+        with django_assert_num_queries(4):
+            list(chunks)
+
+
+class TestIterLeadsCsv:
+    def test_answers_pivoted_to_columns(self, export_leads):
+        content = "".join(
+            iter_leads_csv(Lead.objects.all(), ["city", "missing"], chunk_size=2)
+        )
+        rows = read_csv(content)
+
+        assert rows[0] == [
+            "lead_id",
+            "timestamp",
+            "x_axis",
+            "y_axis",
+            "total_score",
+            "customer_email",
+            "customer_id",
+            "city",
+            "missing",
+        ]
+        assert len(rows) == 6
+        assert [row[0] for row in rows[1:]] == [
+            str(lead.lead_id) for lead in export_leads
+        ]
+
+        first = next(row for row in rows if row[0] == str(export_leads[0].lead_id))
+        assert first[5:] == ["0@x.com", "", "City 0, Other", ""]
+
+    def test_queries_per_chunk(self, export_leads, django_assert_num_queries):
+        chunks = iter_leads_csv(Lead.objects.all(), ["city"], chunk_size=2)
+
+        # Leads and answers of each of three chunks and the empty chunk
+        with django_assert_num_queries(7):
+            list(chunks)
+
+    def test_lead_log_answers(self, user):
+        lead_log = LeadLog.objects.create(
+            x_axis=1, y_axis=1, total_score=2, owner=user, timestamp=now()
+        )
+        AnswerLog.objects.create(lead=lead_log, field_name="city", response="Boston")
+
+        rows = read_csv("".join(iter_leads_csv(LeadLog.objects.all(), ["city"])))
+
+        assert rows[1][0] == str(lead_log.lead_id)
+        assert rows[1][-1] == "Boston"
+
+    def test_packed_lead_log_answers(self, user, django_assert_num_queries):
+        lead_log = LeadLog.objects.create(
+            x_axis=1,
+            y_axis=1,
+            total_score=2,
+            owner=user,
+            timestamp=now(),
+            answers_data=LeadLog.pack_answers(
+                [Answer(field_name="city", response="Boston")]
+            ),
+        )
+
+        # Entries of the only chunk and the empty chunk, answers are packed
+        with django_assert_num_queries(2):
+            rows = read_csv("".join(iter_leads_csv(LeadLog.objects.all(), ["city"])))
+
+        assert rows[1][0] == str(lead_log.lead_id)
+        assert rows[1][-1] == "Boston"
+
+
+@pytest.mark.parametrize(
+    "questions,expected_columns",
+    [
+        (
+            [
+                ("age", Question.INTEGER, False),
+                ("born", Question.DATE, False),
+                ("city", Question.OPEN, False),
+                ("customer_id", Question.OPEN, False),
+            ],
+            {"age": "value", "born": "date_value", "city": "response"},
+        ),
+        ([("ages", Question.SLIDER, True)], {"ages": "response"}),
+        (
+            [("age", Question.INTEGER, False), ("age", Question.DATE, False)],
+            {"age": "response"},
+        ),
+    ],
+)
+def test_get_answer_columns(questions, expected_columns):
+    assert get_answer_columns(questions) == expected_columns
+
+
+def test_iter_gzip():
+    content = b"".join(iter_gzip(["a,b\r\n", "1,2\r\n"]))
+
+    assert gzip.decompress(content) == b"a,b\r\n1,2\r\n"
+
+
+class TestIterLeadsParquet:
+    def test_typed_columns_in_row_groups(self, export_leads):
+        Answer.objects.create(
+            lead=export_leads[0], field_name="age", response="42", value=42
+        )
+        Answer.objects.create(
+            lead=export_leads[0],
+            field_name="born",
+            response="1990-01-02",
+            date_value=date(1990, 1, 2),
+        )
+
+        content = b"".join(
+            iter_leads_parquet(
+                Lead.objects.all(),
+                {"age": "value", "born": "date_value", "city": "response"},
+                chunk_size=2,
+            )
+        )
+        parquet_file = pq.ParquetFile(io.BytesIO(content))
+        table = parquet_file.read()
+
+        assert parquet_file.num_row_groups == 3
+        assert table.num_rows == 5
+        assert table.column_names[-3:] == ["age", "born", "city"]
+
+        first = table.slice(0, 1).to_pylist()[0]
+        assert first["lead_id"] == str(export_leads[0].lead_id)
+        assert first["total_score"] == export_leads[0].total_score
+        assert first["age"] == Decimal("42.00")
+        assert first["born"] == date(1990, 1, 2)
+        assert first["city"] == "City 0, Other"
+        assert first["customer_id"] is None
+
+        assert table.column("age").null_count == 4
+
+    def test_no_leads(self):
+        content = b"".join(iter_leads_parquet(Lead.objects.all(), {}))
+
+        assert pq.read_table(io.BytesIO(content)).num_rows == 0
+
+
+class TestExportLeadsCommand:
+    @pytest.mark.parametrize("export_format", ["csv", "csv.gz", "parquet"])
+    def test_export(self, export_leads, user, user1, tmp_path, export_format):
+        Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user1)
+        output = tmp_path / f"leads.{export_format}"
+
+        call_command(
+            "export_leads",
+            str(output),
+            format=export_format,
+            owner=user.id,
+            chunk_size=2,
+            stdout=io.StringIO(),
+        )
+
+        content = output.read_bytes()
+        if export_format == "parquet":
+            rows = pq.read_table(io.BytesIO(content)).num_rows
+        else:
+            if export_format == "csv.gz":
+                content = gzip.decompress(content)
+            rows = len(read_csv(content.decode())) - 1
+
+        assert rows == len(export_leads)
@@ -1,16 +1,32 @@
+import io
 import re
+from datetime import date
+from decimal import Decimal
 
 import pytest
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.utils.timezone import now
 
+from scoringengine.helpers import add_lead_log
 from scoringengine.models import (
+    CHOICES_MASK_SIZE,
     Answer,
+    AnswerFacet,
+    AnswerLog,
     Choice,
     Lead,
+    LeadLog,
+    LeadLogFacet,
+    LeadLogSearchDocument,
+    LeadSearchDocument,
     Question,
     Recommendation,
+    RecommendationHit,
     ScoringModel,
     ValueRange,
+    get_recommendation_catalog,
 )
 
 pytestmark = pytest.mark.django_db
@@ -101,6 +117,58 @@ class TestRecommendation:
 
         assert str(recommendation) == f"Q{question.number}: {rule}"
 
+    def test_save_versions_changed_fields(self, question):
+        recommendation = question.recommendation
+
+        assert recommendation.version == 1
+        assert recommendation.versions.get().response_text == (
+            recommendation.response_text
+        )
+
+        recommendation.rule = "If {Income} > 0"
+        recommendation.save()
+
+        assert recommendation.version == 1
+        assert recommendation.versions.count() == 1
+
+        recommendation.response_text = "Changed"
+        recommendation.save(update_fields=["response_text"])
+        recommendation.refresh_from_db()
+
+        assert recommendation.version == 2
+        assert list(
+            recommendation.versions.values_list("version", "response_text")
+        ) == [(1, "Rule is True"), (2, "Changed")]
+
+    def test_save_locks_recommendation(self, question, mocker):
+        select_for_update = mocker.spy(QuerySet, "select_for_update")
+        recommendation = question.recommendation
+
+        recommendation.response_text = "Changed"
+        recommendation.save()
+
+        select_for_update.assert_called_once()
+        assert select_for_update.spy_return.model is Recommendation
+
+    def test_recommendation_catalog(self, question):
+        recommendation = question.recommendation
+        owner_id = recommendation.owner_id
+
+        assert get_recommendation_catalog(owner_id) == {
+            (recommendation.pk, 1): {
+                "field_name": question.field_name,
+                **recommendation.get_fields_dict(),
+            }
+        }
+
+        recommendation.response_text = "Changed"
+        recommendation.save()
+
+        catalog = get_recommendation_catalog(owner_id, refresh=True)
+
+        assert catalog[(recommendation.pk, 1)]["response_text"] == "Rule is True"
+        assert catalog[(recommendation.pk, 2)]["response_text"] == "Changed"
+
 
 class TestQuestion:
     @pytest.mark.parametrize(
@@ -199,6 +267,22 @@ class TestQuestion:
 
         assert question.get_recommendation_dict() == expected_result
 
+    def test_count_choice_selections(self, user, questions_for_user):
+        question = questions_for_user[4]
+        choices = list(question.choices.order_by("bit"))
+
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        for selected in [choices[:1], choices[::2], choices[2:]]:
+            Answer.objects.create(
+                lead=lead,
+                field_name=question.field_name,
+                choices_mask=Choice.get_mask(selected),
+            )
+
+        answers = Answer.objects.filter(field_name=question.field_name)
+
+        assert question.count_choice_selections(answers) == {"1": 2, "-10": 0, "3": 2}
+
     def test_str(self, question_data):
         question = Question(**question_data)
 
@@ -230,6 +314,50 @@ class TestChoice:
         choice = Choice(question=question, text=text)
         assert str(choice) == text
 
+    def test_delete_clears_bit_from_answers(self, user, questions_for_user):
+        question = questions_for_user[4]
+        choices = list(question.choices.order_by("bit"))
+
+        assert [choice.bit for choice in choices] == [0, 1, 2]
+
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        answer = Answer.objects.create(
+            lead=lead, field_name=question.field_name, choices_mask=0b111
+        )
+
+        choices[2].delete()
+        answer.refresh_from_db()
+
+        assert answer.choices_mask == 0b011
+
+        # Cleared bit is free for the next choice
+        choice = Choice.objects.create(question=question, text="4", slug="4", value=4)
+
+        assert choice.bit == 2
+
+    def test_bit_of_deleted_choice_reused(self, questions_for_user):
+        question = questions_for_user[4]
+        choices = list(question.choices.order_by("bit"))
+
+        choices[0].delete()
+        choice = Choice.objects.create(question=question, text="4", slug="4", value=4)
+
+        assert choice.bit == 0
+
+        # Bits are never exhausted by adding and deleting choices
+        for i in range(CHOICES_MASK_SIZE):
+            choice.delete()
+            choice = Choice.objects.create(
+                question=question, text=f"t{i}", slug=f"s{i}", value=i
+            )
+
+        assert choice.bit == 0
+
+    def test_get_mask(self):
+        assert Choice.get_mask([Choice(bit=0), Choice(bit=2)]) == 0b101
+        assert Choice.get_mask([]) == 0
+        assert Choice.get_mask([Choice(bit=0), Choice(bit=None)]) is None
+
 
 class TestLead:
     def test_str(self):
@@ -239,6 +367,175 @@ class TestLead:
 
         assert str(lead) == str(lead_id)
 
+    def test_get_customer_fields(self):
+        customer_fields = Lead.get_customer_fields(
+            [
+                ("customer_email", "john@example.com"),
+                ("customer_id", "C1"),
+                ("customer_id", "C2"),
+                ("city", "Boston"),
+            ]
+        )
+
+        assert customer_fields == {
+            "customer_email": "john@example.com",
+            "customer_id": "C1, C2",
+        }
+
+    def test_get_customer_fields_missing_answers(self):
+        assert Lead.get_customer_fields([("city", "Boston")]) == {
+            "customer_email": "",
+            "customer_id": "",
+        }
+
+    def test_backfill_customer_fields(self, user, user1):
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        Answer.objects.create(
+            lead=lead, field_name="customer_email", response="john@example.com"
+        )
+        other_lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user1)
+        Answer.objects.create(lead=other_lead, field_name="customer_id", response="C1")
+        lead_log = LeadLog.objects.create(
+            x_axis=1, y_axis=1, total_score=2, owner=user, timestamp=lead.timestamp
+        )
+        AnswerLog.objects.create(lead=lead_log, field_name="customer_id", response="C2")
+
+        call_command("backfill_customer_fields", owner=user.id, stdout=io.StringIO())
+
+        assert Lead.objects.get(customer_email="john@example.com") == lead
+        assert LeadLog.objects.get(owner=user, customer_id="C2") == lead_log
+        other_lead.refresh_from_db()
+        assert other_lead.customer_id == ""
+
+
+class TestLeadLog:
+    @pytest.fixture()
+    def packed_answers(self):
+        answer = Answer(
+            field_name="born",
+            response="1990-01-02",
+            date_value=date(1990, 1, 2),
+            points=Decimal("1.50"),
+        )
+        multiple = Answer(field_name="ages", response="1, 2", value_number=1)
+        multiple.set_values([1, 2])
+
+        return [answer, multiple]
+
+    def test_pack_answers(self, packed_answers):
+        unpacked = LeadLog.unpack_answers(LeadLog.pack_answers(packed_answers))
+
+        assert unpacked == [
+            {
+                "field_name": "born",
+                "response": "1990-01-02",
+                "date_value": date(1990, 1, 2),
+                "points": Decimal("1.50"),
+            },
+            {
+                "field_name": "ages",
+                "response": "1, 2",
+                "value_number": 1,
+                "values": [1, 2],
+            },
+        ]
+
+    def test_add_lead_log_packs_answers(
+        self, user, packed_answers, django_assert_num_queries
+    ):
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        for answer in packed_answers:
+            answer.lead = lead
+            answer.save()
+
+        # Answers and recommendation hits of lead, single insert and inserts of
+        # facets and search document
+        with django_assert_num_queries(5):
+            add_lead_log(lead)
+
+        lead_log = LeadLog.objects.get(lead_id=lead.lead_id)
+        answers = lead_log.get_answers()
+
+        assert [str(facet) for facet in lead_log.facets.all()] == ["born: 1990-01-02"]
+        assert lead_log.search_document.document == "\n".join(
+            [str(lead.lead_id), "1990-01-02", "1, 2"]
+        )
+
+        assert not AnswerLog.objects.exists()
+        assert [str(answer) for answer in answers] == [
+            "born: 1990-01-02",
+            "ages: 1, 2",
+        ]
+        assert answers[1].get_values() == [1, 2]
+        assert lead_log.get_answers() is answers
+
+    def test_add_lead_log_keeps_recommendations(self, question):
+        recommendation = question.recommendation
+        lead = Lead.objects.create(
+            x_axis=1, y_axis=1, total_score=2, owner=question.owner
+        )
+        RecommendationHit.objects.create(
+            lead=lead, recommendation=recommendation, version=1
+        )
+
+        add_lead_log(lead)
+
+        recommendation.response_text = "Changed"
+        recommendation.save()
+
+        lead_log = LeadLog.objects.get(lead_id=lead.lead_id)
+        assert lead_log.recommendations == [[recommendation.pk, 1]]
+        assert [
+            version.response_text for version in lead_log.get_recommendation_versions()
+        ] == ["Rule is True"]
+
+    def test_get_answers_of_answer_log_rows(self, user):
+        lead_log = LeadLog.objects.create(
+            x_axis=1, y_axis=1, total_score=2, owner=user, timestamp=now()
+        )
+        answer = AnswerLog.objects.create(lead=lead_log, field_name="city")
+
+        assert lead_log.get_answers() == [answer]
+
+    def test_compact_lead_log(self, user, packed_answers):
+        lead_log = LeadLog.objects.create(
+            x_axis=1, y_axis=1, total_score=2, owner=user, timestamp=now()
+        )
+        for answer in packed_answers:
+            AnswerLog.objects.create(
+                lead=lead_log,
+                **{
+                    field_name: getattr(answer, field_name)
+                    for field_name in LeadLog.PACKED_ANSWER_FIELDS
+                },
+            )
+
+        call_command("compact_lead_log", stdout=io.StringIO())
+
+        lead_log = LeadLog.objects.get()
+        assert not AnswerLog.objects.exists()
+        assert [answer.field_name for answer in lead_log.get_answers()] == [
+            "born",
+            "ages",
+        ]
+        assert lead_log.facets.count() == 1
+        assert "1990-01-02" in lead_log.search_document.document
+
+    def test_backfill_lead_log_index(self, user, packed_answers):
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        for answer in packed_answers:
+            answer.lead = lead
+            answer.save()
+        add_lead_log(lead)
+        LeadLogFacet.objects.all().delete()
+        LeadLogSearchDocument.objects.all().delete()
+
+        call_command("backfill_lead_log_index", stdout=io.StringIO())
+
+        lead_log = LeadLog.objects.get()
+        assert lead_log.facets.get().date_ordinal == date(1990, 1, 2).toordinal()
+        assert "1990-01-02" in lead_log.search_document.document
+
 
 class TestAnswer:
     def test_str(self):
@@ -249,6 +546,141 @@ class TestAnswer:
 
         assert str(answer) == f"{field_name}: {response}"
 
+    def test_values_keep_decimals(self, lead):
+        answer = Answer.objects.create(
+            lead=lead, field_name="q5u", values=[Decimal("1.10"), 3, Decimal("-10")]
+        )
+        answer.refresh_from_db()
+
+        assert answer.get_values() == [Decimal("1.1"), 3, Decimal("-10")]
+        assert isinstance(answer.values[0], Decimal)
+
+    def test_backfill_choices_mask(self, user, questions_for_user):
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        answer = Answer.objects.create(lead=lead, field_name="q5u", response="1, 3")
+        unknown = Answer.objects.create(lead=lead, field_name="q5u", response="2")
+
+        call_command("backfill_choices_mask", stdout=io.StringIO())
+
+        answer.refresh_from_db()
+        unknown.refresh_from_db()
+
+        assert answer.choices_mask == 0b101
+        assert unknown.choices_mask is None
+
+
+class TestAnswerFacet:
+    @pytest.fixture()
+    def faceted_leads(self, user, user1):
+        leads = []
+        for owner, age, start_date in [
+            (user, 20, date(2024, 1, 1)),
+            (user, 40, date(2024, 6, 1)),
+            (user1, 40, date(2024, 6, 1)),
+        ]:
+            lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=owner)
+            answers = [
+                Answer.objects.create(lead=lead, field_name="age", value=age),
+                Answer.objects.create(
+                    lead=lead, field_name="start_date", date_value=start_date
+                ),
+                Answer.objects.create(lead=lead, field_name="zc", response="ZC"),
+            ]
+            AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(owner.id, answers))
+            leads.append(lead)
+
+        return leads
+
+    def test_from_answers_skips_answers_without_value(self, faceted_leads):
+        assert AnswerFacet.objects.filter(lead=faceted_leads[0]).count() == 2
+
+    def test_from_answers_stores_date_ordinal(self, faceted_leads):
+        facet = AnswerFacet.objects.get(lead=faceted_leads[0], field_name="start_date")
+
+        assert facet.date_ordinal == date(2024, 1, 1).toordinal()
+        assert str(facet) == "start_date: 2024-01-01"
+
+    @pytest.mark.parametrize(
+        "field_name,gte,lte,expected_indexes",
+        [
+            ("age", Decimal(30), None, [1, 2]),
+            ("age", None, Decimal(20), [0]),
+            ("age", Decimal(20), Decimal(40), [0, 1, 2]),
+            ("start_date", date(2024, 2, 1), None, [1, 2]),
+            ("start_date", None, date(2024, 1, 1), [0]),
+        ],
+    )
+    def test_filter_leads(self, faceted_leads, field_name, gte, lte, expected_indexes):
+        leads = AnswerFacet.filter_leads(
+            Lead.objects.all(), field_name, gte=gte, lte=lte
+        )
+
+        assert set(leads) == {faceted_leads[i] for i in expected_indexes}
+
+    def test_filter_leads_restricted_by_owners(self, faceted_leads, user):
+        leads = AnswerFacet.filter_leads(
+            Lead.objects.all(), "age", gte=Decimal(30), owners=[user]
+        )
+
+        assert list(leads) == [faceted_leads[1]]
+
+
+class TestLeadSearchDocument:
+    @pytest.fixture()
+    def searchable_leads(self, user, user1):
+        leads = []
+        for owner, email, city in [
+            (user, "John.Doe@example.com", "Boston"),
+            (user, "jane@example.org", "Austin"),
+            (user1, "john@example.net", "Boston"),
+        ]:
+            lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=owner)
+            answers = [
+                Answer.objects.create(lead=lead, field_name="email", response=email),
+                Answer.objects.create(lead=lead, field_name="city", response=city),
+            ]
+            LeadSearchDocument.from_answers(lead, answers).save()
+            leads.append(lead)
+
+        return leads
+
+    def test_from_answers_lowercases_responses(self, searchable_leads):
+        document = searchable_leads[0].search_document
+
+        assert document.document == (
+            f"{searchable_leads[0].lead_id}\njohn.doe@example.com\nboston"
+        )
+
+    @pytest.mark.parametrize(
+        "search_terms,expected_indexes",
+        [
+            (["john"], [0, 2]),
+            (["DOE@EX"], [0]),
+            (["john", "boston"], [0, 2]),
+            (["jane", "boston"], []),
+            (["o"], [0, 1, 2]),
+            (['"quoted'], []),
+        ],
+    )
+    def test_filter_leads(self, searchable_leads, search_terms, expected_indexes):
+        leads = LeadSearchDocument.filter_leads(Lead.objects.all(), search_terms)
+
+        assert set(leads) == {searchable_leads[i] for i in expected_indexes}
+
+    def test_filter_leads_by_lead_id(self, searchable_leads):
+        lead_id = str(searchable_leads[1].lead_id)
+
+        leads = LeadSearchDocument.filter_leads(Lead.objects.all(), [lead_id[:8]])
+
+        assert list(leads) == [searchable_leads[1]]
+
+    def test_filter_leads_restricted_by_owners(self, searchable_leads, user):
+        leads = LeadSearchDocument.filter_leads(
+            Lead.objects.all(), ["boston"], owners=[user]
+        )
+
+        assert list(leads) == [searchable_leads[0]]
+
 
 class TestScoringModel:
     @pytest.mark.parametrize(
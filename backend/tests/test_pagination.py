@@ -0,0 +1,98 @@
+import base64
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from django.utils.timezone import now
+
+from scoringengine.models import Lead
+from scoringengine.pagination import (
+    EstimatedCountPaginator,
+    InvalidCursor,
+    clean_keyset_values,
+    decode_cursor,
+    encode_cursor,
+    estimate_count,
+    keyset_filter,
+    reverse_ordering,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_cursor_round_trip():
+    values = ["next", 1, now(), Decimal("12.50"), uuid4()]
+
+    cursor = encode_cursor(*values)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 5) == [*values[:4], str(values[4])]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "invalid",
+        encode_cursor(1, 2),
+        encode_cursor(1, None, 3),
+        base64.urlsafe_b64encode(b'[1, 2, {"d": "x"}]').decode(),
+    ],
+)
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 3)
+
+
+def test_clean_keyset_values():
+    timestamp, lead_id = now(), uuid4()
+    ordering = ["-timestamp", "owner_id", "pk"]
+
+    values = clean_keyset_values(Lead, ordering, [timestamp, "1", str(lead_id)])
+
+    assert values == [timestamp, 1, lead_id]
+
+    with pytest.raises(InvalidCursor):
+        clean_keyset_values(Lead, ordering, [timestamp, "x", str(lead_id)])
+
+    with pytest.raises(InvalidCursor):
+        clean_keyset_values(Lead, ordering, [timestamp, 1, 2.5])
+
+
+def test_reverse_ordering():
+    assert reverse_ordering(["owner_id", "-timestamp"]) == ["-owner_id", "timestamp"]
+
+
+def test_keyset_filter(user):
+    base = now()
+    leads = []
+    for minutes in [3, 2, 2, 1]:
+        lead = Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+        Lead.objects.filter(pk=lead.pk).update(
+            timestamp=base - timedelta(minutes=minutes)
+        )
+        leads.append(lead)
+
+    ordering = ["-timestamp", "-pk"]
+    ordered = list(Lead.objects.order_by(*ordering))
+    key = ordered[1]
+    values = [key.timestamp, key.pk]
+
+    following = Lead.objects.filter(keyset_filter(ordering, values)).order_by(*ordering)
+    preceding = Lead.objects.filter(keyset_filter(ordering, values, reverse=True))
+
+    assert list(following) == ordered[2:]
+    assert list(preceding) == ordered[:1]
+
+
+def test_estimate_count_not_supported_on_sqlite():
+    assert estimate_count(Lead.objects.all()) is None
+
+
+def test_estimated_count_paginator_falls_back_to_exact_count(user):
+    Lead.objects.create(x_axis=1, y_axis=1, total_score=2, owner=user)
+
+    paginator = EstimatedCountPaginator(Lead.objects.order_by("pk"), 10)
+
+    assert paginator.count == 1
+    assert not paginator.estimated
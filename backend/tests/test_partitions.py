@@ -0,0 +1,148 @@
+"""Partitioning of lead log.
+
+Conversion of populated table runs on PostgreSQL only, set TEST_DATABASE_URL
+to run it.
+"""
+import io
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+
+from scoringengine.models import AnswerLog, LeadLog
+from scoringengine.partitions import (
+    DEFAULT_PARTITION_SUFFIX,
+    add_months,
+    create_month_partition,
+    get_lead_log_table,
+    get_partitions,
+    is_partitioned,
+    iter_months,
+    month_start,
+    partition_name,
+    partition_table,
+    partitioning_enabled,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def postgresql():
+    if connection.vendor != "postgresql":
+        pytest.skip("Partitioning is only supported on PostgreSQL")
+
+
+@pytest.mark.parametrize(
+    "month,months,expected",
+    [
+        (date(2024, 1, 1), 1, date(2024, 2, 1)),
+        (date(2024, 11, 1), 3, date(2025, 2, 1)),
+        (date(2024, 1, 1), -1, date(2023, 12, 1)),
+        (date(2024, 12, 1), 0, date(2024, 12, 1)),
+    ],
+)
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+
+def test_iter_months():
+    assert list(iter_months(date(2024, 11, 15), date(2025, 1, 1))) == [
+        date(2024, 11, 1),
+        date(2024, 12, 1),
+        date(2025, 1, 1),
+    ]
+
+
+def test_partition_name():
+    assert (
+        partition_name("scoringengine_leadlog", date(2024, 3, 1))
+        == "scoringengine_leadlog_p2024_03"
+    )
+
+
+def test_partitioning_disabled_on_sqlite(settings):
+    settings.LEAD_LOG_PARTITIONING = {"ENABLED": True}
+
+    assert not partitioning_enabled(connection)
+    assert not is_partitioned(connection, get_lead_log_table())
+
+
+def test_create_partitions_command_skips_sqlite():
+    stdout = io.StringIO()
+
+    call_command("create_lead_log_partitions", stdout=stdout)
+
+    assert "only supported on PostgreSQL" in stdout.getvalue()
+
+
+def get_table_rows(table: str) -> list:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT id FROM {connection.ops.quote_name(table)} ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_index_names(table: str) -> set:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE tablename = %s AND schemaname = current_schema()",
+            [table],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+@pytest.mark.usefixtures("postgresql")
+def test_partition_populated_table(user):
+    table = get_lead_log_table()
+    default = f"{table}_{DEFAULT_PARTITION_SUFFIX}"
+    today = datetime.now(timezone.utc)
+    # Last one is beyond created partitions, it is kept in default partition
+    timestamps = [today - timedelta(days=62), today, today + timedelta(days=400)]
+    entries = [
+        LeadLog.objects.create(
+            x_axis=1, y_axis=1, total_score=2, owner=user, timestamp=timestamp
+        )
+        for timestamp in timestamps
+    ]
+    AnswerLog.objects.create(lead=entries[0], field_name="city", response="Boston")
+    indexes = get_index_names(table)
+
+    with connection.cursor() as cursor:
+        # Pending checks of deferred constraints would block altering the table
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    created = partition_table(connection, table, months_ahead=1)
+
+    assert is_partitioned(connection, table)
+    partitions = get_partitions(connection, table)
+    assert default in partitions
+    assert partition_name(table, month_start(timestamps[0])) in partitions
+    assert created == len(partitions) - 1
+
+    assert list(LeadLog.objects.order_by("pk")) == entries
+    assert get_table_rows(default) == [entries[2].pk]
+    assert AnswerLog.objects.get().lead == entries[0]
+    assert get_index_names(table) == indexes
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT confrelid::regclass::text FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        assert cursor.fetchall() == [(get_user_model()._meta.db_table,)]
+
+    # Sequence is kept, ids go on after the copied rows
+    entry = LeadLog.objects.create(
+        x_axis=1, y_axis=1, total_score=2, owner=user, timestamp=today
+    )
+    assert entry.pk > entries[-1].pk
+
+    # Rows of new month are moved out of default partition
+    month = month_start(timestamps[2])
+    assert create_month_partition(connection, table, month)
+    assert get_table_rows(default) == []
+    assert get_table_rows(partition_name(table, month)) == [entries[2].pk]
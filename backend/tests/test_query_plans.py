@@ -0,0 +1,191 @@
+"""Plans of hot queries on seeded dataset.
+
+Runs on SQLite by default, set TEST_DATABASE_URL to run on PostgreSQL.
+"""
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from scoringengine.models import (
+    Answer,
+    AnswerFacet,
+    ExportJob,
+    Lead,
+    LeadLog,
+    Question,
+    Recommendation,
+    RecommendationHit,
+)
+from scoringengine.query_plans import (
+    _iter_postgresql_scans,
+    capture_hot_queries,
+    check_hot_queries,
+    explain,
+    suggest_index,
+)
+
+pytestmark = pytest.mark.django_db
+
+LEADS_PER_OWNER = 600
+ROWS_THRESHOLD = 500
+
+
+@pytest.fixture()
+def dataset(user, user1):
+    """Leads of two owners spread over 90 days with answers, facets and history"""
+    rng = random.Random(0)
+    timestamp = now()
+
+    for owner in (user, user1):
+        questions = [
+            Question.objects.create(
+                owner=owner,
+                number=n,
+                text=f"Question {n}",
+                field_name=f"q{n}",
+                type=Question.INTEGER,
+            )
+            for n in range(1, 5)
+        ]
+        recommendation = Recommendation.objects.create(
+            owner=owner, question=questions[0], rule="If {q1} > 5", response_text="R"
+        )
+
+        leads = Lead.objects.bulk_create(
+            Lead(
+                owner=owner,
+                x_axis=n % 50,
+                y_axis=n % 7,
+                total_score=n % 57,
+                customer_email=f"{n}@example.com",
+                timestamp=timestamp - timedelta(minutes=rng.randrange(90 * 24 * 60)),
+            )
+            for n in range(LEADS_PER_OWNER)
+        )
+        answers = Answer.objects.bulk_create(
+            Answer(
+                lead=lead,
+                field_name=question.field_name,
+                response=str(n % 10),
+                value=Decimal(n % 10),
+                points=n % 3,
+            )
+            for n, lead in enumerate(leads)
+            for question in questions
+        )
+        AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(owner.id, answers))
+        RecommendationHit.objects.bulk_create(
+            RecommendationHit(lead=lead, recommendation=recommendation, version=1)
+            for lead in leads[::3]
+        )
+        LeadLog.objects.bulk_create(
+            LeadLog(
+                owner=owner,
+                lead_id=lead.lead_id,
+                timestamp=lead.timestamp,
+                x_axis=lead.x_axis,
+                y_axis=lead.y_axis,
+                total_score=lead.total_score,
+                answers_data=LeadLog.pack_answers([]),
+            )
+            for lead in leads
+        )
+
+    ExportJob.objects.create(owner=user, model_name="lead", export_format="csv")
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+def test_hot_queries_have_no_full_scans(dataset, user):
+    regressions = check_hot_queries(user, ROWS_THRESHOLD)
+
+    assert not regressions, "\n".join(
+        f"{name}: full scan of {table} ({rows} rows), suggested index ({', '.join(columns)})"
+        for name, table, rows, columns in regressions
+    )
+
+
+def test_full_scan_is_found_and_index_suggested(dataset, user):
+    # Neither owner nor customer_id lead the indexes
+    queryset = Lead.objects.filter(customer_id="x", total_score__gte=1).order_by(
+        "timestamp"
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        list(queryset)
+    sql = queries[0]["sql"]
+
+    assert (Lead._meta.db_table, True) in explain(sql)
+    assert suggest_index(sql, Lead._meta.db_table) == [
+        "customer_id",
+        "total_score",
+        "timestamp",
+    ]
+
+
+def test_index_suggested_for_subquery_alias():
+    sql = (
+        'SELECT "lead"."id" FROM "lead" WHERE "lead"."id" IN (SELECT U0."lead_id" '
+        'FROM "facet" U0 WHERE (U0."field_name" = \'q1\' AND U0."value" >= 0)) '
+        'ORDER BY "lead"."timestamp" ASC LIMIT 100'
+    )
+
+    assert suggest_index(sql, "facet") == ["field_name", "value"]
+    assert suggest_index(sql, "lead") == ["id", "timestamp"]
+
+
+def test_postgresql_plan_scans():
+    plan = {
+        "Node Type": "Limit",
+        "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "a"},
+            {"Node Type": "Index Scan", "Relation Name": "b", "Index Cond": "(x = 1)"},
+            {"Node Type": "Index Only Scan", "Relation Name": "c"},
+        ],
+    }
+
+    assert list(_iter_postgresql_scans(plan)) == [
+        ("a", True),
+        ("b", False),
+        ("c", True),
+    ]
+
+
+def test_hot_queries_captured_from_views(dataset, user):
+    leads = Lead.objects.count()
+
+    captured = capture_hot_queries(user)
+
+    for name, queries in captured.items():
+        assert queries, name
+        for sql in queries:
+            assert explain(sql), name
+
+    # API orders top scored leads like its pagination does
+    assert any(
+        'ORDER BY "scoringengine_lead"."total_score" DESC, '
+        '"scoringengine_lead"."lead_id" DESC' in sql
+        for sql in captured["lead_list_by_score"]
+    )
+    assert Lead.objects.count() == leads
+    assert ExportJob.objects.get().status == ExportJob.PENDING
+
+
+def test_command(dataset, user):
+    stdout = io.StringIO()
+
+    call_command(
+        "explain_hot_queries", owner=user.id, threshold=ROWS_THRESHOLD, stdout=stdout
+    )
+
+    assert "lead_retrieve" in stdout.getvalue()
+    assert "No full scans" in stdout.getvalue()
@@ -0,0 +1,108 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from scoringengine.models import Lead, LeadRollup
+from scoringengine.rollups import rebuild_lead_rollups, summarize_rollups
+
+pytestmark = pytest.mark.django_db
+
+
+def get_rollups(owner):
+    return list(
+        LeadRollup.objects.filter(owner=owner)
+        .order_by("day")
+        .values(
+            "day",
+            "leads",
+            "x_axis",
+            "y_axis",
+            "total_score",
+            "low_score_leads",
+            "medium_score_leads",
+            "high_score_leads",
+        )
+    )
+
+
+@pytest.fixture()
+def scored_leads(user):
+    return [
+        Lead.objects.create(x_axis=x, y_axis=1, total_score=x + 1, owner=user)
+        for x in (5, 25, 45)
+    ]
+
+
+class TestLeadRollups:
+    def test_create_and_delete(self, user, scored_leads):
+        rollup = LeadRollup.objects.get(owner=user)
+
+        assert rollup.day == now().date()
+        assert rollup.leads == 3
+        assert rollup.x_axis == Decimal("75")
+        assert rollup.total_score == Decimal("78")
+        assert (
+            rollup.low_score_leads,
+            rollup.medium_score_leads,
+            rollup.high_score_leads,
+        ) == (1, 1, 1)
+
+        scored_leads[2].delete()
+
+        rollup.refresh_from_db()
+        assert rollup.leads == 2
+        assert rollup.high_score_leads == 0
+        assert rollup.total_score == Decimal("32")
+
+    def test_rebuild_matches_updates(self, user, scored_leads):
+        rollups = get_rollups(user)
+        LeadRollup.objects.all().delete()
+
+        assert rebuild_lead_rollups(user.id) == 1
+        assert get_rollups(user) == rollups
+
+    def test_rebuild_days(self, user, scored_leads):
+        Lead.objects.filter(pk=scored_leads[0].pk).update(
+            timestamp=datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc)
+        )
+
+        rebuild_lead_rollups(user.id, date(2024, 1, 1), date(2024, 1, 2))
+
+        assert [(r["day"], r["leads"]) for r in get_rollups(user)] == [
+            (date(2024, 1, 1), 1),
+            (now().date(), 3),
+        ]
+
+        # Rebuilding all days drops lead from its old day
+        rebuild_lead_rollups(user.id)
+
+        assert [(r["day"], r["leads"]) for r in get_rollups(user)] == [
+            (date(2024, 1, 1), 1),
+            (now().date(), 2),
+        ]
+
+    def test_summarize(self, user, user1, scored_leads):
+        Lead.objects.create(x_axis=1, y_axis=3, total_score=4, owner=user1)
+
+        total, by_owner = summarize_rollups([user.id, user1.id, 999])
+
+        assert total["total_leads"] == 4
+        assert total["average_scores"]["y_axis"] == Decimal("1.5")
+        assert total["score_distribution"] == {"low": 2, "medium": 1, "high": 1}
+        assert by_owner[user1.id]["average_scores"]["total"] == Decimal("4")
+        assert by_owner[999]["total_leads"] == 0
+
+        total, _ = summarize_rollups(
+            [user.id], start=date(2024, 1, 1), end=date(2024, 1, 2)
+        )
+        assert total["total_leads"] == 0
+
+    def test_command(self, user, scored_leads):
+        LeadRollup.objects.all().delete()
+
+        call_command("backfill_lead_rollups")
+
+        assert LeadRollup.objects.get(owner=user).leads == 3
@@ -0,0 +1,139 @@
+import pytest
+import requests
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from control_plane.acp.router import create_manage_router
+from control_plane.control_plane_adapter import HttpControlPlaneAdapter, UsageResponse
+from control_plane.usage_meter import UsageMeter
+
+TENANT = "6f1b7c2e-0d3a-4e5f-9a8b-1c2d3e4f5a6b"
+
+
+class FakeControlPlane:
+    def __init__(self, calls_used=0, tier="free"):
+        self.calls_used = calls_used
+        self.tier = tier
+        self.requests = 0
+        self.down = False
+
+    def get_usage(
+        self, tenant_id, period_start=None, period_end=None, raise_errors=False
+    ):
+        self.requests += 1
+        if self.down and raise_errors:
+            raise ConnectionError("Repo B is down")
+        return UsageResponse(
+            tenant_id=tenant_id,
+            tier=self.tier,
+            calls_used=self.calls_used,
+            calls_limit=100,
+            period_start=period_start,
+            period_end=period_end,
+        )
+
+
+class TestUsageMeter:
+    def test_counts_calls_locally(self):
+        control_plane = FakeControlPlane(calls_used=10)
+        meter = UsageMeter(control_plane, reconcile_interval=60)
+
+        assert meter.get_usage(TENANT).calls_used == 10
+
+        meter.record(TENANT)
+        meter.record(TENANT)
+
+        assert meter.get_usage(TENANT).calls_used == 12
+        assert control_plane.requests == 1
+
+    def test_reconcile(self):
+        control_plane = FakeControlPlane(calls_used=10)
+        meter = UsageMeter(control_plane)
+        meter.get_usage(TENANT)
+        meter.record(TENANT, calls=5)
+        meter.record_shipped(TENANT, calls=3)
+
+        # Repo B counted 3 shipped calls and 4 of other workers
+        control_plane.calls_used = 17
+        meter.reconcile(TENANT)
+
+        # Events of 2 calls are still queued
+        assert meter.get_usage(TENANT).calls_used == 19
+
+        meter.record_shipped(TENANT, calls=2)
+        control_plane.calls_used = 19
+        meter.reconcile(TENANT)
+
+        assert meter.get_usage(TENANT).calls_used == 19
+
+    def test_failed_reconcile_keeps_usage(self):
+        control_plane = FakeControlPlane(calls_used=10)
+        meter = UsageMeter(control_plane)
+        meter.get_usage(TENANT)
+        meter.record(TENANT, calls=5)
+
+        control_plane.down = True
+        meter.reconcile(TENANT)
+
+        assert meter.get_usage(TENANT).calls_used == 15
+
+    def test_http_usage_raises_when_unreachable(self, mocker):
+        mocker.patch(
+            "control_plane.control_plane_adapter.requests.post",
+            side_effect=requests.ConnectionError("Repo B is down"),
+        )
+        adapter = HttpControlPlaneAdapter(
+            platform_url="https://hub", kernel_api_key="k"
+        )
+
+        assert adapter.get_usage(TENANT).calls_used == 0
+        with pytest.raises(requests.ConnectionError):
+            adapter.get_usage(TENANT, raise_errors=True)
+
+    def test_stale_usage_reconciled_in_background(self, mocker):
+        meter = UsageMeter(FakeControlPlane(), reconcile_interval=0)
+        reconcile = mocker.patch.object(meter, "_reconcile_in_background")
+
+        meter.get_usage(TENANT)
+        meter.get_usage(TENANT)
+
+        reconcile.assert_called_once()
+
+    def test_limit_with_slack(self):
+        meter = UsageMeter(FakeControlPlane(calls_used=100), slack=2)
+
+        assert not meter.is_limit_reached(meter.get_usage(TENANT))
+
+        meter.record(TENANT, calls=2)
+
+        assert meter.is_limit_reached(meter.get_usage(TENANT))
+
+
+@pytest.mark.django_db
+def test_router_enforces_limit_locally():
+    user = get_user_model().objects.create_user(username="acp_meter", password="pw")
+    control_plane = FakeControlPlane(calls_used=99)
+    router = create_manage_router(
+        audit_adapter=None,
+        idempotency_adapter=None,
+        rate_limit_adapter=None,
+        ceilings_adapter=None,
+        bindings={"governanceTenantId": TENANT},
+        packs=[],
+        control_plane=control_plane,
+        usage_meter=UsageMeter(control_plane),
+    )
+    request = RequestFactory().post(
+        "/api/manage", HTTP_X_API_KEY=Token.objects.get(user=user).key
+    )
+
+    response = router({"action": "meta.version"}, {"request": request})
+
+    assert response["ok"] is True
+    assert response["warning"]["usage"]["calls_remaining"] == 1
+
+    response = router({"action": "meta.version"}, {"request": request})
+
+    assert response["code"] == "UPGRADE_REQUIRED"
+    assert control_plane.requests == 1
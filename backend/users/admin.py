@@ -13,15 +13,17 @@ from scoringengine.admin import admin_site
 
 from control_plane.models import UserTenantMapping
 from users.forms import CloneUserForm, CatalogueForm
-from users.models import Catalogue
+from users.models import Catalogue, CloneJob
+from users.scoring_config import share_scoring_config
 
 User = get_user_model()
 
 
 class CatalogueAdmin(admin.ModelAdmin):
     form = CatalogueForm
-    list_display = ("master", "slaves_usernames")
+    list_display = ("master", "slaves_usernames", "shared_config_usernames")
     list_display_links = list_display
+    actions = ["share_scoring_config"]
 
     def slaves_usernames(self, obj: Catalogue):
         slaves = obj.slaves.all()
@@ -29,6 +31,61 @@ class CatalogueAdmin(admin.ModelAdmin):
 
     slaves_usernames.short_description = "Slaves"
 
+    def shared_config_usernames(self, obj: Catalogue):
+        shared = obj.shared_configs.select_related("slave")
+        return ", ".join([s.slave.username for s in shared]) if shared else "--"
+
+    shared_config_usernames.short_description = "Slaves sharing scoring configuration"
+
+    @admin.action(description="Share scoring configuration with slaves")
+    def share_scoring_config(self, request, queryset):
+        # Slaves with questions of their own keep them
+        shared = sum(
+            len(share_scoring_config(catalogue, catalogue.slaves.all()))
+            for catalogue in queryset
+        )
+
+        self.message_user(
+            request, f"Scoring configuration shared with {shared} slaves."
+        )
+
+
+class CloneJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "source",
+        "target",
+        "status",
+        "progress",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    actions = ["retry"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress(self, obj: CloneJob):
+        if not obj.structure_cloned:
+            return "--"
+
+        return f"{obj.leads_cloned} / {obj.leads_total}"
+
+    progress.short_description = "Leads cloned"
+
+    @admin.action(description="Retry selected failed clones")
+    def retry(self, request, queryset):
+        # Failed jobs keep checkpoint, so retried clone continues from it
+        updated = queryset.filter(status=CloneJob.FAILED).update(
+            status=CloneJob.PENDING, finished_at=None
+        )
+
+        self.message_user(request, f"{updated} clones scheduled again.")
+
 
 class UserOwnAdmin(UserAdmin):
     list_display = UserAdmin.list_display + ("actions_column",)
@@ -38,7 +95,9 @@ class UserOwnAdmin(UserAdmin):
         return mark_safe(
             '<a href="{}">Clone</a> | <a href="{}">Provision Tenant</a>'.format(
                 reverse("admin:auth_user_clone", kwargs={"object_id": obj.pk}),
-                reverse("admin:auth_user_provision_tenant", kwargs={"object_id": obj.pk}),
+                reverse(
+                    "admin:auth_user_provision_tenant", kwargs={"object_id": obj.pk}
+                ),
             )
         )
 
@@ -51,7 +110,12 @@ class UserOwnAdmin(UserAdmin):
 
                 if form.is_valid():
                     form.clone_user(obj)
-                    messages.add_message(request, messages.SUCCESS, "User cloned.")
+                    message = (
+                        "User created, clone scheduled."
+                        if form.cleaned_data.get("copy_quiz_structure")
+                        else "User cloned."
+                    )
+                    messages.add_message(request, messages.SUCCESS, message)
                     return redirect(reverse("admin:auth_user_changelist"))
 
             else:
@@ -90,9 +154,13 @@ class UserOwnAdmin(UserAdmin):
                 request,
                 f"Tenant already provisioned for {user.username}: {existing.tenant_uuid}",
             )
-            return redirect(reverse("admin:auth_user_change", kwargs={"object_id": user.pk}))
+            return redirect(
+                reverse("admin:auth_user_change", kwargs={"object_id": user.pk})
+            )
 
-        governance_url = os.environ.get("ACP_BASE_URL") or os.environ.get("GOVERNANCE_HUB_URL")
+        governance_url = os.environ.get("ACP_BASE_URL") or os.environ.get(
+            "GOVERNANCE_HUB_URL"
+        )
         kernel_api_key = os.environ.get("ACP_KERNEL_KEY")
 
         if not governance_url or not kernel_api_key:
@@ -100,7 +168,9 @@ class UserOwnAdmin(UserAdmin):
                 request,
                 "ACP_BASE_URL and ACP_KERNEL_KEY must be set to provision a tenant.",
             )
-            return redirect(reverse("admin:auth_user_change", kwargs={"object_id": user.pk}))
+            return redirect(
+                reverse("admin:auth_user_change", kwargs={"object_id": user.pk})
+            )
 
         tenant_create_url = f"{governance_url}/functions/v1/tenants-create"
         idempotency_key = f"admin-user-{user.id}"
@@ -115,18 +185,26 @@ class UserOwnAdmin(UserAdmin):
         }
 
         try:
-            response = requests.post(tenant_create_url, headers=headers, json=payload, timeout=10)
+            response = requests.post(
+                tenant_create_url, headers=headers, json=payload, timeout=10
+            )
             response.raise_for_status()
             tenant_result = response.json()
             tenant_data = tenant_result.get("data", tenant_result)
             tenant_uuid = tenant_data.get("tenant_uuid") or tenant_data.get("tenant_id")
         except Exception as e:
             messages.error(request, f"Tenant provisioning failed: {e}")
-            return redirect(reverse("admin:auth_user_change", kwargs={"object_id": user.pk}))
+            return redirect(
+                reverse("admin:auth_user_change", kwargs={"object_id": user.pk})
+            )
 
         if not tenant_uuid:
-            messages.error(request, "Tenant provisioning failed: no tenant_uuid returned.")
-            return redirect(reverse("admin:auth_user_change", kwargs={"object_id": user.pk}))
+            messages.error(
+                request, "Tenant provisioning failed: no tenant_uuid returned."
+            )
+            return redirect(
+                reverse("admin:auth_user_change", kwargs={"object_id": user.pk})
+            )
 
         UserTenantMapping.objects.update_or_create(
             user=user,
@@ -136,7 +214,9 @@ class UserOwnAdmin(UserAdmin):
             request,
             f"Tenant provisioned for {user.username}: {tenant_uuid}",
         )
-        return redirect(reverse("admin:auth_user_change", kwargs={"object_id": user.pk}))
+        return redirect(
+            reverse("admin:auth_user_change", kwargs={"object_id": user.pk})
+        )
 
     def get_urls(self):
         return [
@@ -156,5 +236,6 @@ class UserOwnAdmin(UserAdmin):
 
 
 admin_site.register(Catalogue, CatalogueAdmin)
+admin_site.register(CloneJob, CloneJobAdmin)
 admin_site.register(Group, GroupAdmin)
 admin_site.register(User, UserOwnAdmin)
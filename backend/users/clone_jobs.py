@@ -0,0 +1,115 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from scoringengine.cache import suppress_cache_invalidation
+from scoringengine.models import Lead
+from users.helpers import (
+    CLONE_CHUNK_SIZE,
+    clone_leads_and_answers,
+    clone_structure,
+    get_recommendation_map,
+)
+from users.models import CloneJob
+
+logger = logging.getLogger(__name__)
+
+STALE_TIMEOUT = 300
+
+
+def claim_clone_job():
+    """Mark the oldest runnable job as running and return it, None if there is none.
+
+    Pending jobs and running jobs without heartbeat for STALE_TIMEOUT seconds,
+    left by a stopped worker, are runnable.
+    """
+    stale_before = now() - timedelta(seconds=STALE_TIMEOUT)
+
+    with transaction.atomic():
+        job = (
+            CloneJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=CloneJob.PENDING)
+                | Q(status=CloneJob.RUNNING, heartbeat_at__lt=stale_before)
+            )
+            .order_by("created_at")
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = CloneJob.RUNNING
+        job.started_at = job.started_at or now()
+        job.heartbeat_at = now()
+        job.error = ""
+        job.save(update_fields=["status", "started_at", "heartbeat_at", "error"])
+
+    return job
+
+
+def save_checkpoint(job, last_lead_pk, leads: int):
+    job.last_lead_pk = str(last_lead_pk)
+    job.leads_cloned += leads
+    job.heartbeat_at = now()
+    job.save(update_fields=["last_lead_pk", "leads_cloned", "heartbeat_at"])
+
+
+def run_clone_job(job, chunk_size=CLONE_CHUNK_SIZE):
+    """Clone account of claimed job, marking job done or failed.
+
+    Structure is cloned in one transaction, leads chunk by chunk, each chunk
+    together with checkpoint of job, so interrupted or failed job resumes
+    after the last cloned chunk.
+    """
+    clone_leads = job.quiz_structure and job.scoring_model and job.leads_and_answers
+
+    try:
+        with suppress_cache_invalidation(job.target_id):
+            if job.structure_cloned:
+                recommendation_map = get_recommendation_map(job.source, job.target)
+            else:
+                with transaction.atomic():
+                    recommendation_map = clone_structure(
+                        job.source, job.target, job.quiz_structure, job.scoring_model
+                    )
+
+                    job.structure_cloned = True
+                    if clone_leads:
+                        job.leads_total = Lead.objects.filter(
+                            owner_id=job.source_id
+                        ).count()
+                    job.heartbeat_at = now()
+                    job.save(
+                        update_fields=[
+                            "structure_cloned",
+                            "leads_total",
+                            "heartbeat_at",
+                        ]
+                    )
+
+            if clone_leads:
+                for last_lead_pk, leads in clone_leads_and_answers(
+                    job.source,
+                    job.target,
+                    recommendation_map,
+                    chunk_size,
+                    after=job.last_lead_pk or None,
+                ):
+                    save_checkpoint(job, last_lead_pk, leads)
+
+        job.status = CloneJob.DONE
+        job.finished_at = now()
+        job.save(update_fields=["status", "finished_at"])
+
+    except Exception as e:
+        logger.exception("Clone job %s failed", job.pk)
+
+        # Checkpoint is kept, retried job continues from it
+        job.status = CloneJob.FAILED
+        job.error = str(e) or e.__class__.__name__
+        job.finished_at = now()
+        job.save(update_fields=["status", "error", "finished_at"])
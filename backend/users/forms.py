@@ -1,10 +1,9 @@
 from django import forms
 
-from users.helpers import clone_account
 from django.contrib.auth import get_user_model
 from django.contrib.admin.widgets import FilteredSelectMultiple
 
-from users.models import Catalogue
+from users.models import Catalogue, CloneJob
 
 User = get_user_model()
 
@@ -66,13 +65,15 @@ class CloneUserForm(forms.Form):
         user.user_permissions.set(source_user.user_permissions.all())
         user.groups.set(source_user.groups.all())
 
-        clone_account(
-            source_user,
-            user,
-            self.cleaned_data.get("copy_quiz_structure", False),
-            self.cleaned_data.get("copy_scoring_model", False),
-            self.cleaned_data.get("copy_leads", False),
-        )
+        # Account is cloned in background by `run_clone_jobs` command
+        if self.cleaned_data.get("copy_quiz_structure", False):
+            CloneJob.objects.create(
+                source=source_user,
+                target=user,
+                quiz_structure=True,
+                scoring_model=self.cleaned_data.get("copy_scoring_model", False),
+                leads_and_answers=self.cleaned_data.get("copy_leads", False),
+            )
 
         return user
 
@@ -1,99 +1,292 @@
+import uuid
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
+from scoringengine.cache import suppress_cache_invalidation
 from scoringengine.models import (
     Answer,
+    AnswerFacet,
     Choice,
+    DatesRange,
     Lead,
+    LeadSearchDocument,
     Question,
     Recommendation,
+    RecommendationHit,
+    RecommendationVersion,
     ScoringModel,
     ValueRange,
 )
+from scoringengine.rollups import rebuild_lead_rollups
 
 User = get_user_model()
 
+CLONE_CHUNK_SIZE = 1000
+
+
+def copy_instance(instance, **overrides):
+    """Return unsaved copy of instance without primary key, with overridden fields"""
+    data = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+    }
+    data.update(overrides)
+
+    return instance.__class__(**data)
 
-def clone_quiz_structure(source_user: User, target_user: User):
-    for question_old in Question.objects.filter(owner=source_user).all():
-        question_new = Question.objects.create(
-            owner=target_user,
-            number=question_old.number,
-            text=question_old.text,
-            field_name=question_old.field_name,
-            type=question_old.type,
-            min_value=question_old.min_value,
-            max_value=question_old.max_value,
+
+def get_question_map(source_user: User, target_user: User) -> dict:
+    """Return map of source question pks to pks of target questions of same field names"""
+    target_questions = dict(
+        Question.objects.filter(owner=target_user).values_list("field_name", "pk")
+    )
+
+    return {
+        pk: target_questions[field_name]
+        for pk, field_name in Question.objects.filter(owner=source_user).values_list(
+            "pk", "field_name"
         )
+        if field_name in target_questions
+    }
 
-        for choice in question_old.choices.all():
-            Choice.objects.create(
-                question=question_new,
-                text=choice.text,
-                slug=choice.slug,
-                value=choice.value,
-            )
 
+def get_one_to_one_map(model, question_map: dict) -> dict:
+    """Return map of source pks of model to target pks, matched by question.
 
-def clone_scoring_model(source_user: User, target_user: User):
-    for sm_old in ScoringModel.objects.filter(owner=source_user).all():
-        sm_new = ScoringModel.objects.create(
-            owner=target_user,
-            question=Question.objects.get(
-                field_name=sm_old.question.field_name, owner=target_user
-            ),
-            weight=sm_old.weight,
-            x_axis=sm_old.x_axis,
-            y_axis=sm_old.y_axis,
-            formula=sm_old.formula,
+    Scoring models and recommendations are one per question.
+    """
+    target = dict(
+        model.objects.filter(question_id__in=question_map.values()).values_list(
+            "question_id", "pk"
         )
+    )
+
+    return {
+        pk: target[question_map[question_id]]
+        for pk, question_id in model.objects.filter(
+            question_id__in=question_map
+        ).values_list("pk", "question_id")
+        if question_map[question_id] in target
+    }
+
+
+def get_child_map(model, parent_field: str, parent_map: dict, fields) -> dict:
+    """Return map of source pks of model to target pks, matched by parent and fields"""
+    parent_column = f"{parent_field}_id"
+    target = {
+        row[:-1]: row[-1]
+        for row in model.objects.filter(
+            **{f"{parent_column}__in": parent_map.values()}
+        ).values_list(parent_column, *fields, "pk")
+    }
+
+    source_rows = model.objects.filter(
+        **{f"{parent_column}__in": parent_map}
+    ).values_list(parent_column, *fields, "pk")
+
+    return {
+        row[-1]: target[key]
+        for row in source_rows
+        if (key := (parent_map[row[0]], *row[1:-1])) in target
+    }
+
+
+def get_config_maps(source_user: User, target_user: User) -> dict:
+    """Return maps of source to target pks of cloned scoring configuration by model"""
+    question_map = get_question_map(source_user, target_user)
+    scoring_model_map = get_one_to_one_map(ScoringModel, question_map)
+
+    return {
+        Question: question_map,
+        Choice: get_child_map(Choice, "question", question_map, ["slug"]),
+        ScoringModel: scoring_model_map,
+        ValueRange: get_child_map(
+            ValueRange, "scoring_model", scoring_model_map, ["start", "end"]
+        ),
+        DatesRange: get_child_map(
+            DatesRange, "scoring_model", scoring_model_map, ["start", "end"]
+        ),
+        Recommendation: get_one_to_one_map(Recommendation, question_map),
+    }
+
 
-        for vr_old in sm_old.ranges.all():
-            ValueRange.objects.create(
-                scoring_model=sm_new,
-                start=vr_old.start,
-                end=vr_old.end,
-                points=vr_old.points,
+def clone_quiz_structure(source_user: User, target_user: User) -> dict:
+    """Copy questions with choices, return map of source to target question pks"""
+    Question.objects.bulk_create(
+        copy_instance(question, owner_id=target_user.pk)
+        for question in Question.objects.filter(owner=source_user).order_by("pk")
+    )
+
+    # Questions are unique by field name of owner, pks of bulk inserted rows
+    # aren't returned by every database
+    question_map = get_question_map(source_user, target_user)
+
+    # Choices keep bits, so choices masks of cloned answers stay valid
+    Choice.objects.bulk_create(
+        copy_instance(choice, question_id=question_map[choice.question_id])
+        for choice in Choice.objects.filter(question_id__in=question_map).order_by("pk")
+    )
+
+    return question_map
+
+
+def clone_scoring_model(source_user: User, target_user: User, question_map: dict):
+    """Copy scoring models with their ranges and recommendations with their versions.
+
+    Return map of source to target recommendation pks.
+    """
+    ScoringModel.objects.bulk_create(
+        copy_instance(
+            scoring_model,
+            owner_id=target_user.pk,
+            question_id=question_map[scoring_model.question_id],
+        )
+        for scoring_model in ScoringModel.objects.filter(owner=source_user).order_by(
+            "pk"
+        )
+    )
+    scoring_model_map = get_one_to_one_map(ScoringModel, question_map)
+
+    for range_model in (ValueRange, DatesRange):
+        range_model.objects.bulk_create(
+            copy_instance(
+                value_range,
+                scoring_model_id=scoring_model_map[value_range.scoring_model_id],
             )
+            for value_range in range_model.objects.filter(
+                scoring_model_id__in=scoring_model_map
+            ).order_by("pk")
+        )
 
-    for recommendation in Recommendation.objects.filter(owner=source_user):
-        Recommendation.objects.create(
-            owner=target_user,
-            question=Question.objects.get(
-                field_name=recommendation.question.field_name, owner=target_user
-            ),
-            rule=recommendation.rule,
-            response_text=recommendation.response_text,
-            affiliate_name=recommendation.affiliate_name,
-            affiliate_image=recommendation.affiliate_image,
-            affiliate_link=recommendation.affiliate_link,
-            redirect_url=recommendation.redirect_url,
+    Recommendation.objects.bulk_create(
+        copy_instance(
+            recommendation,
+            owner_id=target_user.pk,
+            question_id=question_map[recommendation.question_id],
         )
+        for recommendation in Recommendation.objects.filter(owner=source_user).order_by(
+            "pk"
+        )
+    )
+    recommendation_map = get_one_to_one_map(Recommendation, question_map)
+
+    # All versions are copied, so cloned leads keep recommendations they got
+    RecommendationVersion.objects.bulk_create(
+        copy_instance(
+            version, recommendation_id=recommendation_map[version.recommendation_id]
+        )
+        for version in RecommendationVersion.objects.filter(
+            recommendation_id__in=recommendation_map
+        ).order_by("pk")
+    )
+
+    return recommendation_map
+
 
+def clone_leads_chunk(target_user: User, leads, recommendation_map: dict) -> None:
+    """Copy leads with their answers, facets, search documents and recommendation hits"""
+    lead_map = {lead.pk: uuid.uuid4() for lead in leads}
 
-def clone_leads_and_answers(source_user: User, target_user: User):
-    for lead_old in Lead.objects.filter(owner=source_user).all():
-        lead_new = Lead.objects.create(
-            owner=target_user,
-            timestamp=lead_old.timestamp,
-            x_axis=lead_old.x_axis,
-            y_axis=lead_old.y_axis,
-            total_score=lead_old.total_score,
+    new_leads = Lead.objects.bulk_create(
+        copy_instance(lead, lead_id=lead_map[lead.pk], owner_id=target_user.pk)
+        for lead in leads
+    )
+    # Timestamp is set on insert, as it is added automatically
+    for new_lead, lead in zip(new_leads, leads):
+        new_lead.timestamp = lead.timestamp
+    Lead.objects.bulk_update(new_leads, ["timestamp"])
+
+    answers = Answer.objects.bulk_create(
+        copy_instance(answer, lead_id=lead_map[answer.lead_id])
+        for answer in Answer.objects.filter(lead_id__in=lead_map).order_by("pk")
+    )
+
+    AnswerFacet.objects.bulk_create(AnswerFacet.from_answers(target_user.pk, answers))
+
+    lead_answers = {lead_id: [] for lead_id in lead_map.values()}
+    for answer in answers:
+        lead_answers[answer.lead_id].append(answer)
+
+    LeadSearchDocument.objects.bulk_create(
+        LeadSearchDocument.from_answers(
+            Lead(lead_id=lead_id, owner_id=target_user.pk), lead_answers[lead_id]
         )
+        for lead_id in lead_map.values()
+    )
 
-        for answer_old in lead_old.answers.all():
-            Answer.objects.create(
-                lead=lead_new,
-                field_name=answer_old.field_name,
-                response=answer_old.response,
-                value=answer_old.value,
-                values=answer_old.values,
-                points=answer_old.points,
-                response_text=answer_old.response_text,
-                affiliate_name=answer_old.affiliate_name,
-                affiliate_image=answer_old.affiliate_image,
-                affiliate_link=answer_old.affiliate_link,
-                redirect_url=answer_old.redirect_url,
-            )
+    # Hits keep versions, all recommendation versions are cloned
+    RecommendationHit.objects.bulk_create(
+        copy_instance(
+            hit,
+            lead_id=lead_map[hit.lead_id],
+            recommendation_id=recommendation_map[hit.recommendation_id],
+        )
+        for hit in RecommendationHit.objects.filter(lead_id__in=lead_map)
+        if hit.recommendation_id in recommendation_map
+    )
+
+
+def clone_leads_and_answers(
+    source_user: User,
+    target_user: User,
+    recommendation_map: dict,
+    chunk_size=CLONE_CHUNK_SIZE,
+    after=None,
+):
+    """Copy leads chunk by chunk, yielding (last lead pk, leads) of copied chunks.
+
+    Leads are read in pk order, each chunk is copied in its own transaction
+    and only its pk map is kept, so memory use doesn't grow with number of
+    leads. Copying starts after lead pk `after` if provided.
+    """
+    leads = Lead.objects.filter(owner=source_user).order_by("pk")
+
+    while True:
+        chunk_qs = leads if after is None else leads.filter(pk__gt=after)
+        chunk = list(chunk_qs[:chunk_size])
+
+        if not chunk:
+            # Bulk inserted leads aren't added to rollups one by one
+            rebuild_lead_rollups(target_user.pk)
+            return
+
+        with transaction.atomic():
+            clone_leads_chunk(target_user, chunk, recommendation_map)
+
+            # Caller saving its checkpoint here saves it with the chunk
+            yield chunk[-1].pk, len(chunk)
+
+        after = chunk[-1].pk
+
+
+def clone_structure(
+    source_user: User,
+    target_user: User,
+    quiz_structure: bool = True,
+    scoring_model: bool = True,
+) -> dict:
+    """Copy quiz structure and scoring model, return map of recommendation pks"""
+    recommendation_map = {}
+
+    with transaction.atomic():
+        if quiz_structure:
+            question_map = clone_quiz_structure(source_user, target_user)
+
+            if scoring_model:
+                recommendation_map = clone_scoring_model(
+                    source_user, target_user, question_map
+                )
+
+    return recommendation_map
+
+
+def get_recommendation_map(source_user: User, target_user: User) -> dict:
+    """Return map of recommendation pks of already cloned structure"""
+    return get_one_to_one_map(
+        Recommendation, get_question_map(source_user, target_user)
+    )
 
 
 def clone_account(
@@ -102,12 +295,15 @@ def clone_account(
     quiz_structure: bool = True,
     scoring_model: bool = True,
     leads_and_answers: bool = True,
+    chunk_size=CLONE_CHUNK_SIZE,
 ):
-    if quiz_structure:
-        clone_quiz_structure(source_user, target_user)
-
-        if scoring_model:
-            clone_scoring_model(source_user, target_user)
+    with suppress_cache_invalidation(target_user.id):
+        recommendation_map = clone_structure(
+            source_user, target_user, quiz_structure, scoring_model
+        )
 
-            if leads_and_answers:
-                clone_leads_and_answers(source_user, target_user)
+        if quiz_structure and scoring_model and leads_and_answers:
+            for _ in clone_leads_and_answers(
+                source_user, target_user, recommendation_map, chunk_size
+            ):
+                pass
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.clone_jobs import claim_clone_job, run_clone_job
+from users.helpers import CLONE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Run pending account clone jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once there are no more jobs to run instead of polling",
+        )
+        parser.add_argument("--poll-interval", type=float, default=5)
+        parser.add_argument("--chunk-size", type=int, default=CLONE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_clone_job()
+
+            if job is None:
+                if options["once"]:
+                    return
+
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running clone job {job.pk}")
+            run_clone_job(job, options["chunk_size"])
+            self.stdout.write(
+                f"Clone job {job.pk} {job.get_status_display().lower()}, "
+                f"{job.leads_cloned} of {job.leads_total} leads cloned"
+            )
@@ -0,0 +1,49 @@
+# Generated manually for scoring configuration shared with catalogue slaves
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("users", "0002_clonejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="catalogue",
+            name="config_version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.CreateModel(
+            name="SharedScoringConfig",
+            fields=[
+                (
+                    "slave",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="shared_scoring_config",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "catalogue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shared_configs",
+                        to="users.catalogue",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Shared scoring configuration",
+                "verbose_name_plural": "Shared scoring configurations",
+            },
+        ),
+    ]
@@ -20,6 +20,9 @@ class Catalogue(models.Model):
         related_name="catalogues_as_slave",
         blank=True,
     )
+    # Version of master's scoring configuration shared with slaves, bumped
+    # on every change of it, see SharedScoringConfig
+    config_version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         verbose_name = _("Catalogue")
@@ -27,3 +30,78 @@ class Catalogue(models.Model):
 
     def __str__(self):
         return str(self.master.username)
+
+
+class SharedScoringConfig(models.Model):
+    """Slave scoring leads with scoring configuration of catalogue master.
+
+    Slave has no questions, scoring models and recommendations of its own
+    while configuration is shared. They are copied to slave on its first
+    change, see users.scoring_config.
+    """
+
+    slave = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="shared_scoring_config",
+    )
+    catalogue = models.ForeignKey(
+        Catalogue, on_delete=models.CASCADE, related_name="shared_configs"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Shared scoring configuration")
+        verbose_name_plural = _("Shared scoring configurations")
+
+    def __str__(self):
+        return f"{self.slave.username} -> {self.catalogue}"
+
+
+class CloneJob(models.Model):
+    """Account clone run in background by `run_clone_jobs` command"""
+
+    PENDING = "P"
+    RUNNING = "R"
+    DONE = "D"
+    FAILED = "F"
+
+    STATUS_CHOICES = (
+        (PENDING, _("Pending")),
+        (RUNNING, _("Running")),
+        (DONE, _("Done")),
+        (FAILED, _("Failed")),
+    )
+
+    source = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="clone_jobs_as_source"
+    )
+    target = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="clone_jobs_as_target"
+    )
+    quiz_structure = models.BooleanField(default=True)
+    scoring_model = models.BooleanField(default=True)
+    leads_and_answers = models.BooleanField(default=True)
+
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+
+    # Checkpoint of the last cloned chunk of leads, clone resumes right after it
+    structure_cloned = models.BooleanField(default=False)
+    leads_total = models.PositiveBigIntegerField(default=0)
+    leads_cloned = models.PositiveBigIntegerField(default=0)
+    last_lead_pk = models.CharField(max_length=64, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        verbose_name = _("Clone job")
+        verbose_name_plural = _("Clone jobs")
+
+    def __str__(self):
+        return f"Clone #{self.pk}"
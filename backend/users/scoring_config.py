@@ -0,0 +1,145 @@
+"""Scoring configuration of catalogue master shared with its slaves.
+
+Slaves sharing configuration score leads with master's questions, scoring
+models and recommendations, see scoringengine.scoring_plan, and have none of
+their own. Configuration is copied to slave on its first change, slave
+scores leads with its own copy from then on. Slaves removed from catalogue
+get their copy as well. Recommendation hits of slave's leads are moved to
+its copies of recommendations.
+
+Version of shared configuration is bumped on every change of master's
+configuration, so workers rebuild their cached scoring plans.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from scoringengine.cache import suppress_cache_invalidation
+from scoringengine.models import (
+    Choice,
+    DatesRange,
+    Question,
+    Recommendation,
+    RecommendationHit,
+    ScoringModel,
+    ValueRange,
+    invalidate_recommendation_catalog,
+)
+from users.helpers import clone_structure, get_config_maps
+from users.models import Catalogue, SharedScoringConfig
+
+
+def share_scoring_config(catalogue: Catalogue, slaves) -> list:
+    """Share configuration of catalogue master with slaves, return slaves it is shared with.
+
+    Slaves having questions of their own keep their configuration.
+    """
+    slaves = list(
+        catalogue.slaves.filter(
+            pk__in=[slave.pk for slave in slaves],
+            questions__isnull=True,
+            shared_scoring_config__isnull=True,
+        )
+    )
+
+    SharedScoringConfig.objects.bulk_create(
+        SharedScoringConfig(slave=slave, catalogue=catalogue) for slave in slaves
+    )
+
+    return slaves
+
+
+def fork_scoring_config(user) -> dict:
+    """Copy configuration shared with user to user and stop sharing it.
+
+    Return maps of shared to copied pks by model, empty if configuration
+    isn't shared with user.
+    """
+    with transaction.atomic():
+        shared = (
+            SharedScoringConfig.objects.select_for_update()
+            .select_related("catalogue__master")
+            .filter(slave_id=user.pk)
+            .first()
+        )
+
+        if shared is None:
+            return {}
+
+        master = shared.catalogue.master
+
+        with suppress_cache_invalidation(user.pk):
+            clone_structure(master, user)
+
+        shared.delete()
+
+        config_maps = get_config_maps(master, user)
+
+        # Leads scored while sharing hit master's recommendations, copies
+        # have the same versions
+        for recommendation_id, copy_id in config_maps[Recommendation].items():
+            RecommendationHit.objects.filter(
+                lead__owner_id=user.pk, recommendation_id=recommendation_id
+            ).update(recommendation_id=copy_id)
+
+        invalidate_recommendation_catalog(user.pk)
+
+        return config_maps
+
+
+def bump_config_version(catalogues) -> None:
+    catalogues.update(config_version=F("config_version") + 1)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=ScoringModel)
+@receiver([post_save, post_delete], sender=Recommendation)
+def bump_owner_config_version(sender, instance=None, **kwargs):
+    if instance and instance.owner_id:
+        bump_config_version(Catalogue.objects.filter(master_id=instance.owner_id))
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def bump_choice_config_version(sender, instance=None, **kwargs):
+    if instance and instance.question_id:
+        bump_config_version(
+            Catalogue.objects.filter(master__questions=instance.question_id)
+        )
+
+
+@receiver([post_save, post_delete], sender=ValueRange)
+@receiver([post_save, post_delete], sender=DatesRange)
+def bump_range_config_version(sender, instance=None, **kwargs):
+    if instance and instance.scoring_model_id:
+        bump_config_version(
+            Catalogue.objects.filter(master__scoring_models=instance.scoring_model_id)
+        )
+
+
+@receiver(m2m_changed, sender=Catalogue.slaves.through)
+def fork_removed_slaves(
+    sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs
+):
+    """Copy shared configuration to slaves removed from catalogue"""
+    if action not in ("pre_remove", "pre_clear"):
+        return
+
+    if reverse:
+        shared = SharedScoringConfig.objects.filter(slave=instance)
+        if pk_set is not None:
+            shared = shared.filter(catalogue_id__in=pk_set)
+    else:
+        shared = SharedScoringConfig.objects.filter(catalogue=instance)
+        if pk_set is not None:
+            shared = shared.filter(slave_id__in=pk_set)
+
+    for config in shared.select_related("slave"):
+        fork_scoring_config(config.slave)
+
+
+@receiver(pre_delete, sender=Catalogue)
+def fork_catalogue_slaves(sender, instance=None, **kwargs):
+    """Copy shared configuration to slaves of deleted catalogue"""
+    for config in instance.shared_configs.select_related("slave"):
+        fork_scoring_config(config.slave)